@@ -1,11 +1,13 @@
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
+from plotly.subplots import make_subplots
 import pandas as pd
 import requests
 from datetime import datetime, timedelta
 import time
 import numpy as np
+import threading
 
 # Page configuration
 st.set_page_config(
@@ -98,6 +100,73 @@ st.markdown("""
 # Backend URL
 BACKEND_URL = "https://your-backend-name.onrender.com"
 
+# How long a backend snapshot is shared between admin sessions
+SNAPSHOT_TTL_SECONDS = 2.0
+
+class SnapshotCache:
+    """Process-wide TTL cache of backend GET responses.
+    
+    Shared by every Streamlit session. Concurrent misses for the same key
+    are single-flighted: one session performs the request while the others
+    wait on the key's lock and then read the fresh entry.
+    """
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+    
+    def _key_lock(self, key):
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+    
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+    
+    def get(self, path, params=None):
+        """Return (status_code, json_data, error) for a backend GET"""
+        key = (path, tuple(sorted((params or {}).items())))
+        
+        result = self._fresh(key)
+        if result is not None:
+            return result
+        
+        with self._key_lock(key):
+            # Another session may have refreshed it while we waited
+            result = self._fresh(key)
+            if result is not None:
+                return result
+            
+            try:
+                response = requests.get(f"{BACKEND_URL}{path}", params=params, timeout=5)
+                data = response.json() if response.status_code == 200 else None
+                result = (response.status_code, data, None)
+            except Exception as e:
+                result = (None, None, str(e))
+            
+            self._entries[key] = (time.monotonic(), result)
+            return result
+    
+    def invalidate(self):
+        """Drop all cached snapshots (after a state-changing action)"""
+        self._entries.clear()
+
+@st.cache_resource
+def get_snapshot_cache():
+    """Single snapshot cache instance shared by all sessions"""
+    return SnapshotCache(SNAPSHOT_TTL_SECONDS)
+
+def fetch_backend(path, params=None):
+    """Fetch a backend snapshot through the shared cache"""
+    return get_snapshot_cache().get(path, params)
+
 # Initialize session state for transaction log and historical data
 if 'transaction_log' not in st.session_state:
     st.session_state.transaction_log = []
@@ -145,8 +214,8 @@ def update_historical_data(data):
     
     timestamp = datetime.now()
     
-    # Calculate health score
-    health_score = calculate_health_score(data)
+    # Health score as computed by the backend
+    health_score = data.get('health_score', 0)
     
     # Add to historical data
     health_entry = {
@@ -178,17 +247,15 @@ def update_historical_data(data):
 
 def get_system_state():
     """Fetch current system state from backend"""
-    try:
-        response = requests.get(f"{BACKEND_URL}/api/system-state")
-        if response.status_code == 200:
-            data = response.json()
-            log_transaction("System State Fetch", f"Successfully fetched system state: {data.get('system_state', 'UNKNOWN')}", "success")
-            update_historical_data(data)
-            return data
-        else:
-            log_transaction("System State Fetch", f"Failed with status code: {response.status_code}", "error")
-    except Exception as e:
-        log_transaction("System State Fetch", f"Connection error: {str(e)}", "error")
+    status_code, data, error = fetch_backend("/api/system-state")
+    if status_code == 200:
+        log_transaction("System State Fetch", f"Successfully fetched system state: {data.get('system_state', 'UNKNOWN')}", "success")
+        update_historical_data(data)
+        return data
+    elif error is not None:
+        log_transaction("System State Fetch", f"Connection error: {error}", "error")
+    else:
+        log_transaction("System State Fetch", f"Failed with status code: {status_code}", "error")
     return None
 
 def simulate_attack(attack_type="GPS Spoofing"):
@@ -197,6 +264,7 @@ def simulate_attack(attack_type="GPS Spoofing"):
         response = requests.post(f"{BACKEND_URL}/api/simulate-attack", json={"attack_type": attack_type})
         if response.status_code == 200:
             data = response.json()
+            get_snapshot_cache().invalidate()
             log_transaction("Attack Simulation", f"Triggered {attack_type} attack", "attack")
             return data
         else:
@@ -211,6 +279,7 @@ def reset_system():
         response = requests.post(f"{BACKEND_URL}/api/reset-system")
         if response.status_code == 200:
             data = response.json()
+            get_snapshot_cache().invalidate()
             log_transaction("System Reset", "System reset to NORMAL state", "success")
             return data
         else:
@@ -221,39 +290,55 @@ def reset_system():
 
 def get_attack_history():
     """Get attack history from backend"""
-    try:
-        response = requests.get(f"{BACKEND_URL}/api/attack-history")
-        if response.status_code == 200:
-            return response.json()
-    except:
-        pass
+    status_code, data, _ = fetch_backend("/api/attack-history")
+    if status_code == 200:
+        return data
     return {"attacks": []}
 
-def calculate_health_score(data):
-    """Calculate system health score based on anomaly score and other metrics"""
-    if not data:
-        return 0
-    
-    anomaly_score = data.get('anomaly_score', 0)
-    reconstruction_error = data.get('reconstruction_error', 0)
-    
-    # Health score based on inverse of anomaly (higher anomaly = lower health)
-    base_health = max(0, 100 * (1 - anomaly_score))
-    
-    # Penalty for high reconstruction error
-    error_penalty = min(20, reconstruction_error * 1000)
-    
-    # Adjust based on system state
-    state_penalty = 0
-    state = data.get('system_state', 'NORMAL')
-    if state == 'SAFE_MODE':
-        state_penalty = 30
-    elif state == 'ATTACK_DETECTED':
-        state_penalty = 15
+def get_fleet_summary(top_n=10):
+    """Get aggregated fleet statistics from backend"""
+    status_code, data, error = fetch_backend("/api/fleet-summary", {"top_n": top_n})
+    if status_code == 200:
+        return data
+    elif error is not None:
+        log_transaction("Fleet Summary Fetch", f"Connection error: {error}", "error")
+    else:
+        log_transaction("Fleet Summary Fetch", f"Failed with status code: {status_code}", "error")
+    return None
+
+def get_anomaly_history():
+    """Get anomaly history with precomputed health scores from backend"""
+    status_code, data, _ = fetch_backend("/api/anomaly-history")
+    if status_code == 200:
+        return data
+    return None
+
+def backfill_historical_data():
+    """Backfill empty chart history from the backend's anomaly history"""
+    if st.session_state.historical_health_scores:
+        return
     
-    health_score = base_health - error_penalty - state_penalty
+    history = get_anomaly_history()
+    if not history or not history.get('timestamps'):
+        return
     
-    return max(0, min(100, health_score))
+    timestamps = pd.to_datetime(history['timestamps']).to_pydatetime()
+    threshold = history.get('threshold', 0.7)
+    
+    st.session_state.historical_health_scores = [
+        {"timestamp": ts, "health_score": health, "system_state": state}
+        for ts, health, state in zip(timestamps, history['health_scores'], history['system_states'])
+    ][-1000:]
+    st.session_state.historical_anomaly_scores = [
+        {"timestamp": ts, "anomaly_score": score, "threshold": threshold}
+        for ts, score in zip(timestamps, history['anomaly_scores'])
+    ][-1000:]
+    st.session_state.historical_reconstruction_errors = [
+        {"timestamp": ts, "reconstruction_error": error}
+        for ts, error in zip(timestamps, history['reconstruction_errors'])
+    ][-1000:]
+    
+    log_transaction("History Backfill", f"Loaded {len(timestamps)} historical points from backend", "info")
 
 def create_health_timeline_chart():
     """Create health score timeline chart"""
@@ -586,9 +671,18 @@ def create_combined_metrics_chart():
     
     return fig
 
-def create_ml_process_visualization():
-    """Create visualization of the ML process"""
-    fig = go.Figure()
+def create_ml_process_visualization(attribution=None, feature_names=()):
+    """Create visualization of the ML process, with the latest window's error attribution below it"""
+    if attribution:
+        fig = make_subplots(
+            rows=2, cols=2,
+            specs=[[{"colspan": 2}, None], [{}, {}]],
+            row_heights=[0.65, 0.35],
+            vertical_spacing=0.1,
+            subplot_titles=("", "Reconstruction Error by Signal", "Reconstruction Error by Time Step")
+        )
+    else:
+        fig = go.Figure()
     
     # Create nodes for the ML process
     nodes = [
@@ -656,7 +750,7 @@ def create_ml_process_visualization():
         (2, "2. Sequence Encoding\n(10 time steps)"),
         (3, "3. Compressed\nRepresentation"),
         (4, "4. Sequence\nReconstruction"),
-        (5, "5. Compare Input\nvs Reconstruction"),
+        (5, "5. Compare Input\nvs Reconstruction" + (f"\nTop signal: {attribution['top_feature']}" if attribution else "")),
         (6, "6. Calculate\nAnomaly Score"),
         (7, "7. Threshold Check:\n>0.7 = Attack"),
         (8, "8. Countdown:\n5s to Safe Mode"),
@@ -674,9 +768,27 @@ def create_ml_process_visualization():
             align="center"
         )
     
+    if attribution:
+        # Which signals and time steps the latest reconstruction error came from
+        fig.add_trace(go.Bar(
+            x=list(feature_names),
+            y=attribution["feature_errors"],
+            marker_color=["#ff416c" if name == attribution["top_feature"] else "#ffb347" for name in feature_names],
+            hovertemplate="%{x}: %{y:.4g}<extra></extra>"
+        ), row=2, col=1)
+        fig.add_trace(go.Bar(
+            x=list(range(1, len(attribution["timestep_errors"]) + 1)),
+            y=attribution["timestep_errors"],
+            marker_color=["#ff416c" if i == attribution["top_timestep"] else "#36d1dc"
+                          for i in range(len(attribution["timestep_errors"]))],
+            hovertemplate="t%{x}: %{y:.4g}<extra></extra>"
+        ), row=2, col=2)
+        # Raw-scale errors span orders of magnitude across signals
+        fig.update_yaxes(type="log", row=2)
+    
     fig.update_layout(
         title="🧠 ML Anomaly Detection Process Flow",
-        height=600,
+        height=900 if attribution else 600,
         template="plotly_dark",
         showlegend=False,
         xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[-1, 19]),
@@ -717,6 +829,65 @@ def create_health_gauge(health_score):
     
     return fig
 
+def create_fleet_distribution_chart(summary):
+    """Create fleet anomaly score distribution chart"""
+    histogram = summary.get('score_histogram', {})
+    edges = histogram.get('bin_edges', [])
+    counts = histogram.get('counts', [])
+    
+    labels = [f"{edges[i]:.1f}-{edges[i + 1]:.1f}" for i in range(len(counts))]
+    colors = ['#ff416c' if edges[i] >= 0.9 else '#ffb347' if edges[i] >= 0.7 else '#00b09b' for i in range(len(counts))]
+    
+    fig = go.Figure(go.Bar(
+        x=labels,
+        y=counts,
+        marker_color=colors,
+        name='Devices'
+    ))
+    
+    fig.update_layout(
+        title="📊 Fleet Anomaly Score Distribution",
+        xaxis_title="Anomaly Score",
+        yaxis_title="Devices",
+        height=400,
+        template="plotly_dark"
+    )
+    
+    return fig
+
+def render_fleet_overview():
+    """Render fleet overview from the backend's aggregated summary"""
+    st.markdown("## 🛴 Fleet Overview")
+    
+    top_n = st.slider("Top anomalous devices", min_value=5, max_value=50, value=10, step=5)
+    summary = get_fleet_summary(top_n)
+    
+    if summary is None:
+        st.error("⚠️ Cannot load fleet summary from backend.")
+        return
+    
+    state_counts = summary.get('state_counts', {})
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Devices", summary.get('device_count', 0))
+    col2.metric("Normal", state_counts.get('NORMAL', 0))
+    col3.metric("Attack Detected", state_counts.get('ATTACK_DETECTED', 0))
+    col4.metric("Critical", state_counts.get('SAFE_MODE', 0))
+    col5.metric("Mean Anomaly", f"{summary.get('mean_anomaly_score', 0):.3f}")
+    
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        st.markdown("### 🚨 Most Anomalous Devices")
+        top_devices = summary.get('top_devices', [])
+        if top_devices:
+            st.dataframe(pd.DataFrame(top_devices), use_container_width=True, hide_index=True)
+        else:
+            st.info("No device scores reported yet.")
+    
+    with col2:
+        st.plotly_chart(create_fleet_distribution_chart(summary), use_container_width=True)
+
 def main():
     # Header
     st.markdown('<h1 class="main-header">🏍️ Smart Scooter Admin Dashboard</h1>', unsafe_allow_html=True)
@@ -724,6 +895,18 @@ def main():
     # Auto-refresh
     auto_refresh = st.checkbox("Auto-refresh every 5 seconds", value=True)
     
+    view_mode = st.radio("View", ["System", "Fleet Overview"], horizontal=True)
+    
+    if view_mode == "Fleet Overview":
+        render_fleet_overview()
+        if auto_refresh:
+            time.sleep(5)
+            st.rerun()
+        return
+    
+    # Backfill charts from backend history on first load
+    backfill_historical_data()
+    
     # Get current state
     data = get_system_state()
     
@@ -837,8 +1020,8 @@ def main():
         """, unsafe_allow_html=True)
     
     with col5:
-        # Calculate and display health score
-        health_score = calculate_health_score(data)
+        # Display the backend's health score
+        health_score = data.get('health_score', 0)
         health_color = "#00b09b" if health_score > 80 else "#ffb347" if health_score > 50 else "#ff416c"
         
         st.markdown(f"""
@@ -852,7 +1035,8 @@ def main():
     with col6:
         # Get attack history
         attack_history = get_attack_history()
-        attack_count = len(attack_history.get('attacks', []))
+        # The backend pages history; 'total' covers all stored attacks
+        attack_count = attack_history.get('total') or len(attack_history.get('attacks', []))
         
         st.markdown(f"""
         <div class="metric-card">
@@ -924,7 +1108,7 @@ def main():
         col1, col2 = st.columns([1, 2])
         
         with col1:
-            health_score = calculate_health_score(data)
+            health_score = data.get('health_score', 0)
             st.plotly_chart(create_health_gauge(health_score), use_container_width=True)
             
             st.markdown(f"""
@@ -1042,7 +1226,7 @@ def main():
     
     with tab5:
         # ML Process Visualization
-        st.plotly_chart(create_ml_process_visualization(), use_container_width=True)
+        st.plotly_chart(create_ml_process_visualization(data.get('error_attribution'), data.get('feature_names', ())), use_container_width=True)
         
         # Add the text-based ML process explanation
         st.markdown("""
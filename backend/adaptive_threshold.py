@@ -0,0 +1,96 @@
+import os
+from typing import Dict, Optional
+
+from quantile import P2Quantile
+
+# Opt-in via environment, e.g. SCOOTER_ADAPTIVE_THRESHOLD=1
+ADAPTIVE_ENABLED = os.environ.get("SCOOTER_ADAPTIVE_THRESHOLD", "0") == "1"
+
+class DeviceBaseline:
+    """Recent reconstruction error quantile for one device.
+
+    Two P-square sketches take turns: the active one absorbs new errors
+    while the last completed one supplies the threshold. Every `window`
+    observations the active sketch becomes the reference and a fresh one
+    starts, so the baseline follows the device's recent behaviour in
+    constant memory and O(1) time per frame.
+    """
+
+    __slots__ = ("quantile", "window", "active", "reference")
+
+    def __init__(self, quantile: float, window: int):
+        self.quantile = quantile
+        self.window = window
+        self.active = P2Quantile(quantile)
+        self.reference: Optional[P2Quantile] = None
+
+    def update(self, mse: float):
+        self.active.update(mse)
+        if self.active.count >= self.window:
+            self.reference = self.active
+            self.active = P2Quantile(self.quantile)
+
+    def threshold(self, warmup: int) -> Optional[float]:
+        """Current threshold, or None while not enough errors have been seen"""
+        if self.reference is not None:
+            return self.reference.value()
+        if self.active.count >= warmup:
+            return self.active.value()
+        return None
+
+class AdaptiveThresholds:
+    """Per-device thresholds that normalize scores against each vehicle's baseline.
+
+    Errors above `outlier_gate` times the current threshold do not update
+    the baseline, so an ongoing attack cannot drag its own device's
+    threshold upward. (Gating on the attack cut-off itself would censor the
+    tail and ratchet the threshold down.) Until a device has `warmup`
+    windows the global model threshold is used. The quantile is scaled by
+    `margin` so a device's normal tail stays below the attack cut-off.
+    """
+
+    def __init__(self, quantile: float = 0.99, window: int = 1000, warmup: int = 50,
+                 margin: float = 1.5, outlier_gate: float = 3.0, min_threshold: float = 1e-6):
+        self.quantile = quantile
+        self.window = window
+        self.warmup = warmup
+        self.margin = margin
+        self.outlier_gate = outlier_gate
+        self.min_threshold = min_threshold
+        self.devices: Dict[str, DeviceBaseline] = {}
+
+    def threshold(self, device_id: str, default: float) -> float:
+        baseline = self.devices.get(device_id)
+        value = baseline.threshold(self.warmup) if baseline is not None else None
+        if value is None:
+            return default
+        return max(value * self.margin, self.min_threshold)
+
+    def score(self, device_id: str, mse: float, default: float) -> float:
+        """Anomaly score (0-1) against the device's own baseline; learns from non-outlier windows"""
+        threshold = self.threshold(device_id, default)
+        score = min(mse / threshold, 1.0)
+
+        if mse <= self.outlier_gate * threshold:
+            baseline = self.devices.get(device_id)
+            if baseline is None:
+                baseline = self.devices[device_id] = DeviceBaseline(self.quantile, self.window)
+            baseline.update(mse)
+        return score
+
+    def forget(self, device_id: str):
+        self.devices.pop(device_id, None)
+
+    def restore(self, device_id: str, baseline: DeviceBaseline):
+        """Reinstate a baseline saved when the device's session was evicted"""
+        self.devices[device_id] = baseline
+
+    def describe(self, device_id: str, default: float) -> Dict:
+        baseline = self.devices.get(device_id)
+        return {
+            "device_id": device_id,
+            "threshold": self.threshold(device_id, default),
+            "adaptive": baseline is not None and baseline.threshold(self.warmup) is not None,
+            "observations": 0 if baseline is None else baseline.active.count + (baseline.reference.count if baseline.reference else 0),
+            "quantile": self.quantile
+        }
@@ -1,21 +1,246 @@
-import websocket
+"""Load generator for the Smart Scooter ML backend.
+
+Simulates a fleet of scooters over WebSocket, each sending TELEMETRY frames
+in the same shape as the frontend (a list of 6 floats). A fraction of the
+fleet switches to attack telemetry part-way through the run.
+
+Usage:
+    python attack_simulator.py --scooters 1000 --rate 1 --duration 60 \\
+        --attack-fraction 0.05 --report report.json
+    python attack_simulator.py --spawn-server --scooters 200
+"""
+import argparse
+import asyncio
 import json
+import os
 import random
+import subprocess
+import sys
 import time
+import urllib.request
 
-ws = websocket.WebSocket()
-ws.connect("ws://localhost:8000/ws")
-
-while True:
-    attack_data = {
-        "type": "telemetry",
-        "data": {
-            "speed": random.randint(120, 160),
-            "acceleration": random.randint(20, 40),
-            "latitude": 13.5,
-            "longitude": 78.5,
-            "temperature": 50
-        }
+import websockets
+
+# Attack telemetry templates (same vectors the backend simulates)
+ATTACK_TEMPLATES = {
+    "gps": [80, 5.0, 5.0, 15.0, 0.5, 0.5],
+    "speed": [200, 20.0, 20.0, 30.0, 0.01, 0.01],
+    "pattern": [150, 15.0, -15.0, 25.0, 1.0, -1.0],
+    "emergency": [300, 50.0, 50.0, 50.0, 2.0, 2.0],
+}
+
+def normal_frame():
+    """Normal riding telemetry, as generated by the frontend"""
+    return [
+        33.5 + (random.random() - 0.5) * 3,
+        (random.random() - 0.5) * 2,
+        (random.random() - 0.5) * 0.5,
+        9.8 + (random.random() - 0.5) * 0.2,
+        (random.random() - 0.5) * 0.0001,
+        (random.random() - 0.5) * 0.0001
+    ]
+
+def attack_frame(attack_type):
+    return [x + random.uniform(-0.1, 0.1) * x for x in ATTACK_TEMPLATES[attack_type]]
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(len(values) * q))]
+    return {
+        "count": len(values),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p90_ms": round(pick(0.90) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3)
     }
-    ws.send(json.dumps(attack_data))
-    time.sleep(1)
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.ack_latencies = []
+        self.frames_sent = 0
+        self.acks_received = 0
+        self.connect_errors = 0
+        self.send_errors = 0
+        self.attack_started_at = None
+        self.attack_detected_at = []
+        self.safe_mode_at = []
+        self.started_at = None
+
+    async def scooter(self, index, attack_type, connect_slots):
+        device_id = f"scooter-{index}"
+        interval = 1.0 / self.args.rate
+        # Send time by frame sequence number; the ack echoes it, so acks the
+        # backend dropped under load do not shift later latencies
+        pending = {}
+        seq = 0
+
+        async with connect_slots:
+            try:
+                ws = await websockets.connect(self.args.url, max_queue=None)
+            except Exception:
+                self.connect_errors += 1
+                return
+
+        async def receive():
+            async for raw in ws:
+                message = json.loads(raw)
+                now = time.perf_counter()
+                msg_type = message.get("type")
+                if msg_type == "TELEMETRY_ACK":
+                    sent_at = pending.pop(message.get("seq"), None)
+                    if sent_at is not None:
+                        self.ack_latencies.append(now - sent_at)
+                        self.acks_received += 1
+                elif msg_type == "ATTACK_DETECTED":
+                    self.attack_detected_at.append(now)
+                elif msg_type == "SYSTEM_STATE" and message.get("state") == "SAFE_MODE":
+                    self.safe_mode_at.append(now)
+
+        receiver = asyncio.create_task(receive())
+        try:
+            await ws.send(json.dumps({"type": "CONNECTION", "status": "CONNECTED", "device_id": device_id}))
+
+            # Start together, spread across the send interval
+            await asyncio.sleep(max(0.0, self.started_at - time.perf_counter()) + random.random() * interval)
+            deadline = self.started_at + self.args.duration
+            attack_at = self.started_at + self.args.attack_after
+
+            while time.perf_counter() < deadline:
+                now = time.perf_counter()
+                attacking = attack_type is not None and now >= attack_at
+                if attacking and self.attack_started_at is None:
+                    self.attack_started_at = now
+
+                seq += 1
+                frame = {
+                    "type": "TELEMETRY",
+                    "device_id": device_id,
+                    "seq": seq,
+                    "data": attack_frame(attack_type) if attacking else normal_frame()
+                }
+                pending[seq] = time.perf_counter()
+                await ws.send(json.dumps(frame))
+                self.frames_sent += 1
+
+                await asyncio.sleep(max(0.0, interval - (time.perf_counter() - now)))
+        except Exception:
+            self.send_errors += 1
+        finally:
+            # Give in-flight acks a moment before closing
+            await asyncio.sleep(min(1.0, interval))
+            receiver.cancel()
+            await ws.close()
+
+    async def run(self):
+        n_attackers = int(self.args.scooters * self.args.attack_fraction)
+        attack_types = self.args.attack_types.split(",")
+        connect_slots = asyncio.Semaphore(self.args.connect_concurrency)
+
+        self.started_at = time.perf_counter() + 2.0  # time for connections to open
+        tasks = [
+            asyncio.create_task(self.scooter(
+                i,
+                random.choice(attack_types) if i < n_attackers else None,
+                connect_slots
+            ))
+            for i in range(self.args.scooters)
+        ]
+        await asyncio.gather(*tasks)
+        return self.report(n_attackers)
+
+    def report(self, n_attackers):
+        elapsed = max(1e-9, self.args.duration)
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {
+                "url": self.args.url,
+                "scooters": self.args.scooters,
+                "rate_per_scooter": self.args.rate,
+                "duration_s": self.args.duration,
+                "attackers": n_attackers,
+                "attack_types": self.args.attack_types,
+                "attack_after_s": self.args.attack_after
+            },
+            "frames_sent": self.frames_sent,
+            "acks_received": self.acks_received,
+            "connect_errors": self.connect_errors,
+            "send_errors": self.send_errors,
+            "throughput_acks_per_s": round(self.acks_received / elapsed, 2),
+            "ack_latency": percentiles(self.ack_latencies),
+        }
+
+        if self.attack_started_at is not None:
+            report["attack_detection_delay_ms"] = (
+                round((min(self.attack_detected_at) - self.attack_started_at) * 1000, 3)
+                if self.attack_detected_at else None
+            )
+            if self.safe_mode_at:
+                report["safe_mode_propagation"] = {
+                    "clients_notified": len(self.safe_mode_at),
+                    "first_after_attack_ms": round((min(self.safe_mode_at) - self.attack_started_at) * 1000, 3),
+                    "fanout_spread_ms": round((max(self.safe_mode_at) - min(self.safe_mode_at)) * 1000, 3)
+                }
+            else:
+                report["safe_mode_propagation"] = None
+        return report
+
+def spawn_server(port):
+    """Start a local uvicorn instance of the backend and wait until it is healthy"""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1)
+            return server
+        except Exception:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Backend did not become healthy")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Smart Scooter backend load test")
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--scooters", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1.0, help="frames per second per scooter")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of traffic")
+    parser.add_argument("--attack-fraction", type=float, default=0.0, help="fraction of scooters that attack")
+    parser.add_argument("--attack-types", default="gps,speed,pattern", help="comma-separated attack types")
+    parser.add_argument("--attack-after", type=float, default=10.0, help="seconds before attackers switch")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--spawn-server", action="store_true", help="start a local uvicorn backend")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--report", help="write the JSON report to this file")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    for attack_type in args.attack_types.split(","):
+        if attack_type not in ATTACK_TEMPLATES:
+            raise SystemExit(f"Unknown attack type: {attack_type}")
+
+    server = None
+    if args.spawn_server:
+        server = spawn_server(args.port)
+        args.url = f"ws://127.0.0.1:{args.port}/ws"
+
+    try:
+        report = asyncio.run(LoadTest(args).run())
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
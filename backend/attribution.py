@@ -0,0 +1,42 @@
+"""Which signals and timesteps a window's reconstruction error comes from.
+
+The anomaly score is driven by the MSE over a [timesteps, features]
+window. The column means of the squared error are the per-feature errors
+and the row means are the per-timestep errors; both average back to the
+MSE. They are computed from the reconstruction the forward pass already
+returns, so attribution costs no extra model call.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Telemetry layout sent by the frontend
+FEATURE_NAMES = ("speed", "acceleration", "lateral_acceleration", "vertical_acceleration",
+                 "gps_lat_delta", "gps_lon_delta")
+
+def error_attribution(windows, reconstructed) -> Tuple[np.ndarray, np.ndarray]:
+    """(feature_errors [batch, features], timestep_errors [batch, timesteps]) as float32.
+
+    `windows` is one window [timesteps, features] or a batch of them;
+    `reconstructed` may be flattened, as predict_anomaly returns it.
+    """
+    windows = np.asarray(windows, dtype=np.float32)
+    timesteps, features = windows.shape[-2:]
+    squared = np.square(windows.reshape(-1, timesteps, features)
+                        - np.asarray(reconstructed, dtype=np.float32).reshape(-1, timesteps, features))
+    return squared.mean(axis=1), squared.mean(axis=2)
+
+def summarize(feature_errors: np.ndarray, timestep_errors: np.ndarray) -> Dict:
+    """Attribution of one window, as kept with each decision"""
+    return {
+        "feature_errors": feature_errors,
+        "timestep_errors": timestep_errors,
+        "top_feature": FEATURE_NAMES[int(feature_errors.argmax())],
+        "top_timestep": int(timestep_errors.argmax())
+    }
+
+def feature_breakdown(attribution: Optional[Dict]) -> Optional[Dict[str, float]]:
+    """Per-feature errors by name, for persisted events"""
+    if attribution is None:
+        return None
+    return dict(zip(FEATURE_NAMES, attribution["feature_errors"].tolist()))
@@ -0,0 +1,277 @@
+"""Micro-benchmarks for the backend hot paths.
+
+Usage:
+    python benchmark.py run --output bench_baseline.json
+    python benchmark.py run --output bench_new.json --filter model
+    python benchmark.py compare bench_baseline.json bench_new.json --threshold 0.10
+
+`compare` exits with status 1 if any benchmark got slower than the
+threshold (relative change in median time per operation).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import numpy as np
+
+MODEL_BATCH_SIZES = (1, 8, 64, 256, 1024)
+BROADCAST_FANOUT = (10, 100, 1000)
+HISTORY_SIZE = 1000
+
+class MockSocket:
+    """Stand-in WebSocket that accepts sends without I/O"""
+    async def send_json(self, message):
+        pass
+
+    async def send_text(self, message):
+        pass
+
+    async def send_bytes(self, message):
+        pass
+
+    async def accept(self):
+        pass
+
+def measure(fn, ops_per_call=1, repeats=7, min_time=0.2):
+    """Time a callable; returns median seconds per operation over repeats"""
+    # Calibrate the number of calls per repeat
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeats or calls >= 1_000_000:
+            break
+        calls *= 2
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        timings.append((time.perf_counter() - start) / (calls * ops_per_call))
+
+    median = statistics.median(timings)
+    return {
+        "median_s": median,
+        "min_s": min(timings),
+        "stdev_s": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "ops_per_s": 1.0 / median if median > 0 else None,
+        "calls_per_repeat": calls,
+        "ops_per_call": ops_per_call
+    }
+
+def run_async(coro_fn):
+    """Wrap a coroutine function so each call runs it on one shared loop"""
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(coro_fn())
+
+def normal_frame():
+    return list(np.random.randn(6) * 0.1 + [33.5, 0.0, 0.0, 9.8, 0.0, 0.0])
+
+def bench_model(results):
+    import main
+    from model import LSTMAutoencoder
+
+    model = main.ml_model if main.ml_model is not None and main.ml_model.model is not None else None
+    if model is None:
+        model = LSTMAutoencoder()
+        model.build_model()
+
+    window = np.random.randn(model.timesteps, model.n_features)
+    results["model.predict_anomaly[1]"] = measure(lambda: model.predict_anomaly(window), repeats=5)
+
+    # Attribution reuses the reconstruction; compare with the forward pass above
+    from attribution import error_attribution, summarize
+    _, _, reconstructed = model.predict_anomaly(window)
+    results["model.error_attribution[1]"] = measure(
+        lambda: summarize(*(errors[0] for errors in error_attribution(window, reconstructed)))
+    )
+
+    for batch_size in MODEL_BATCH_SIZES:
+        batch = np.random.randn(batch_size, model.timesteps, model.n_features)
+        results[f"model.predict_anomaly_batch[{batch_size}]"] = measure(
+            lambda: model.predict_anomaly_batch(batch), ops_per_call=batch_size, repeats=5
+        )
+
+def bench_state(results):
+    import main
+
+    saved_model = main.ml_model
+    main.ml_model = None  # only the window construction path runs
+    frame = normal_frame()
+    try:
+        results["detect_anomaly.window"] = measure(run_async(lambda: main.detect_anomaly(frame, "bench")))
+    finally:
+        main.ml_model = saved_model
+        main.telemetry_buffers.pop("bench", None)
+
+    results["update_shared_state"] = measure(main.update_shared_state)
+
+def bench_broadcast(results):
+    import main
+
+    message = {"type": "COUNTDOWN_UPDATE", "countdown": 5}
+    for fanout in BROADCAST_FANOUT:
+        manager = main.ConnectionManager()
+        outboxes = []
+
+        async def connect():
+            for _ in range(fanout):
+                await manager.connect(MockSocket())
+            outboxes.extend(manager.active_connections.values())
+
+        async def broadcast_and_drain():
+            # Queue on every connection, then let the writers flush
+            await manager.broadcast(message)
+            while any(outbox.urgent for outbox in outboxes):
+                await asyncio.sleep(0)
+
+        # Writer tasks live on the loop they were started on
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(connect())
+        results[f"broadcast[{fanout}]"] = measure(
+            lambda: loop.run_until_complete(broadcast_and_drain()), ops_per_call=fanout
+        )
+        for websocket in list(manager.active_connections):
+            manager.disconnect(websocket)
+        loop.close()
+
+def bench_json(results):
+    import main
+    from serialization import SERIALIZERS, get_serializer
+
+    saved = {key: main.shared_state[key] for key in ("telemetry_history", "ml_decisions")}
+    main.shared_state["telemetry_history"] = [
+        {
+            "timestamp": "2026-01-01T00:00:00.000000",
+            "device_id": "bench",
+            "data": normal_frame(),
+            # NumPy scalars, as predict_anomaly returns them
+            "anomaly_score": np.float32(np.random.rand()),
+            "reconstruction_error": np.float32(np.random.rand() * 0.1),
+            "system_state": "NORMAL"
+        }
+        for _ in range(HISTORY_SIZE)
+    ]
+    main.shared_state["ml_decisions"] = [
+        {
+            "timestamp": "2026-01-01T00:00:00.000000",
+            "anomaly_score": float(np.random.rand()),
+            "decision": "NORMAL",
+            "threshold_exceeded": False
+        }
+        for _ in range(HISTORY_SIZE)
+    ]
+    try:
+        results["json.system_state"] = measure(run_async(main.get_system_state))
+        for name in SERIALIZERS:
+            try:
+                serializer = get_serializer(name)
+            except ImportError:
+                continue
+            results[f"json.encode_shared_state[{name}]"] = measure(lambda: serializer.dumps(main.shared_state))
+    finally:
+        main.shared_state.update(saved)
+
+    # Client frame decoding: dict walking after json.loads vs the typed decoder
+    from messages import decode
+    frame = json.dumps({"type": "TELEMETRY", "device_id": "bench", "data": normal_frame(),
+                        "timestamp": "2026-01-01T00:00:00.000Z"})
+
+    def dict_walk():
+        data = json.loads(frame)
+        if data.get("type") == "TELEMETRY":
+            return data.get("data", []), data.get("device_id", "default")
+
+    results["json.decode_telemetry[receive_json]"] = measure(dict_walk)
+    results["json.decode_telemetry[messages]"] = measure(lambda: decode(frame))
+
+BENCHMARKS = {
+    "model": bench_model,
+    "state": bench_state,
+    "broadcast": bench_broadcast,
+    "json": bench_json,
+}
+
+def run(args):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        print(f"Running {name} benchmarks...")
+        bench(results)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor()
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        print(f"  {name:45s} {result['median_s'] * 1e6:12.3f} us/op")
+    print(f"Results written to {args.output}")
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.candidate) as f:
+        candidate = json.load(f)["results"]
+
+    regressions = []
+    for name in sorted(set(baseline) & set(candidate)):
+        old = baseline[name]["median_s"]
+        new = candidate[name]["median_s"]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif change < -args.threshold:
+            flag = "improved"
+        print(f"{name:45s} {old * 1e6:12.3f} -> {new * 1e6:12.3f} us/op  {change:+8.1%}  {flag}")
+
+    for name in sorted(set(baseline) ^ set(candidate)):
+        print(f"{name:45s} only in {'baseline' if name in baseline else 'candidate'}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run benchmarks and store results as JSON")
+    run_parser.add_argument("--output", default="bench_results.json")
+    run_parser.add_argument("--filter", help="only run benchmark groups containing this string")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="relative slowdown that counts as a regression")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import metrics
+
+# Timeline events that count as attacks in /api/attack-history
+ATTACK_EVENTS = ("ATTACK_DETECTED", "ATTACK_SIMULATION_STARTED", "EMERGENCY_ATTACK")
+MITIGATION_EVENT = "SAFE_MODE_ACTIVATED"
+RESET_EVENT = "SYSTEM_RESET"
+# Largest SQLite rowid
+MAX_ROW_ID = 2 ** 63 - 1
+# Kept even when the write queue is full
+STATE_EVENTS = ATTACK_EVENTS + (MITIGATION_EVENT, RESET_EVENT)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    event TEXT NOT NULL,
+    device_id TEXT,
+    attack_type TEXT,
+    anomaly_score REAL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_event_id ON events (event, id);
+CREATE INDEX IF NOT EXISTS events_device_id ON events (device_id, id);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+"""
+
+events_written = metrics.registry.register(metrics.Counter(
+    "scooter_events_written_total", "Timeline events persisted to the event store"))
+events_dropped = metrics.registry.register(metrics.Counter(
+    "scooter_events_dropped_total", "Non-state timeline events dropped because the write queue was full"))
+events_overflowed = metrics.registry.register(metrics.Gauge(
+    "scooter_event_overflow", "State events waiting for room in the full write queue"))
+event_write_seconds = metrics.registry.register(metrics.Histogram(
+    "scooter_event_write_seconds", "Time to commit one batch of events"))
+
+def to_epoch(timestamp) -> float:
+    """Epoch seconds from a number, a numeric string or an ISO-8601 string"""
+    if timestamp is None:
+        return time.time()
+    try:
+        return float(timestamp)
+    except ValueError:
+        return datetime.fromisoformat(timestamp).timestamp()
+
+class EventStore:
+    """Append-only SQLite store for timeline events.
+
+    record() only enqueues; a background task commits queued events in
+    batches (one transaction per batch) from a worker thread, so the event
+    loop never waits on disk. WAL mode lets queries run while a batch is
+    being written. Pages are keyset-paginated on the row id, newest first,
+    so a page costs the same whether the table holds a thousand or
+    millions of events. When the queue is full, other events are dropped
+    but state events wait in an overflow list. Each batch the writer takes
+    frees queue slots that the overflow moves into, and once it is empty
+    every event is queued again.
+
+    The overflow list is unbounded, so state events are never lost, but a
+    store that stops writing (disk full, locked database) while state
+    events keep coming grows it without limit; watch scooter_event_overflow.
+    """
+
+    def __init__(self, path: str, max_queue: int = 100000, batch_size: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflow: List[Dict] = []
+        self.task = None
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        self.counts: Dict[str, int] = dict(conn.execute("SELECT event, COUNT(*) FROM events GROUP BY event"))
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL allows a writer and readers at the same time"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, event: Dict):
+        """Queue an event for persistence without blocking"""
+        # Once events overflow, later ones follow them so the write order stays the event order
+        if self.overflow or self.queue.full():
+            if event["event"] not in STATE_EVENTS:
+                events_dropped.inc()
+                return
+            self.overflow.append(event)
+            events_overflowed.set(len(self.overflow))
+        else:
+            self.queue.put_nowait(event)
+        self.counts[event["event"]] = self.counts.get(event["event"], 0) + 1
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._writer())
+
+    async def stop(self):
+        """Stop the writer and flush whatever is still queued"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        batch = self._drain([])
+        while batch:
+            await asyncio.to_thread(self._write, batch)
+            batch = self._drain([])
+
+    def _drain(self, batch: List[Dict]) -> List[Dict]:
+        while len(batch) < self.batch_size:
+            if self.queue.empty():
+                if not self.overflow:
+                    break
+                self._requeue_overflow()
+            batch.append(self.queue.get_nowait())
+        self._requeue_overflow()
+        return batch
+
+    def _requeue_overflow(self):
+        """Move overflowed events into free queue slots, behind the older events already queued"""
+        room = self.queue.maxsize - self.queue.qsize()
+        if room > 0 and self.overflow:
+            for event in self.overflow[:room]:
+                self.queue.put_nowait(event)
+            del self.overflow[:room]
+            events_overflowed.set(len(self.overflow))
+
+    async def _writer(self):
+        while True:
+            # Events queued while the previous batch was committing form the next batch
+            batch = self._drain([await self.queue.get()])
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} events: {e}")
+
+    def _write(self, batch: List[Dict]):
+        rows = [(
+            to_epoch(event.get("timestamp")),
+            event["event"],
+            event.get("device_id"),
+            event.get("attack_type"),
+            event.get("anomaly_score"),
+            json.dumps(event, default=str)
+        ) for event in batch]
+
+        start = time.perf_counter()
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO events (ts, event, device_id, attack_type, anomaly_score, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        event_write_seconds.observe(time.perf_counter() - start)
+        events_written.inc(len(rows))
+
+    def query(self, event_types: Optional[List[str]] = None, device_id: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              before_id: Optional[int] = None, limit: int = 50) -> List[Dict]:
+        """Newest-first page of events; blocking, run it off the event loop.
+
+        Each row carries `mitigated`: whether safe mode was activated at
+        or after the event, before the next attack or reset, and for the
+        same device when both events name one.
+        """
+        conn = self._connection()
+        clauses, params = [], []
+        if event_types:
+            clauses.append(f"e.event IN ({', '.join('?' * len(event_types))})")
+            params.extend(event_types)
+        if device_id is not None:
+            clauses.append("e.device_id = ?")
+            params.append(device_id)
+        # Events are logged as they happen, so id order follows time order:
+        # turn time bounds into id bounds and keep scanning the primary key
+        if since is not None:
+            clauses.append("e.id >= ? AND e.ts >= ?")
+            params.extend([self._first_id_at(conn, since), since])
+        if until is not None:
+            clauses.append("e.id < ? AND e.ts < ?")
+            params.extend([self._first_id_at(conn, until), until])
+        if before_id is not None:
+            clauses.append("e.id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        boundaries = ATTACK_EVENTS + (RESET_EVENT,)
+        sql = (
+            "SELECT e.id, e.payload, EXISTS ("
+            "SELECT 1 FROM events s WHERE s.event = ? AND s.id >= e.id "
+            "AND (s.device_id IS NULL OR e.device_id IS NULL OR s.device_id = e.device_id) "
+            f"AND s.id < COALESCE((SELECT MIN(n.id) FROM events n WHERE n.event IN ({', '.join('?' * len(boundaries))}) "
+            "AND n.id > e.id), ?)) "
+            f"FROM events e {where} ORDER BY e.id DESC LIMIT ?"
+        )
+        # The open-ended bound is a constant so the index range scan stays bounded
+        rows = conn.execute(sql, [MITIGATION_EVENT, *boundaries, MAX_ROW_ID, *params, limit]).fetchall()
+
+        events = []
+        for row_id, payload, mitigated in rows:
+            event = json.loads(payload)
+            event["id"] = row_id
+            event["mitigated"] = bool(mitigated)
+            events.append(event)
+        return events
+
+    @staticmethod
+    def _first_id_at(conn: sqlite3.Connection, ts: float) -> int:
+        """Id of the first event at or after ts (past the end if none)"""
+        row = conn.execute("SELECT id FROM events WHERE ts >= ? ORDER BY ts LIMIT 1", (ts,)).fetchone()
+        if row is not None:
+            return row[0]
+        return conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM events").fetchone()[0]
@@ -0,0 +1,115 @@
+import heapq
+import itertools
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from state_machine import ATTACK_THRESHOLD, CRITICAL_THRESHOLD
+
+def classify_score(score: float) -> str:
+    """Classify a device by its latest anomaly score"""
+    if score > CRITICAL_THRESHOLD:
+        return "SAFE_MODE"
+    if score > ATTACK_THRESHOLD:
+        return "ATTACK_DETECTED"
+    return "NORMAL"
+
+class FleetAggregator:
+    """Incrementally maintained fleet statistics.
+
+    Every score update adjusts running counters, so a summary request
+    never scans per-device sessions:
+      - state counts and a fixed-bin score histogram are updated by
+        removing the device's previous contribution and adding the new one
+      - the most anomalous devices come from a lazy max-heap; stale heap
+        entries are skipped on read and the heap is compacted when it
+        grows well past the number of devices
+    """
+
+    def __init__(self, n_bins: int = 10, top_k: int = 10):
+        self.n_bins = n_bins
+        self.top_k = top_k
+        self.bin_edges = np.linspace(0.0, 1.0, n_bins + 1)
+        self.histogram = [0] * n_bins
+        self.state_counts: Dict[str, int] = {}
+        self.devices: Dict[str, Tuple[float, str, int]] = {}
+        self.score_sum = 0.0
+        self.total_updates = 0
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+
+    def _bin(self, score: float) -> int:
+        return min(max(int(score * self.n_bins), 0), self.n_bins - 1)
+
+    def update(self, device_id: str, score: float, state: str = None):
+        """Record the latest anomaly score for a device"""
+        score = float(score)
+        state = state or classify_score(score)
+
+        previous = self.devices.get(device_id)
+        if previous is not None:
+            prev_score, prev_state, _ = previous
+            self.histogram[self._bin(prev_score)] -= 1
+            self.state_counts[prev_state] -= 1
+            self.score_sum -= prev_score
+
+        seq = next(self._seq)
+        self.devices[device_id] = (score, state, seq)
+        self.histogram[self._bin(score)] += 1
+        self.state_counts[state] = self.state_counts.get(state, 0) + 1
+        self.score_sum += score
+        self.total_updates += 1
+
+        heapq.heappush(self._heap, (-score, seq, device_id))
+        if len(self._heap) > 4 * len(self.devices) + 64:
+            self._compact()
+
+    def remove(self, device_id: str):
+        """Drop a device from the fleet statistics"""
+        previous = self.devices.pop(device_id, None)
+        if previous is None:
+            return
+        prev_score, prev_state, _ = previous
+        self.histogram[self._bin(prev_score)] -= 1
+        self.state_counts[prev_state] -= 1
+        self.score_sum -= prev_score
+
+    def _compact(self):
+        self._heap = [(-score, seq, device_id) for device_id, (score, _, seq) in self.devices.items()]
+        heapq.heapify(self._heap)
+
+    def _is_current(self, entry) -> bool:
+        _, seq, device_id = entry
+        current = self.devices.get(device_id)
+        return current is not None and current[2] == seq
+
+    def top_devices(self, n: int = None) -> List[Dict]:
+        """Return the n most anomalous devices by latest score"""
+        n = n or self.top_k
+        popped = []
+        top = []
+        while self._heap and len(top) < n:
+            entry = heapq.heappop(self._heap)
+            if not self._is_current(entry):
+                continue
+            popped.append(entry)
+            score, state, _ = self.devices[entry[2]]
+            top.append({"device_id": entry[2], "anomaly_score": score, "state": state})
+        for entry in popped:
+            heapq.heappush(self._heap, entry)
+        return top
+
+    def summary(self, top_n: int = None) -> Dict:
+        """Fleet summary for the admin dashboard"""
+        device_count = len(self.devices)
+        return {
+            "device_count": device_count,
+            "state_counts": {state: count for state, count in self.state_counts.items() if count},
+            "mean_anomaly_score": self.score_sum / device_count if device_count else 0.0,
+            "score_histogram": {
+                "bin_edges": self.bin_edges.tolist(),
+                "counts": list(self.histogram)
+            },
+            "top_devices": self.top_devices(top_n),
+            "total_updates": self.total_updates
+        }
@@ -0,0 +1,49 @@
+import numpy as np
+
+# State codes used for vectorized health computation
+STATE_CODES = {
+    "NORMAL": 0,
+    "ATTACK_DETECTED": 1,
+    "SAFE_MODE": 2,
+    "ATTACK_SIMULATION": 3,
+}
+
+# Health penalty per state code (indexed by STATE_CODES value)
+STATE_PENALTIES = np.array([0.0, 15.0, 30.0, 0.0])
+
+def encode_states(states):
+    """Map a sequence of state names to integer state codes"""
+    return np.fromiter(
+        (STATE_CODES.get(state, 0) for state in states),
+        dtype=np.int8,
+        count=len(states)
+    )
+
+def calculate_health_scores(anomaly_scores, reconstruction_errors, state_codes):
+    """Calculate health scores for whole arrays of points in one pass.
+
+    Same formula as the per-point dashboard calculation:
+    base health (100 * (1 - anomaly)) minus a reconstruction error
+    penalty (capped at 20) minus a state penalty, clipped to 0-100.
+    """
+    anomaly_scores = np.asarray(anomaly_scores, dtype=np.float64)
+    reconstruction_errors = np.asarray(reconstruction_errors, dtype=np.float64)
+    state_codes = np.asarray(state_codes, dtype=np.intp)
+
+    base_health = np.maximum(0.0, 100.0 * (1.0 - anomaly_scores))
+    error_penalty = np.minimum(20.0, reconstruction_errors * 1000.0)
+    state_penalty = STATE_PENALTIES[state_codes]
+
+    return np.clip(base_health - error_penalty - state_penalty, 0.0, 100.0)
+
+def calculate_health_score(data):
+    """Calculate system health score for a single state dict (served as shared_state["health_score"])"""
+    if not data:
+        return 0
+
+    health = calculate_health_scores(
+        [data.get('anomaly_score', 0)],
+        [data.get('reconstruction_error', 0)],
+        encode_states([data.get('system_state', 'NORMAL')])
+    )
+    return float(health[0])
@@ -0,0 +1,114 @@
+"""Load test: delivery latency of state events under bulk telemetry traffic.
+
+Simulated clients each get a stream of TELEMETRY_ACKs while state events
+are broadcast to all of them at a fixed interval. Every socket write takes
+--write-ms, so with the default rates the clients cannot keep up with the
+acks and their outbound queues stay full. State events are published to
+a device topic every client subscribes to, the path ATTACK_DETECTED and
+countdown events take. Reports queue-to-client latency
+of the state events and exits with status 1 if p99 exceeds --budget-ms.
+
+    python loadtest.py --clients 50 --ack-rate 400 --duration 10
+    python loadtest.py --fifo    # state events queued behind the acks, for comparison
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import numpy as np
+
+LOAD_TEST_DEVICE = "load-test"
+
+class SlowSocket:
+    """Client whose every write takes `write_s`; records when state events arrive"""
+
+    def __init__(self, write_s: float, latencies: list):
+        self.write_s = write_s
+        self.latencies = latencies
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, payload: str):
+        await asyncio.sleep(self.write_s)
+        if '"load_test_seq"' in payload:
+            self.latencies.append(time.perf_counter() - json.loads(payload)["queued_at"])
+
+async def run(args) -> dict:
+    from main import ConnectionManager
+    from serialization import dumps_text
+    from topics import device_topic
+
+    manager = ConnectionManager()
+    latencies = []
+    sockets = [SlowSocket(args.write_ms / 1000, latencies) for _ in range(args.clients)]
+    for websocket in sockets:
+        await manager.connect(websocket)
+        manager.subscribe(websocket, device_topic(LOAD_TEST_DEVICE))
+
+    async def acks():
+        interval = 1.0 / args.ack_rate
+        ack = {"type": "TELEMETRY_ACK", "state": "NORMAL", "anomaly_score": 0.01}
+        while True:
+            for websocket in sockets:
+                manager.send(websocket, ack)
+            await asyncio.sleep(interval)
+
+    producer = asyncio.create_task(acks())
+    sent = 0
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(args.event_interval)
+        message = {"type": "SYSTEM_STATE", "state": "SAFE_MODE", "load_test_seq": sent,
+                   "queued_at": time.perf_counter()}
+        if args.fifo:
+            payload = dumps_text(message)
+            for outbox in manager.active_connections.values():
+                outbox.put(payload)
+        else:
+            await manager.publish(message, LOAD_TEST_DEVICE)
+        sent += 1
+
+    producer.cancel()
+    # Let queued state events drain before counting what arrived
+    await asyncio.sleep(min(2.0, args.duration))
+    for websocket in sockets:
+        manager.disconnect(websocket)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "mode": "fifo" if args.fifo else "priority",
+        "clients": args.clients,
+        "events_sent": sent * args.clients,
+        "events_delivered": len(latencies),
+        "p50_ms": float(np.percentile(latencies_ms, 50)) if len(latencies) else None,
+        "p99_ms": float(np.percentile(latencies_ms, 99)) if len(latencies) else None,
+        "max_ms": float(latencies_ms.max()) if len(latencies) else None,
+    }
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="State event latency under bulk outbound traffic")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--ack-rate", type=float, default=400, help="acks per second per client")
+    parser.add_argument("--write-ms", type=float, default=3.0, help="time each socket write takes")
+    parser.add_argument("--event-interval", type=float, default=0.1, help="seconds between state events")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="p99 latency budget for state events")
+    parser.add_argument("--fifo", action="store_true", help="queue state events on the bulk lane")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if report["p99_ms"] is None or report["p99_ms"] > args.budget_ms \
+            or report["events_delivered"] < report["events_sent"]:
+        print(f"FAIL: state events over the {args.budget_ms:.0f} ms p99 budget or lost")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,41 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 import asyncio
+import hmac
 import json
+import os
+import time
 import numpy as np
 from datetime import datetime, timedelta
 from enum import Enum
 from typing import Dict, List, Optional
 import uvicorn
 from model import LSTMAutoencoder
+from health_score import calculate_health_score, calculate_health_scores, encode_states
+from fleet import FleetAggregator
+from state_machine import (
+    ATTACK_THRESHOLD, COUNTDOWN_SECONDS, decide, countdown_tick
+)
+import metrics
+from profiler import LoopProfiler, PROFILE_ENABLED
+from adaptive_threshold import AdaptiveThresholds, ADAPTIVE_ENABLED
+from prefilter import CascadeFilter, PREFILTER_ENABLED
+from score_cache import ScoreCache, SCORE_CACHE_ENABLED
+from attribution import FEATURE_NAMES, error_attribution, summarize, feature_breakdown
+from overload import OverloadController, LOAD_SHEDDING_ENABLED, SKIP, STATISTICAL, windows_coalesced
+from model_manager import ModelVersion, ShadowScorer, load_model_version, resolve_model_path
+from attack_bank import AttackBank, fallback_sample
+from scenarios import SCENARIOS, Injection
+from event_store import EventStore, ATTACK_EVENTS, to_epoch
+from serialization import FastJSONResponse, dumps_text
+from messages import MessageError, decode as decode_message
+from outbound import Outbox
+from topics import TopicIndex, device_topic, events_delivered
+from sessions import SessionManager
 import joblib
-import random
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # System State Enum
 class SystemState(str, Enum):
@@ -26,6 +49,28 @@ class AttackRequest(BaseModel):
     attack_type: str
     timestamp: Optional[str] = None
 
+class ModelReloadRequest(BaseModel):
+    # Both relative to the models directory (SCOOTER_MODELS_DIR); paths outside it are rejected
+    model_path: str
+    scaler_path: Optional[str] = None
+    threshold: Optional[float] = None
+    shadow: bool = False
+    shadow_fraction: float = 0.1
+
+# Bounds for one scenario injection; larger requests get a 422
+MAX_SCENARIO_DEVICES = 1000
+MAX_SCENARIO_RATE = 100.0
+MAX_SCENARIO_DURATION = 3600.0
+
+class ScenarioRequest(BaseModel):
+    scenario: str
+    device_ids: Optional[List[str]] = None
+    devices: int = Field(1, ge=1, le=MAX_SCENARIO_DEVICES)
+    rate: float = Field(1.0, gt=0, le=MAX_SCENARIO_RATE)
+    duration: float = Field(30.0, gt=0, le=MAX_SCENARIO_DURATION)
+    params: Dict[str, float] = {}
+    seed: Optional[int] = None
+
 class AttackResponse(BaseModel):
     status: str
     message: str
@@ -35,23 +80,64 @@ class AttackResponse(BaseModel):
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        # Each connection's outbound queues (see outbound.py)
+        self.active_connections: Dict[WebSocket, Outbox] = {}
+        # Topic -> connections, for device-scoped events (see topics.py)
+        self.topics = TopicIndex()
         self.state_history: List[Dict] = []
         
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        outbox = Outbox(websocket)
+        outbox.start()
+        self.active_connections[websocket] = outbox
+        metrics.active_connections.set(len(self.active_connections))
         
     def disconnect(self, websocket: WebSocket):
+        outbox = self.active_connections.pop(websocket, None)
+        if outbox is not None:
+            outbox.close()
+        self.topics.remove(websocket)
+        metrics.active_connections.set(len(self.active_connections))
+    
+    def subscribe(self, websocket: WebSocket, topic: str):
         if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+            self.topics.subscribe(websocket, topic)
+    
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        self.topics.unsubscribe(websocket, topic)
+    
+    def subscriptions(self, websocket: WebSocket) -> List[str]:
+        return sorted(self.topics.topics.get(websocket, ()))
+    
+    def send(self, websocket: WebSocket, message: dict, urgent: bool = False):
+        """Queue a message to one client, on its bulk lane unless urgent"""
+        outbox = self.active_connections.get(websocket)
+        if outbox is not None:
+            outbox.put(dumps_text(message), urgent)
             
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        """Queue a state event for every client on the urgent lane, ahead of bulk replies"""
+        start = time.perf_counter()
+        # Encode once for every connection
+        payload = dumps_text(message)
+        for outbox in self.active_connections.values():
+            outbox.put(payload, urgent=True)
+        metrics.broadcast_seconds.observe(time.perf_counter() - start)
+    
+    async def publish(self, message: dict, device_id: Optional[str]):
+        """Queue a state event for the device's subscribers only; everyone if it has no device"""
+        if device_id is None:
+            await self.broadcast(message)
+            return
+        start = time.perf_counter()
+        payload = dumps_text(message)
+        for websocket in self.topics.audience(device_id):
+            outbox = self.active_connections.get(websocket)
+            if outbox is not None:
+                outbox.put(payload, urgent=True)
+                events_delivered.inc()
+        metrics.broadcast_seconds.observe(time.perf_counter() - start)
     
     def add_state_history(self, state_data: dict):
         self.state_history.append({
@@ -62,21 +148,52 @@ class ConnectionManager:
         if len(self.state_history) > 1000:
             self.state_history = self.state_history[-1000:]
 
+# Served model: the Keras .h5 or an exported .tflite variant (see quantize.py)
+MODEL_PATH = os.environ.get("SCOOTER_MODEL_PATH", "models/lstm_autoencoder.h5")
+# Persistent timeline events (see event_store.py)
+EVENT_DB_PATH = os.environ.get("SCOOTER_EVENT_DB", "data/events.db")
+# Required to SUBSCRIBE to topics; unset, explicit subscriptions are refused
+ADMIN_TOKEN = os.environ.get("SCOOTER_ADMIN_TOKEN")
+
 # Global state
 system_state = SystemState.NORMAL
 anomaly_score = 0.0
 reconstruction_error = 0.0
+attribution = None
+# Device whose anomaly started the current incident; None for admin-triggered ones
+incident_device = None
 safe_mode_timer = None
 attack_timeline = []
 ml_model = None
+model_version = None
+shadow_scorer = None
+model_reload_task = None
+attack_bank = None
+scenario_injections: Dict[int, Injection] = {}
+event_store = None
 connection_manager = ConnectionManager()
-telemetry_buffer = []
+telemetry_buffers: Dict[str, List[List[float]]] = {}
+# Devices with a window in the model: one at a time, so results land in order
+scoring_devices = set()
+fleet_aggregator = FleetAggregator()
+loop_profiler = LoopProfiler() if PROFILE_ENABLED else None
+adaptive_thresholds = AdaptiveThresholds() if ADAPTIVE_ENABLED else None
+cascade_filter = CascadeFilter.from_env() if PREFILTER_ENABLED else None
+score_cache = ScoreCache.from_env() if SCORE_CACHE_ENABLED else None
+overload = OverloadController.from_env(cascade_filter or CascadeFilter.from_env()) if LOAD_SHEDDING_ENABLED else None
+sessions = SessionManager.from_env()
+metrics.devices_by_state.collect = lambda: {
+    state: count for state, count in fleet_aggregator.state_counts.items() if count
+}
 
 # Shared state for admin dashboard
 shared_state = {
     "system_state": system_state.value,
     "anomaly_score": anomaly_score,
     "reconstruction_error": reconstruction_error,
+    "error_attribution": attribution,
+    "feature_names": list(FEATURE_NAMES),
+    "health_score": 100.0,
     "threshold": 0.8,
     "safe_mode_countdown": None,
     "attack_timeline": attack_timeline,
@@ -86,19 +203,40 @@ shared_state = {
     "last_update": datetime.now().isoformat()
 }
 
+# Per-device state released when a device's session is evicted (see sessions.py)
+sessions.register("window", lambda device_id: telemetry_buffers.pop(device_id, None))
+sessions.register("fleet", fleet_aggregator.remove)
+sessions.register("group", lambda device_id: connection_manager.topics.set_group(device_id, None))
+if adaptive_thresholds is not None:
+    # Baselines take hundreds of windows to learn: spill them for returning devices
+    sessions.register("baseline", adaptive_thresholds.forget,
+                      snapshot=adaptive_thresholds.devices.get, restore=adaptive_thresholds.restore)
+if score_cache is not None:
+    sessions.register("score_cache", score_cache.forget)
+if overload is not None:
+    sessions.register("overload", overload.forget)
+
+async def close_silent_connection(websocket: WebSocket):
+    """Heartbeat timeout: release the connection and close it"""
+    connection_manager.disconnect(websocket)
+    try:
+        await websocket.close(code=1001)
+    except Exception:
+        pass
+
+sessions.on_timeout = close_silent_connection
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global ml_model
+    global ml_model, model_version, event_store
     print("Loading ML model...")
     try:
         ml_model = LSTMAutoencoder()
         # Try to load pre-trained model
-        import os
-        if os.path.exists('models/lstm_autoencoder.h5'):
-            from tensorflow.keras.models import load_model
-            ml_model.model = load_model('models/lstm_autoencoder.h5')
-            ml_model.scaler = joblib.load('models/scaler.pkl')
+        if os.path.exists(MODEL_PATH):
+            ml_model = load_model_version(MODEL_PATH)
+            model_version = ModelVersion(ml_model, MODEL_PATH)
             print("ML model loaded successfully")
             shared_state["ml_connected"] = True
         else:
@@ -108,20 +246,41 @@ async def lifespan(app: FastAPI):
             # Generate some training data
             X_train = np.random.randn(100, 10, 6)
             ml_model.fit(X_train, epochs=10)
+            model_version = ModelVersion(ml_model, 'demo-training')
             shared_state["ml_connected"] = True
     except Exception as e:
         print(f"Error loading model: {e}")
         shared_state["ml_connected"] = False
     
+    if ml_model is not None and ml_model.model is not None:
+        shared_state["threshold"] = float(ml_model.threshold)
+        await refresh_attack_bank(ml_model)
+    
+    try:
+        event_store = EventStore(EVENT_DB_PATH)
+        event_store.start()
+    except Exception as e:
+        print(f"Error opening event store {EVENT_DB_PATH}: {e}")
+    
+    sessions.start()
+    
     # Start background task for state management
     asyncio.create_task(state_manager())
+    asyncio.create_task(metrics.monitor_event_loop_lag())
+    if loop_profiler:
+        loop_profiler.start(asyncio.get_running_loop())
     
     yield
     
     # Cleanup
+    if loop_profiler:
+        loop_profiler.stop()
+    await sessions.stop()
+    if event_store is not None:
+        await event_store.stop()
     print("Shutting down...")
 
-app = FastAPI(lifespan=lifespan, title="Smart Scooter ML Backend")
+app = FastAPI(lifespan=lifespan, title="Smart Scooter ML Backend", default_response_class=FastJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -132,17 +291,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def log_event(event: Dict):
+    """Append to the in-memory timeline and persist to the event store"""
+    attack_timeline.append(event)
+    if len(attack_timeline) > 1000:
+        # Trim in place: shared_state holds a reference to this list
+        del attack_timeline[:-1000]
+    if event_store is not None:
+        event_store.record(event)
+
 def update_shared_state():
     """Update shared state for all components"""
     shared_state.update({
         "system_state": system_state.value,
         "anomaly_score": anomaly_score,
         "reconstruction_error": reconstruction_error,
+        "error_attribution": attribution,
         "safe_mode_countdown": safe_mode_timer,
         "attack_timeline": attack_timeline,
         "last_update": datetime.now().isoformat(),
         "ml_connected": ml_model is not None
     })
+    # Served precomputed, so the dashboard needs no backend code
+    shared_state["health_score"] = calculate_health_score(shared_state)
 
 async def trigger_safe_mode():
     """Trigger safe mode - called by ML model decision"""
@@ -152,97 +323,66 @@ async def trigger_safe_mode():
     safe_mode_timer = 0
     
     # Log attack timeline
-    attack_timeline.append({
+    log_event({
         "event": "SAFE_MODE_ACTIVATED",
         "timestamp": datetime.now().isoformat(),
         "trigger": "ML_MODEL_DECISION",
-        "anomaly_score": anomaly_score
+        "device_id": incident_device,
+        "anomaly_score": anomaly_score,
+        "top_feature": attribution["top_feature"] if attribution else None,
+        "feature_errors": feature_breakdown(attribution)
     })
     
     update_shared_state()
     
-    # Broadcast to all connected clients
+    # The system state is global, so every client learns it changed
     await connection_manager.broadcast({
         "type": "SYSTEM_STATE",
         "state": system_state.value,
         "message": "SAFE MODE ACTIVATED - ML detected critical anomaly",
         "timestamp": datetime.now().isoformat(),
-        "anomaly_score": anomaly_score
+        "anomaly_score": anomaly_score,
+        "device_id": incident_device
     })
     
     print("SAFE MODE ACTIVATED by ML model")
 
 async def simulate_attack_with_ml(attack_type: str):
-    """Simulate attack and get anomaly score from ML"""
-    global anomaly_score, reconstruction_error, system_state, safe_mode_timer
+    """Simulate attack and get anomaly score from the pre-scored attack bank"""
+    global anomaly_score, reconstruction_error, attribution
     
+    if attack_bank is not None:
+        anomaly_score, reconstruction_error, attribution = attack_bank.sample(attack_type)
+        print(f"ML Anomaly Score for {attack_type}: {anomaly_score:.3f}")
+    else:
+        # No model loaded: fall back to simulated scores
+        anomaly_score, reconstruction_error, attribution = fallback_sample(attack_type)
+        print(f"Simulated Anomaly Score for {attack_type}: {anomaly_score:.3f}")
+    return True
+
+async def refresh_attack_bank(model):
+    """Re-score the simulated attack windows with a newly installed model"""
+    global attack_bank
     try:
-        # Generate abnormal telemetry based on attack type
-        if attack_type.lower() == "gps":
-            abnormal_data = [80, 5.0, 5.0, 15.0, 0.5, 0.5]  # GPS spoofing
-        elif attack_type.lower() == "speed":
-            abnormal_data = [200, 20.0, 20.0, 30.0, 0.01, 0.01]  # Speed injection
-        elif attack_type.lower() == "pattern":
-            abnormal_data = [150, 15.0, -15.0, 25.0, 1.0, -1.0]  # Pattern anomaly
-        elif attack_type.lower() == "emergency":
-            abnormal_data = [300, 50.0, 50.0, 50.0, 2.0, 2.0]  # Emergency attack
-        else:
-            abnormal_data = [100, 10.0, 10.0, 20.0, 0.1, 0.1]  # Generic attack
-        
-        # Create sequence for ML model (10 timesteps)
-        telemetry_sequence = []
-        for i in range(10):
-            # Add some variation to the sequence
-            varied_data = [x + random.uniform(-0.1, 0.1) * x for x in abnormal_data]
-            telemetry_sequence.append(varied_data)
-        
-        data_array = np.array(telemetry_sequence)
-        
-        if ml_model and ml_model.model is not None:
-            # Get anomaly score from ML model
-            ml_score, mse, _ = ml_model.predict_anomaly(data_array)
-            anomaly_score = ml_score
-            reconstruction_error = mse
-            
-            print(f"ML Anomaly Score for {attack_type}: {anomaly_score:.3f}")
-        else:
-            # Fallback to simulated score
-            if attack_type.lower() == "gps":
-                anomaly_score = 0.85 + random.random() * 0.1
-            elif attack_type.lower() == "speed":
-                anomaly_score = 0.75 + random.random() * 0.15
-            elif attack_type.lower() == "pattern":
-                anomaly_score = 0.9 + random.random() * 0.05
-            elif attack_type.lower() == "emergency":
-                anomaly_score = 0.95
-            else:
-                anomaly_score = 0.7 + random.random() * 0.2
-            reconstruction_error = anomaly_score * 0.1
-            
-            print(f"Simulated Anomaly Score for {attack_type}: {anomaly_score:.3f}")
-        
-        return True
-        
+        attack_bank = await asyncio.to_thread(AttackBank.build, model)
     except Exception as e:
-        print(f"Error in ML simulation: {e}")
-        # Fallback to default scores
-        anomaly_score = 0.8 + random.random() * 0.15
-        reconstruction_error = anomaly_score * 0.1
-        return True
+        print(f"Error scoring attack bank: {e}")
+        attack_bank = None
 
 async def start_attack_simulation(attack_type: str):
     """Start attack simulation with 6-second countdown"""
-    global system_state, safe_mode_timer
+    global system_state, safe_mode_timer, incident_device
     
     if system_state == SystemState.SAFE_MODE:
         return False
     
-    # Set to attack simulation state
+    # Set to attack simulation state; admin-triggered, so events go to every client
     system_state = SystemState.ATTACK_SIMULATION
-    safe_mode_timer = 6  # 6-second countdown
+    safe_mode_timer = COUNTDOWN_SECONDS
+    incident_device = None
     
     # Log attack simulation
-    attack_timeline.append({
+    log_event({
         "event": "ATTACK_SIMULATION_STARTED",
         "timestamp": datetime.now().isoformat(),
         "attack_type": attack_type,
@@ -263,12 +403,23 @@ async def start_attack_simulation(attack_type: str):
     print(f"{attack_type} attack simulation started. Countdown: {safe_mode_timer}s")
     return True
 
-async def detect_anomaly(telemetry_data: List[float]):
+def timed_predict(model, window):
+    """Score one window and time the forward pass alone, in the worker thread that runs it"""
+    start = time.perf_counter()
+    result = model.predict_anomaly(window)
+    return result, time.perf_counter() - start
+
+async def detect_anomaly(telemetry_data: List[float], device_id: str = "default", received_at: float = None):
     """Run ML inference and detect anomalies"""
-    global anomaly_score, reconstruction_error, system_state, safe_mode_timer
+    global anomaly_score, reconstruction_error, attribution, system_state, safe_mode_timer, incident_device
+    
+    start = time.perf_counter()
     
     try:
-        # Add to buffer
+        await sessions.touch(device_id)
+        
+        # Add to this device's buffer
+        telemetry_buffer = telemetry_buffers.setdefault(device_id, [])
         telemetry_buffer.append(telemetry_data)
         if len(telemetry_buffer) > 10:
             telemetry_buffer.pop(0)
@@ -278,44 +429,131 @@ async def detect_anomaly(telemetry_data: List[float]):
             data_array = np.array(telemetry_buffer)
             
             if ml_model and ml_model.model is not None:
-                # Get anomaly score from ML model
-                ml_score, mse, _ = ml_model.predict_anomaly(data_array)
-                anomaly_score = ml_score
-                reconstruction_error = mse
+                model = ml_model
+                metrics.inference_preprocess_seconds.observe(time.perf_counter() - start)
+                
+                # Under overload, shed scoring for this window (the buffer keeps the frame)
+                action = None
+                if overload is not None:
+                    last = fleet_aggregator.devices.get(device_id)
+                    action = overload.admit(device_id, last[0] if last else None, data_array)
+                    if action == SKIP:
+                        return
+                elif device_id in scoring_devices:
+                    # Without shedding, still never score two windows of one device at once
+                    windows_coalesced.inc()
+                    return
+                
+                device_threshold = model.threshold
+                if action == STATISTICAL:
+                    # Overloaded: low-risk window cleared by the statistical scorer, not scored
+                    ml_score, mse, window_attribution = None, None, None
+                elif cascade_filter is not None and cascade_filter.check(data_array):
+                    # Clearly normal: skip the LSTM, audit a sample of skips against it
+                    ml_score, mse, window_attribution = None, None, None
+                    cascade_filter.maybe_audit(data_array, model, ATTACK_THRESHOLD)
+                else:
+                    # Stationary or repeated windows reuse the last reconstruction error
+                    cached = score_cache.lookup(device_id, data_array) if score_cache is not None else None
+                    if cached is None:
+                        # Get anomaly score from ML model in a worker thread, keeping the loop free
+                        scoring_devices.add(device_id)
+                        if overload is not None:
+                            overload.started(device_id)
+                        try:
+                            (ml_score, mse, reconstructed), forward_seconds = await asyncio.to_thread(
+                                timed_predict, model, data_array)
+                        finally:
+                            scoring_devices.discard(device_id)
+                            if overload is not None:
+                                overload.finished(device_id)
+                        metrics.inference_forward_seconds.observe(forward_seconds)
+                        metrics.inference_batch_size.observe(1)
+                        # Which signals and timesteps the error comes from, from the same reconstruction
+                        feature_errors, timestep_errors = error_attribution(data_array, reconstructed)
+                        window_attribution = summarize(feature_errors[0], timestep_errors[0])
+                        # A reload during the await cleared the cache: keep the old model's error out of it
+                        if score_cache is not None and model is ml_model:
+                            score_cache.store(device_id, data_array, mse, window_attribution)
+                    else:
+                        mse, window_attribution = cached
+                        ml_score = min(mse / model.threshold, 1.0)
+                    
+                    # Normalize against this device's own baseline
+                    if adaptive_thresholds is not None:
+                        device_threshold = adaptive_thresholds.threshold(device_id, model.threshold)
+                        ml_score = adaptive_thresholds.score(device_id, mse, model.threshold)
+                    
+                    # Candidate model scores a sample of traffic off the hot path; compare on the
+                    # raw model scale, since the candidate has no per-device baseline
+                    if shadow_scorer is not None:
+                        shadow_scorer.maybe_score(data_array, min(mse / model.threshold, 1.0), ATTACK_THRESHOLD)
+                
+                if overload is not None:
+                    overload.observe(time.perf_counter() - (received_at if received_at is not None else start))
                 
-                # Update shared state
+                if ml_score is not None:
+                    anomaly_score = ml_score
+                    reconstruction_error = mse
+                    attribution = window_attribution
+                    
+                    # Update fleet statistics incrementally
+                    fleet_aggregator.update(device_id, ml_score)
+                
+                # Update shared state; a window cleared without the model has no score (None)
                 shared_state["telemetry_history"].append({
                     "timestamp": datetime.now().isoformat(),
+                    "device_id": device_id,
                     "data": telemetry_data,
-                    "anomaly_score": anomaly_score,
-                    "reconstruction_error": mse
+                    "anomaly_score": ml_score,
+                    "reconstruction_error": mse,
+                    "system_state": system_state.value
                 })
+                del shared_state["telemetry_history"][:-1000]
+                
+                if ml_score is None:
+                    # Nothing for the decision logic to act on
+                    update_shared_state()
+                    return
                 
                 # ML Decision Logic
-                if anomaly_score > 0.7 and system_state == SystemState.NORMAL:
+                transition = decide(system_state, anomaly_score)
+                if transition == SystemState.ATTACK_DETECTED:
                     # Attack detected
                     system_state = SystemState.ATTACK_DETECTED
-                    safe_mode_timer = 6  # 6 second countdown
+                    safe_mode_timer = COUNTDOWN_SECONDS
+                    incident_device = device_id
                     
-                    attack_timeline.append({
+                    log_event({
                         "event": "ATTACK_DETECTED",
                         "timestamp": datetime.now().isoformat(),
                         "anomaly_score": anomaly_score,
-                        "threshold": ml_model.threshold,
-                        "trigger": "ML_INFERENCE"
+                        "threshold": device_threshold,
+                        "device_id": device_id,
+                        "trigger": "ML_INFERENCE",
+                        "top_feature": window_attribution["top_feature"] if window_attribution else None,
+                        "feature_errors": feature_breakdown(window_attribution)
                     })
                     
-                    # Broadcast attack detection
-                    await connection_manager.broadcast({
+                    # Attack details and the countdown go to this device's subscribers
+                    await connection_manager.publish({
                         "type": "ATTACK_DETECTED",
                         "anomaly_score": anomaly_score,
                         "countdown": safe_mode_timer,
+                        "device_id": device_id,
                         "message": f"ML detected anomaly! Safe mode in {safe_mode_timer}s"
+                    }, device_id)
+                    # The system state is global, so every client learns it changed
+                    await connection_manager.broadcast({
+                        "type": "SYSTEM_STATE",
+                        "state": system_state.value,
+                        "timestamp": datetime.now().isoformat(),
+                        "device_id": device_id
                     })
                     
                     print(f"ATTACK DETECTED by ML! Score: {anomaly_score:.2f}")
                     
-                elif anomaly_score > 0.9 and system_state == SystemState.ATTACK_DETECTED:
+                elif transition == SystemState.SAFE_MODE:
                     # Immediate safe mode for critical anomalies
                     await trigger_safe_mode()
                 
@@ -324,8 +562,10 @@ async def detect_anomaly(telemetry_data: List[float]):
                     "timestamp": datetime.now().isoformat(),
                     "anomaly_score": anomaly_score,
                     "decision": system_state.value,
-                    "threshold_exceeded": anomaly_score > 0.7
+                    "threshold_exceeded": anomaly_score > ATTACK_THRESHOLD,
+                    "attribution": window_attribution
                 })
+                del shared_state["ml_decisions"][:-1000]
                 
             update_shared_state()
             
@@ -338,33 +578,20 @@ async def state_manager():
     
     while True:
         try:
-            if system_state == SystemState.ATTACK_DETECTED and safe_mode_timer is not None:
-                if safe_mode_timer > 0:
-                    safe_mode_timer -= 1
-                    
-                    # Broadcast countdown update
-                    await connection_manager.broadcast({
-                        "type": "COUNTDOWN_UPDATE",
-                        "countdown": safe_mode_timer
-                    })
-                    
-                    if safe_mode_timer == 0:
-                        # Countdown finished, trigger safe mode
-                        await trigger_safe_mode()
-            
-            elif system_state == SystemState.ATTACK_SIMULATION and safe_mode_timer is not None:
-                if safe_mode_timer > 0:
-                    safe_mode_timer -= 1
-                    
-                    # Broadcast countdown update
-                    await connection_manager.broadcast({
-                        "type": "COUNTDOWN_UPDATE",
-                        "countdown": safe_mode_timer
-                    })
-                    
-                    if safe_mode_timer == 0:
-                        # Countdown finished, trigger safe mode
-                        await trigger_safe_mode()
+            new_timer, countdown_finished = countdown_tick(system_state, safe_mode_timer)
+            if new_timer != safe_mode_timer:
+                safe_mode_timer = new_timer
+                
+                # Countdown update to the incident device's subscribers
+                await connection_manager.publish({
+                    "type": "COUNTDOWN_UPDATE",
+                    "countdown": safe_mode_timer,
+                    "device_id": incident_device
+                }, incident_device)
+                
+                if countdown_finished:
+                    # Countdown finished, trigger safe mode
+                    await trigger_safe_mode()
                 
             update_shared_state()
             await asyncio.sleep(1)
@@ -376,50 +603,100 @@ async def state_manager():
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await connection_manager.connect(websocket)
+    sessions.heartbeat(websocket)
     
     # Send current state on connection
-    await websocket.send_json({
+    connection_manager.send(websocket, {
         "type": "INITIAL_STATE",
         "state": system_state.value,
         "anomaly_score": anomaly_score,
         "ml_connected": shared_state["ml_connected"]
-    })
+    }, urgent=True)
     
     try:
         while True:
-            data = await websocket.receive_json()
+            frame = await websocket.receive()
+            received_at = time.perf_counter()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            # Any frame counts as a heartbeat
+            sessions.heartbeat(websocket)
+            # Text frames from browsers; binary frames decode the same way
+            raw = frame.get("text") if frame.get("text") is not None else frame.get("bytes")
             
-            if data.get("type") == "TELEMETRY":
-                # Process telemetry data
-                telemetry = data.get("data", [])
+            try:
+                message = decode_message(raw)
+            except MessageError as e:
+                # Reject before the frame can reach the model
+                metrics.frames_rejected.inc()
+                connection_manager.send(websocket, {
+                    "type": "ERROR",
+                    "message": str(e)
+                })
+                continue
+            
+            if message.type == "TELEMETRY":
+                metrics.frames_received.inc()
+                # Device events for this scooter come back on this connection
+                connection_manager.subscribe(websocket, device_topic(message.device_id))
                 
                 # Run ML inference
-                await detect_anomaly(telemetry)
+                await detect_anomaly(message.data, message.device_id, received_at)
                 
-                # Echo back with current state
-                await websocket.send_json({
+                # Echo back with current state (bulk lane: state events go first)
+                connection_manager.send(websocket, {
                     "type": "TELEMETRY_ACK",
+                    "seq": message.seq,
                     "state": system_state.value,
                     "anomaly_score": anomaly_score,
                     "timestamp": datetime.now().isoformat()
                 })
                 
-            elif data.get("type") == "PING":
-                await websocket.send_json({
+            elif message.type == "PING":
+                connection_manager.send(websocket, {
                     "type": "PONG",
                     "state": system_state.value,
                     "ml_connected": shared_state["ml_connected"]
                 })
                 
-            elif data.get("type") == "CONNECTION":
-                await websocket.send_json({
+            elif message.type == "CONNECTION":
+                if message.device_id is not None:
+                    connection_manager.subscribe(websocket, device_topic(message.device_id))
+                    if message.group is not None:
+                        # A device keeps its first group; a later CONNECTION cannot re-group it
+                        connection_manager.topics.assign_group(message.device_id, message.group)
+                connection_manager.send(websocket, {
                     "type": "CONNECTION_ACK",
                     "status": "CONNECTED",
-                    "ml_model_ready": ml_model is not None
+                    "ml_model_ready": ml_model is not None,
+                    "topics": connection_manager.subscriptions(websocket)
+                })
+                
+            elif message.type in ("SUBSCRIBE", "UNSUBSCRIBE"):
+                # Admin views: "fleet", "group:<name>" or another "device:<id>". Devices join
+                # their own topic through TELEMETRY/CONNECTION; anything else needs the admin token
+                if message.type == "SUBSCRIBE" and not (
+                        ADMIN_TOKEN and message.token is not None
+                        and hmac.compare_digest(message.token.encode(), ADMIN_TOKEN.encode())):
+                    connection_manager.send(websocket, {
+                        "type": "ERROR",
+                        "message": "SUBSCRIBE requires the admin token (SCOOTER_ADMIN_TOKEN)"
+                    })
+                    continue
+                update = connection_manager.subscribe if message.type == "SUBSCRIBE" else connection_manager.unsubscribe
+                for topic in message.topics:
+                    update(websocket, topic)
+                connection_manager.send(websocket, {
+                    "type": "SUBSCRIPTIONS",
+                    "topics": connection_manager.subscriptions(websocket)
                 })
                 
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also on errors, so a failed handler leaves no dead outbox, subscription or session behind
         connection_manager.disconnect(websocket)
+        sessions.disconnect(websocket)
 
 @app.post("/api/simulate-attack", response_model=AttackResponse)
 async def simulate_attack(attack_request: AttackRequest):
@@ -427,7 +704,7 @@ async def simulate_attack(attack_request: AttackRequest):
     global system_state, safe_mode_timer
     
     if system_state == SystemState.SAFE_MODE:
-        return JSONResponse({
+        return FastJSONResponse({
             "status": "error",
             "message": "Already in safe mode. Refresh page to exit."
         })
@@ -441,7 +718,7 @@ async def simulate_attack(attack_request: AttackRequest):
     
     # Start attack simulation with 6-second countdown
     if await start_attack_simulation(attack_type):
-        return JSONResponse({
+        return FastJSONResponse({
             "status": "success",
             "message": f"{attack_type} attack simulation started. Switching to safe mode in 6 seconds",
             "anomaly_score": anomaly_score,
@@ -449,7 +726,7 @@ async def simulate_attack(attack_request: AttackRequest):
             "state": system_state.value
         })
     else:
-        return JSONResponse({
+        return FastJSONResponse({
             "status": "error",
             "message": "Failed to start attack simulation",
             "anomaly_score": 0.0,
@@ -459,10 +736,10 @@ async def simulate_attack(attack_request: AttackRequest):
 @app.post("/api/emergency-attack", response_model=AttackResponse)
 async def emergency_attack():
     """Endpoint for immediate emergency attack (no countdown)"""
-    global system_state
+    global system_state, incident_device
     
     if system_state == SystemState.SAFE_MODE:
-        return JSONResponse({
+        return FastJSONResponse({
             "status": "error",
             "message": "Already in safe mode. Refresh page to exit."
         })
@@ -473,17 +750,19 @@ async def emergency_attack():
     await simulate_attack_with_ml("emergency")
     
     # Log emergency attack
-    attack_timeline.append({
+    log_event({
         "event": "EMERGENCY_ATTACK",
         "timestamp": datetime.now().isoformat(),
         "trigger": "MANUAL_EMERGENCY",
         "anomaly_score": anomaly_score
     })
     
-    # Immediate safe mode
+    # Immediate safe mode; admin-triggered, so it goes to every client even if
+    # a device's countdown is pending
+    incident_device = None
     await trigger_safe_mode()
     
-    return JSONResponse({
+    return FastJSONResponse({
         "status": "success",
         "message": "EMERGENCY ATTACK! Safe mode activated immediately.",
         "anomaly_score": anomaly_score,
@@ -491,14 +770,81 @@ async def emergency_attack():
         "state": system_state.value
     })
 
+@app.get("/api/scenarios")
+async def list_scenarios():
+    """Registered attack scenarios and their default parameters"""
+    return FastJSONResponse({"scenarios": [entry.describe() for entry in SCENARIOS.values()]})
+
+@app.post("/api/scenarios/inject")
+async def inject_scenario(request: ScenarioRequest):
+    """Stream a scenario's telemetry into one or many device sessions"""
+    entry = SCENARIOS.get(request.scenario)
+    if entry is None:
+        return FastJSONResponse({
+            "status": "error",
+            "message": f"Unknown scenario '{request.scenario}'"
+        }, status_code=404)
+    if request.device_ids is not None and len(request.device_ids) > MAX_SCENARIO_DEVICES:
+        return FastJSONResponse({
+            "status": "error",
+            "message": f"At most {MAX_SCENARIO_DEVICES} devices per injection"
+        }, status_code=400)
+    
+    try:
+        injection = Injection(entry, request.device_ids, request.devices, request.rate,
+                              request.duration, request.params, request.seed)
+    except ValueError as e:
+        return FastJSONResponse({"status": "error", "message": str(e)}, status_code=400)
+    
+    # Keep the most recent injections only
+    for injection_id in [i for i, past in scenario_injections.items() if past.task.done()][:-50]:
+        del scenario_injections[injection_id]
+    
+    score_of = lambda device_id: fleet_aggregator.devices.get(device_id, (0.0,))[0]
+    injection.task = asyncio.create_task(injection.run(detect_anomaly, score_of))
+    scenario_injections[injection.id] = injection
+    
+    log_event({
+        "event": "SCENARIO_INJECTED",
+        "timestamp": datetime.now().isoformat(),
+        "scenario": request.scenario,
+        "injection_id": injection.id,
+        "devices": len(injection.device_ids)
+    })
+    return FastJSONResponse({"status": "success", "injection": injection.describe()})
+
+@app.get("/api/scenarios/injections")
+async def list_injections():
+    """Progress and detection latency of scenario injections"""
+    return FastJSONResponse({"injections": [injection.describe() for injection in scenario_injections.values()]})
+
+@app.delete("/api/scenarios/injections/{injection_id}")
+async def cancel_injection(injection_id: int):
+    """Stop a running scenario injection"""
+    injection = scenario_injections.get(injection_id)
+    if injection is None:
+        return FastJSONResponse({"status": "error", "message": "Unknown injection"}, status_code=404)
+    injection.task.cancel()
+    return FastJSONResponse({"status": "success", "injection": injection.describe()})
+
 @app.post("/api/reset-system")
 async def reset_system():
     """Reset system to normal state (admin only)"""
-    global system_state, anomaly_score, safe_mode_timer, telemetry_buffer
+    global system_state, anomaly_score, attribution, safe_mode_timer, incident_device
     system_state = SystemState.NORMAL
     anomaly_score = 0.0
+    attribution = None
+    incident_device = None
     safe_mode_timer = None
-    telemetry_buffer = []
+    telemetry_buffers.clear()
+    if score_cache is not None:
+        score_cache.clear()
+    
+    # Closes the current incident in /api/attack-history
+    log_event({
+        "event": "SYSTEM_RESET",
+        "timestamp": datetime.now().isoformat()
+    })
     
     update_shared_state()
     
@@ -509,7 +855,7 @@ async def reset_system():
         "message": "System reset to normal mode"
     })
     
-    return JSONResponse({
+    return FastJSONResponse({
         "status": "success",
         "message": "System reset to NORMAL"
     })
@@ -517,29 +863,242 @@ async def reset_system():
 @app.get("/api/system-state")
 async def get_system_state():
     """Get current system state (for admin dashboard)"""
-    return JSONResponse(shared_state)
+    return FastJSONResponse(shared_state)
+
+@app.get("/api/anomaly-history")
+async def get_anomaly_history(limit: int = Query(1000, ge=1, le=1000)):
+    """Get anomaly history with precomputed health scores (for admin charts)"""
+    # Windows cleared without the model have no score to chart
+    history = [entry for entry in shared_state["telemetry_history"] if entry["anomaly_score"] is not None][-limit:]
+    
+    anomaly_scores = np.array([entry["anomaly_score"] for entry in history], dtype=np.float64)
+    reconstruction_errors = np.array([entry["reconstruction_error"] for entry in history], dtype=np.float64)
+    state_codes = encode_states([entry.get("system_state", "NORMAL") for entry in history])
+    health_scores = calculate_health_scores(anomaly_scores, reconstruction_errors, state_codes)
+    
+    return FastJSONResponse({
+        "timestamps": [entry["timestamp"] for entry in history],
+        "anomaly_scores": anomaly_scores.tolist(),
+        "reconstruction_errors": reconstruction_errors.tolist(),
+        "system_states": [entry.get("system_state", "NORMAL") for entry in history],
+        "health_scores": health_scores.tolist(),
+        "threshold": shared_state["threshold"]
+    })
+
+@app.get("/api/attack-history")
+async def get_attack_history(event_types: Optional[str] = None, device_id: Optional[str] = None,
+                             since: Optional[str] = None, until: Optional[str] = None,
+                             cursor: Optional[int] = None, limit: int = 50):
+    """Paginated attack history from the event store, newest first"""
+    if event_store is None:
+        return FastJSONResponse({"status": "error", "message": "Event store unavailable"}, status_code=503)
+    
+    # Comma-separated event names; "all" for every timeline event
+    if event_types == "all":
+        types = None
+    else:
+        types = event_types.split(",") if event_types else list(ATTACK_EVENTS)
+    try:
+        since_ts = to_epoch(since) if since else None
+        until_ts = to_epoch(until) if until else None
+    except ValueError:
+        return FastJSONResponse({"status": "error", "message": "since/until must be epoch seconds or ISO-8601"}, status_code=400)
+    limit = min(max(limit, 1), 1000)
+    
+    events = await asyncio.to_thread(
+        event_store.query, types, device_id, since_ts, until_ts, cursor, limit
+    )
+    for event in events:
+        event["type"] = event.get("attack_type") or event["event"]
+    
+    counts = {name: count for name, count in event_store.counts.items() if types is None or name in types}
+    return FastJSONResponse({
+        "attacks": events,
+        "next_cursor": events[-1]["id"] if len(events) == limit else None,
+        "counts": counts,
+        "total": sum(counts.values()) if device_id is None and since is None and until is None else None
+    })
+
+@app.get("/api/fleet-summary")
+async def get_fleet_summary(top_n: int = 10):
+    """Get aggregated fleet statistics (for admin fleet overview)"""
+    return FastJSONResponse(fleet_aggregator.summary(top_n))
+
+@app.get("/api/devices/{device_id}/threshold")
+async def get_device_threshold(device_id: str):
+    """Get the anomaly threshold currently applied to a device"""
+    default = ml_model.threshold if ml_model else 0.8
+    if adaptive_thresholds is None:
+        return FastJSONResponse({"device_id": device_id, "threshold": default, "adaptive": False})
+    return FastJSONResponse(adaptive_thresholds.describe(device_id, default))
+
+async def install_model(version: ModelVersion):
+    """Make a loaded version the live model"""
+    global ml_model, model_version
+    # Single reference assignment on the event loop: the next window uses the new model
+    ml_model, model_version = version.model, version
+    shared_state["threshold"] = float(version.model.threshold)
+    if score_cache is not None:
+        score_cache.clear()
+    await refresh_attack_bank(version.model)
+
+async def reload_model(request: ModelReloadRequest, model_path: str, scaler_path: Optional[str]):
+    """Load, warm and install a model version without blocking the event loop"""
+    global shadow_scorer
+    
+    try:
+        new_model = await asyncio.to_thread(
+            load_model_version, model_path, scaler_path, request.threshold
+        )
+    except Exception as e:
+        print(f"Error loading model {request.model_path}: {e}")
+        log_event({
+            "event": "MODEL_RELOAD_FAILED",
+            "timestamp": datetime.now().isoformat(),
+            "model_path": request.model_path,
+            "error": str(e)
+        })
+        return
+    
+    version = ModelVersion(new_model, request.model_path)
+    if request.shadow:
+        shadow_scorer = ShadowScorer(version, request.shadow_fraction)
+        print(f"Shadow model {request.model_path} scoring {request.shadow_fraction:.0%} of traffic")
+    else:
+        await install_model(version)
+        print(f"Model {request.model_path} is now live")
+    
+    log_event({
+        "event": "MODEL_SHADOW_STARTED" if request.shadow else "MODEL_SWAPPED",
+        "timestamp": datetime.now().isoformat(),
+        "model_path": request.model_path
+    })
+
+@app.post("/api/admin/model/reload")
+async def admin_reload_model(request: ModelReloadRequest):
+    """Load a model version in the background and swap it in (or shadow it)"""
+    global model_reload_task
+    
+    if model_reload_task is not None and not model_reload_task.done():
+        return FastJSONResponse({
+            "status": "error",
+            "message": "A model reload is already in progress"
+        }, status_code=409)
+    
+    try:
+        model_path = resolve_model_path(request.model_path)
+        scaler_path = resolve_model_path(request.scaler_path) if request.scaler_path else None
+    except ValueError as e:
+        return FastJSONResponse({"status": "error", "message": str(e)}, status_code=400)
+    
+    model_reload_task = asyncio.create_task(reload_model(request, model_path, scaler_path))
+    return FastJSONResponse({
+        "status": "success",
+        "message": f"Loading {request.model_path} in the background",
+        "mode": "shadow" if request.shadow else "swap"
+    })
+
+@app.post("/api/admin/model/promote")
+async def admin_promote_model():
+    """Make the shadow candidate the live model"""
+    global shadow_scorer
+    
+    if shadow_scorer is None:
+        return FastJSONResponse({"status": "error", "message": "No shadow model loaded"}, status_code=404)
+    
+    version = shadow_scorer.version
+    shadow_scorer = None
+    await install_model(version)
+    log_event({
+        "event": "MODEL_PROMOTED",
+        "timestamp": datetime.now().isoformat(),
+        "model_path": version.source
+    })
+    return FastJSONResponse({"status": "success", "message": f"{version.source} is now live"})
+
+@app.delete("/api/admin/model/shadow")
+async def admin_stop_shadow():
+    """Stop shadow scoring and drop the candidate"""
+    global shadow_scorer
+    stats = shadow_scorer.describe() if shadow_scorer else None
+    shadow_scorer = None
+    return FastJSONResponse({"status": "success", "shadow": stats})
+
+@app.get("/api/admin/model")
+async def admin_model_status():
+    """Live model version, reload progress and shadow statistics"""
+    return FastJSONResponse({
+        "live": model_version.describe() if model_version else None,
+        "reload_in_progress": model_reload_task is not None and not model_reload_task.done(),
+        "shadow": shadow_scorer.describe() if shadow_scorer else None,
+        "attack_bank": attack_bank.describe() if attack_bank else None
+    })
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus-style metrics"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/admin/profile/status")
+async def profile_status(limit: int = 50):
+    """Event loop lag and recent slow callbacks (profiling mode only)"""
+    if loop_profiler is None:
+        return FastJSONResponse({
+            "status": "error",
+            "message": "Profiling disabled. Start the backend with SCOOTER_PROFILE=1."
+        }, status_code=404)
+    
+    return FastJSONResponse({
+        "slow_callback_threshold_ms": loop_profiler.threshold * 1000,
+        "event_loop_lag": loop_profiler.lag_stats(),
+        "slow_callbacks": loop_profiler.recent_slow_callbacks(limit)
+    })
+
+@app.get("/api/admin/profile/cpu")
+async def profile_cpu(seconds: float = 5.0):
+    """Sample the event loop thread and return flamegraph folded stacks"""
+    if loop_profiler is None:
+        return FastJSONResponse({
+            "status": "error",
+            "message": "Profiling disabled. Start the backend with SCOOTER_PROFILE=1."
+        }, status_code=404)
+    
+    try:
+        stacks = await asyncio.to_thread(loop_profiler.sample, min(seconds, 60.0))
+    except RuntimeError as e:
+        return FastJSONResponse({"status": "error", "message": str(e)}, status_code=409)
+    
+    return PlainTextResponse(LoopProfiler.to_folded(stacks))
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {
+    return FastJSONResponse({
         "status": "healthy", 
         "state": system_state.value,
         "ml_connected": shared_state["ml_connected"],
         "anomaly_score": anomaly_score,
+        "connections": len(connection_manager.active_connections),
+        "subscriptions": connection_manager.topics.describe(),
+        "sessions": sessions.describe(),
         "timestamp": datetime.now().isoformat()
-    }
+    })
 
 @app.get("/api/ml-status")
 async def ml_status():
     """Get ML model status"""
-    return {
+    return FastJSONResponse({
         "ml_connected": ml_model is not None,
         "model_ready": ml_model is not None and ml_model.model is not None,
         "threshold": ml_model.threshold if ml_model else 0.0,
+        "adaptive_thresholds": adaptive_thresholds is not None,
+        "adaptive_devices": len(adaptive_thresholds.devices) if adaptive_thresholds else 0,
+        "prefilter": cascade_filter.describe() if cascade_filter else None,
+        "score_cache": score_cache.describe() if score_cache else None,
+        "load_shedding": overload.describe() if overload else None,
         "last_inference": shared_state["last_update"],
         "total_decisions": len(shared_state["ml_decisions"])
-    }
+    })
 
 if __name__ == "__main__":
     print("Starting Smart Scooter ML Backend...")
@@ -549,7 +1108,19 @@ if __name__ == "__main__":
     print("  GET  /api/health        - Health check")
     print("  GET  /api/system-state  - Get current system state")
     print("  GET  /api/ml-status     - Get ML model status")
+    print("  GET  /api/anomaly-history - Anomaly history with health scores")
+    print("  GET  /api/fleet-summary - Aggregated fleet statistics")
+    print("  GET  /api/attack-history - Paginated attack history (persistent)")
+    print("  GET  /metrics           - Prometheus-style metrics")
+    print("  GET  /api/admin/profile/status - Loop lag and slow callbacks (SCOOTER_PROFILE=1)")
+    print("  GET  /api/admin/profile/cpu    - Folded CPU profile of the loop (SCOOTER_PROFILE=1)")
+    print("  POST /api/admin/model/reload   - Hot-load a model (swap or shadow)")
+    print("  POST /api/admin/model/promote  - Promote the shadow model")
+    print("  GET  /api/admin/model          - Model versions and shadow stats")
     print("  POST /api/simulate-attack - Simulate attack (6-second countdown)")
+    print("  GET  /api/scenarios - List attack scenarios")
+    print("  POST /api/scenarios/inject - Inject a scenario into device sessions")
+    print("  GET  /api/scenarios/injections - Scenario injection progress")
     print("  POST /api/emergency-attack - Emergency attack (immediate safe mode)")
     print("  POST /api/reset-system  - Reset system to normal")
     print("WebSocket endpoint: /ws")
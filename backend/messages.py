@@ -0,0 +1,151 @@
+"""Typed decoding of /ws client messages.
+
+Each message type has a fixed schema, checked by a decoder built once at
+import. The result is a slotted object with validated fields. Malformed
+frames raise MessageError before anything reaches detect_anomaly:
+- non-numeric, non-finite or wrongly sized telemetry
+- bad device ids
+- unknown types
+
+Parsing uses the configured fast JSON decoder (see serialization.py).
+"""
+import math
+from typing import List, Optional
+
+from serialization import loads
+from topics import valid_topic
+
+N_FEATURES = 6
+MAX_DEVICE_ID_LENGTH = 128
+MAX_TOPICS = 32
+# Largest seq every encoder can echo back
+MAX_SEQ = 2 ** 63 - 1
+
+class MessageError(ValueError):
+    """A client frame that does not match any message schema"""
+
+class Telemetry:
+    __slots__ = ("device_id", "data", "timestamp", "seq")
+    type = "TELEMETRY"
+
+    def __init__(self, device_id: str, data: List[float], timestamp: Optional[str], seq: Optional[int] = None):
+        self.device_id = device_id
+        self.data = data
+        self.timestamp = timestamp
+        # Client's frame number, echoed in the ack
+        self.seq = seq
+
+class Ping:
+    __slots__ = ()
+    type = "PING"
+
+class Connection:
+    __slots__ = ("device_id", "group")
+    type = "CONNECTION"
+
+    def __init__(self, device_id: Optional[str], group: Optional[str] = None):
+        self.device_id = device_id
+        self.group = group
+
+class Subscribe:
+    __slots__ = ("topics", "token")
+    type = "SUBSCRIBE"
+
+    def __init__(self, topics: List[str], token: Optional[str] = None):
+        self.topics = topics
+        self.token = token
+
+class Unsubscribe(Subscribe):
+    __slots__ = ()
+    type = "UNSUBSCRIBE"
+
+_NUMBER = (int, float)
+
+def _device_id(message: dict, default: Optional[str]) -> Optional[str]:
+    device_id = message.get("device_id", default)
+    if device_id is default:
+        return device_id
+    if type(device_id) is not str or not 0 < len(device_id) <= MAX_DEVICE_ID_LENGTH:
+        raise MessageError(f"device_id must be a non-empty string of at most {MAX_DEVICE_ID_LENGTH} characters")
+    return device_id
+
+def _decode_telemetry(message: dict) -> Telemetry:
+    data = message.get("data")
+    if type(data) is not list or len(data) != N_FEATURES:
+        raise MessageError(f"data must be a list of {N_FEATURES} numbers")
+    for value in data:
+        # bool is an int subclass, so check exact types; ints too large for a
+        # float (the stdlib parser accepts any size) overflow in isfinite
+        try:
+            valid = type(value) in _NUMBER and math.isfinite(value)
+        except OverflowError:
+            valid = False
+        if not valid:
+            raise MessageError(f"data must be a list of {N_FEATURES} finite numbers")
+
+    timestamp = message.get("timestamp")
+    if timestamp is not None and type(timestamp) is not str:
+        raise MessageError("timestamp must be a string")
+    seq = message.get("seq")
+    if seq is not None and (type(seq) is not int or not 0 <= seq <= MAX_SEQ):
+        raise MessageError(f"seq must be an integer from 0 to {MAX_SEQ}")
+    return Telemetry(_device_id(message, "default"), data, timestamp, seq)
+
+_PING = Ping()
+
+def _decode_ping(message: dict) -> Ping:
+    return _PING
+
+def _decode_connection(message: dict) -> Connection:
+    group = message.get("group")
+    if group is not None and (type(group) is not str or not 0 < len(group) <= MAX_DEVICE_ID_LENGTH):
+        raise MessageError(f"group must be a non-empty string of at most {MAX_DEVICE_ID_LENGTH} characters")
+    return Connection(_device_id(message, None), group)
+
+def _topics(message: dict) -> List[str]:
+    topics = message.get("topics")
+    if type(topics) is not list or not 0 < len(topics) <= MAX_TOPICS:
+        raise MessageError(f"topics must be a list of 1 to {MAX_TOPICS} topics")
+    for topic in topics:
+        if type(topic) is not str or not valid_topic(topic):
+            raise MessageError(f"invalid topic {topic!r}, expected 'fleet', 'device:<id>' or 'group:<name>'")
+    return topics
+
+def _decode_subscribe(message: dict) -> Subscribe:
+    token = message.get("token")
+    if token is not None and type(token) is not str:
+        raise MessageError("token must be a string")
+    return Subscribe(_topics(message), token)
+
+def _decode_unsubscribe(message: dict) -> Unsubscribe:
+    return Unsubscribe(_topics(message))
+
+DECODERS = {
+    "TELEMETRY": _decode_telemetry,
+    "PING": _decode_ping,
+    "CONNECTION": _decode_connection,
+    "SUBSCRIBE": _decode_subscribe,
+    "UNSUBSCRIBE": _decode_unsubscribe,
+}
+
+def decode(raw):
+    """Parse and validate one client frame (str or bytes); every failure is a MessageError"""
+    if type(raw) not in (str, bytes):
+        raise MessageError("empty frame")
+    try:
+        message = loads(raw)
+    except (ValueError, TypeError) as e:
+        raise MessageError(f"invalid JSON: {e}") from None
+    if type(message) is not dict:
+        raise MessageError("message must be a JSON object")
+
+    kind = message.get("type")
+    decoder = DECODERS.get(kind) if type(kind) is str else None
+    if decoder is None:
+        raise MessageError(f"unknown message type {kind!r}"[:200])
+    try:
+        return decoder(message)
+    except MessageError:
+        raise
+    except (ValueError, TypeError, OverflowError) as e:
+        raise MessageError(f"invalid {kind} message: {e}") from None
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+# Latency buckets in seconds (50us .. 5s)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# Metric recording runs on the event loop thread only, so plain attribute
+# updates are enough: no locks, a few hundred nanoseconds per observation.
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}"
+        ]
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, label: str = None):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.value = 0.0
+        self.collect: Callable[[], Dict[str, float]] = None
+
+    def set(self, value):
+        self.value = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if self.collect is not None:
+            for label_value, value in sorted(self.collect().items()):
+                lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        else:
+            lines.append(f"{self.name} {self.value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+frames_received = registry.register(Counter(
+    "scooter_frames_received_total", "Telemetry frames received over WebSocket"))
+frames_rejected = registry.register(Counter(
+    "scooter_frames_rejected_total", "WebSocket frames rejected by message validation"))
+inference_preprocess_seconds = registry.register(Histogram(
+    "scooter_inference_preprocess_seconds", "Window construction time before the model call"))
+inference_forward_seconds = registry.register(Histogram(
+    "scooter_inference_forward_seconds", "Model forward pass time"))
+inference_batch_size = registry.register(Histogram(
+    "scooter_inference_batch_size", "Windows scored per model call", BATCH_SIZE_BUCKETS))
+broadcast_seconds = registry.register(Histogram(
+    "scooter_broadcast_seconds", "Time to fan a message out to all connections"))
+event_loop_lag_seconds = registry.register(Histogram(
+    "scooter_event_loop_lag_seconds", "Event loop scheduling delay"))
+active_connections = registry.register(Gauge(
+    "scooter_active_connections", "Open WebSocket connections"))
+devices_by_state = registry.register(Gauge(
+    "scooter_devices", "Devices per state", label="state"))
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Background task measuring how late the loop wakes us up"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.observe(max(0.0, time.perf_counter() - start - interval))
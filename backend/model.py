@@ -3,7 +3,17 @@ from tensorflow.keras.models import Model, load_model
 from tensorflow.keras.layers import Input, LSTM, RepeatVector, Dense, TimeDistributed
 from tensorflow.keras.callbacks import EarlyStopping
 import joblib
+import json
 import os
+from quantile import P2Quantile
+
+def load_threshold(model_path):
+    """Threshold stored next to a model file (<model>.json), or None"""
+    sidecar = model_path + '.json'
+    if not os.path.exists(sidecar):
+        return None
+    with open(sidecar) as f:
+        return float(json.load(f)['threshold'])
 
 class LSTMAutoencoder:
     def __init__(self, timesteps=10, n_features=6, latent_dim=32):
@@ -48,6 +58,44 @@ class LSTMAutoencoder:
         mse = np.mean(np.power(X - predictions, 2), axis=(1,2))
         self.threshold = np.percentile(mse, 95)  # 95th percentile
         
+    def fit_stream(self, train_dataset, validation_dataset=None, epochs=50, threshold_dataset=None):
+        """Train from a tf.data pipeline of window batches in bounded memory.
+        
+        Datasets yield float32 batches [batch_size, timesteps, features].
+        The threshold is the 95th percentile of reconstruction error,
+        estimated with a streaming sketch over threshold_dataset
+        (defaults to the training data) instead of materializing every MSE.
+        """
+        if self.model is None:
+            self.build_model()
+        
+        to_pairs = lambda x: (x, x)
+        callbacks = []
+        if validation_dataset is not None:
+            validation_dataset = validation_dataset.map(to_pairs)
+            callbacks.append(EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True))
+        
+        self.model.fit(
+            train_dataset.map(to_pairs),
+            epochs=epochs,
+            validation_data=validation_dataset,
+            callbacks=callbacks,
+            verbose=0
+        )
+        
+        if threshold_dataset is None:
+            threshold_dataset = train_dataset
+        self.threshold = self.streaming_threshold(threshold_dataset)
+    
+    def streaming_threshold(self, dataset, quantile=0.95):
+        """Estimate the reconstruction error quantile over a dataset of window batches"""
+        sketch = P2Quantile(quantile)
+        for batch in dataset:
+            batch = np.asarray(batch)
+            reconstructed = np.asarray(self.model.predict_on_batch(batch))
+            sketch.update_many(np.mean(np.power(batch - reconstructed, 2), axis=(1, 2)))
+        return sketch.value()
+        
     def predict_anomaly(self, data):
         if self.model is None:
             # Load pre-trained model if exists
@@ -72,7 +120,31 @@ class LSTMAutoencoder:
         
         return anomaly_score, mse, reconstructed.flatten()
     
+    def predict_anomaly_batch(self, data):
+        """Score a batch of windows [batch_size, timesteps, features] in one model call"""
+        if self.model is None:
+            raise ValueError("Model not trained or loaded")
+        
+        data_batch = np.asarray(data, dtype=np.float32).reshape(-1, self.timesteps, self.n_features)
+        
+        # Predict
+        reconstructed = self.model.predict_on_batch(data_batch)
+        reconstructed = np.asarray(reconstructed)
+        
+        # Per-window reconstruction error
+        mse = np.mean(np.power(data_batch - reconstructed, 2), axis=(1, 2))
+        
+        # Anomaly scores (0-1)
+        anomaly_scores = np.minimum(mse / self.threshold, 1.0)
+        
+        return anomaly_scores, mse, reconstructed
+    
     def save_model(self, path='models/lstm_autoencoder.h5'):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+        """Save the model with its scaler and threshold next to it, where the loaders look"""
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
         self.model.save(path)
-        joblib.dump(self.scaler, 'models/scaler.pkl')
\ No newline at end of file
+        if self.scaler is not None:
+            joblib.dump(self.scaler, os.path.join(directory, 'scaler.pkl'))
+        with open(path + '.json', 'w') as f:
+            json.dump({'threshold': float(self.threshold)}, f)
\ No newline at end of file
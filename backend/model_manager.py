@@ -0,0 +1,137 @@
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import joblib
+import numpy as np
+
+import metrics
+from model import LSTMAutoencoder, load_threshold
+
+shadow_latency_seconds = metrics.registry.register(metrics.Histogram(
+    "scooter_shadow_inference_seconds", "Shadow candidate model forward pass time"))
+shadow_score_delta = metrics.registry.register(metrics.Histogram(
+    "scooter_shadow_score_delta", "Absolute score difference, candidate vs live model",
+    (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0)))
+
+# Model versions the reload endpoint may load: client paths are confined to this directory
+MODELS_DIR = os.environ.get("SCOOTER_MODELS_DIR", "models")
+
+def resolve_model_path(path: str, models_dir: str = MODELS_DIR) -> str:
+    """Resolve a client-supplied path inside models_dir; ValueError for anything outside it"""
+    root = os.path.realpath(models_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"{path} is outside the models directory")
+    return resolved
+
+def load_model_version(model_path: str, scaler_path: Optional[str] = None,
+                       threshold: Optional[float] = None) -> LSTMAutoencoder:
+    """Load and warm a model version; blocking, run it off the event loop.
+
+    Without an explicit threshold, the one saved next to the model is used.
+    """
+    if model_path.endswith('.tflite'):
+        from quantize import load_tflite
+        model = load_tflite(model_path, scaler_path, threshold)
+        model.predict_anomaly_batch(np.zeros((1, model.timesteps, model.n_features)))
+        return model
+
+    from tensorflow.keras.models import load_model
+
+    model = LSTMAutoencoder()
+    # Inference only, so skip restoring the training configuration
+    model.model = load_model(model_path, compile=False)
+    scaler_path = scaler_path or os.path.join(os.path.dirname(model_path), 'scaler.pkl')
+    if os.path.exists(scaler_path):
+        model.scaler = joblib.load(scaler_path)
+    if threshold is None:
+        threshold = load_threshold(model_path)
+    if threshold is not None:
+        model.threshold = threshold
+
+    # Warm up both inference paths so the first live frame pays no tracing cost
+    warmup = np.zeros((model.timesteps, model.n_features))
+    model.predict_anomaly(warmup)
+    model.predict_anomaly_batch(warmup[np.newaxis])
+    return model
+
+class ModelVersion:
+    def __init__(self, model: LSTMAutoencoder, source: str):
+        self.model = model
+        self.source = source
+        self.loaded_at = datetime.now().isoformat()
+
+    def describe(self) -> Dict:
+        return {
+            "source": self.source,
+            "runtime": getattr(self.model, "runtime", "keras"),
+            "loaded_at": self.loaded_at,
+            "threshold": float(self.model.threshold)
+        }
+
+class ShadowScorer:
+    """Scores a sampled fraction of live windows with a candidate model.
+
+    Shadow inference runs in a worker thread and at most one shadow call is
+    in flight; samples that arrive while it is busy are skipped, so live
+    scoring never waits on the candidate.
+    """
+
+    def __init__(self, version: ModelVersion, fraction: float):
+        self.version = version
+        self.fraction = fraction
+        self.busy = False
+        self.scored = 0
+        self.skipped = 0
+        self.errors = 0
+        self.delta_sum = 0.0
+        self.delta_max = 0.0
+        self.disagreements = 0
+        self.latency_sum = 0.0
+
+    def maybe_score(self, window: np.ndarray, live_score: float, attack_threshold: float):
+        if random.random() >= self.fraction:
+            return
+        if self.busy:
+            self.skipped += 1
+            return
+        self.busy = True
+        asyncio.get_running_loop().create_task(self._score(window, live_score, attack_threshold))
+
+    async def _score(self, window, live_score, attack_threshold):
+        try:
+            start = time.perf_counter()
+            score, _, _ = await asyncio.to_thread(self.version.model.predict_anomaly, window)
+            latency = time.perf_counter() - start
+
+            delta = abs(float(score) - float(live_score))
+            self.scored += 1
+            self.delta_sum += delta
+            self.delta_max = max(self.delta_max, delta)
+            self.latency_sum += latency
+            if (score > attack_threshold) != (live_score > attack_threshold):
+                self.disagreements += 1
+            shadow_latency_seconds.observe(latency)
+            shadow_score_delta.observe(delta)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error in shadow scoring: {e}")
+        finally:
+            self.busy = False
+
+    def describe(self) -> Dict:
+        return {
+            "candidate": self.version.describe(),
+            "fraction": self.fraction,
+            "scored": self.scored,
+            "skipped_busy": self.skipped,
+            "errors": self.errors,
+            "mean_abs_score_delta": self.delta_sum / self.scored if self.scored else None,
+            "max_abs_score_delta": self.delta_max,
+            "decision_disagreements": self.disagreements,
+            "mean_latency_ms": self.latency_sum / self.scored * 1000 if self.scored else None
+        }
@@ -0,0 +1,75 @@
+"""Per-connection outbound queues with a priority lane for state events.
+
+Every WebSocket gets an Outbox: two lanes drained by one writer task.
+
+    urgent  state events (SAFE_MODE, ATTACK_DETECTED, countdown, reset);
+            unbounded, always written before any bulk frame
+    bulk    per-frame replies (TELEMETRY_ACK, PONG, ...); bounded, the
+            oldest frame is dropped when a slow client falls behind
+
+Producers only append to a lane, so neither a broadcast nor the receive
+loop waits on a slow socket, and a state event waits for at most the one
+bulk frame already being written, however many are queued.
+"""
+import asyncio
+import time
+from collections import deque
+
+import metrics
+
+bulk_dropped = metrics.registry.register(metrics.Counter(
+    "scooter_outbound_bulk_dropped_total", "Bulk frames dropped because a client fell behind"))
+urgent_delivery_seconds = metrics.registry.register(metrics.Histogram(
+    "scooter_outbound_urgent_delivery_seconds", "Time from queueing a state event to writing it to the socket"))
+
+class Outbox:
+    def __init__(self, websocket, max_bulk: int = 256):
+        self.websocket = websocket
+        self.max_bulk = max_bulk
+        self.urgent = deque()
+        self.bulk = deque()
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._writer())
+
+    def close(self):
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+
+    def put(self, payload: str, urgent: bool = False):
+        """Queue an encoded frame without waiting for the socket"""
+        if self.closed:
+            return
+        if urgent:
+            self.urgent.append((payload, time.perf_counter()))
+        else:
+            if len(self.bulk) >= self.max_bulk:
+                self.bulk.popleft()
+                bulk_dropped.inc()
+            self.bulk.append(payload)
+        self.ready.set()
+
+    async def _writer(self):
+        try:
+            while True:
+                await self.ready.wait()
+                # Re-check the urgent lane before every frame
+                while self.urgent or self.bulk:
+                    if self.urgent:
+                        payload, queued_at = self.urgent.popleft()
+                        await self.websocket.send_text(payload)
+                        urgent_delivery_seconds.observe(time.perf_counter() - queued_at)
+                    else:
+                        await self.websocket.send_text(self.bulk.popleft())
+                self.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Client gone; the receive loop sees the disconnect and removes the connection
+            self.closed = True
+            self.urgent.clear()
+            self.bulk.clear()
@@ -0,0 +1,142 @@
+"""Load shedding for live scoring when windows arrive faster than the model can score them.
+
+Model forward passes run in worker threads. The controller tracks how
+many are in flight and how long a window takes from receipt to score
+(moving average), and picks a level from whichever is further over its
+limit:
+
+    NORMAL      every window is scored
+    SHEDDING    low-risk devices are scored only every `low_risk_interval`-th window
+    DEGRADED    as SHEDDING, and those low-risk windows go to the cheap
+                statistical pre-filter first; only windows it cannot clear
+                as normal reach the model
+
+At every level, a device that already has a window in flight does not
+queue another one. The intermediate window is dropped, and the device's
+next frame scores its newest window.
+
+Only scoring is shed. Devices whose last score is at or above
+`low_risk_score` are never throttled, and every window that is scored
+goes through the state machine, so state changes and their events are
+never dropped.
+
+Off by default, so every window is scored; SCOOTER_LOAD_SHEDDING=1 enables it.
+"""
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+import metrics
+
+LOAD_SHEDDING_ENABLED = os.environ.get("SCOOTER_LOAD_SHEDDING", "0") == "1"
+
+NORMAL, SHEDDING, DEGRADED = "NORMAL", "SHEDDING", "DEGRADED"
+LEVELS = (NORMAL, SHEDDING, DEGRADED)
+
+# What to do with a window
+MODEL, STATISTICAL, SKIP = "model", "statistical", "skip"
+
+windows_coalesced = metrics.registry.register(metrics.Counter(
+    "scooter_shed_coalesced_total", "Windows dropped because the device already had one in flight"))
+windows_throttled = metrics.registry.register(metrics.Counter(
+    "scooter_shed_throttled_total", "Low-risk device windows skipped while shedding"))
+windows_statistical = metrics.registry.register(metrics.Counter(
+    "scooter_shed_statistical_total", "Low-risk windows cleared by the statistical scorer while degraded"))
+level_changes = metrics.registry.register(metrics.Counter(
+    "scooter_overload_level_changes_total", "Overload level transitions"))
+overload_level = metrics.registry.register(metrics.Gauge(
+    "scooter_overload_level", "Overload level (0 normal, 1 shedding, 2 degraded)"))
+inference_in_flight = metrics.registry.register(metrics.Gauge(
+    "scooter_inference_in_flight", "Windows submitted to the model and not yet scored"))
+
+class OverloadController:
+    def __init__(self, fallback, max_in_flight: int = 4, latency_budget: float = 0.25,
+                 low_risk_score: float = 0.3, low_risk_interval: int = 5, smoothing: float = 0.2):
+        self.fallback = fallback
+        self.max_in_flight = max_in_flight
+        self.latency_budget = latency_budget
+        self.low_risk_score = low_risk_score
+        self.low_risk_interval = low_risk_interval
+        self.smoothing = smoothing
+        self.level = NORMAL
+        self.in_flight = 0
+        self.latency = 0.0
+        self.busy = set()
+        self.since_scored: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls, fallback) -> "OverloadController":
+        """Limits from SCOOTER_SHED_MAX_IN_FLIGHT, _LATENCY_BUDGET, _LOW_RISK_SCORE and _LOW_RISK_INTERVAL"""
+        kwargs = {}
+        for name, key, convert in (("max_in_flight", "MAX_IN_FLIGHT", int),
+                                   ("latency_budget", "LATENCY_BUDGET", float),
+                                   ("low_risk_score", "LOW_RISK_SCORE", float),
+                                   ("low_risk_interval", "LOW_RISK_INTERVAL", int)):
+            value = os.environ.get(f"SCOOTER_SHED_{key}")
+            if value is not None:
+                kwargs[name] = convert(value)
+        return cls(fallback, **kwargs)
+
+    def _update_level(self) -> str:
+        load = max(self.in_flight / self.max_in_flight, self.latency / self.latency_budget)
+        level = DEGRADED if load >= 2.0 else SHEDDING if load >= 1.0 else NORMAL
+        if level != self.level:
+            print(f"Overload level {self.level} -> {level} "
+                  f"(in flight {self.in_flight}, latency {self.latency * 1000:.0f} ms)")
+            self.level = level
+            level_changes.inc()
+            overload_level.set(LEVELS.index(level))
+        return level
+
+    def admit(self, device_id: str, last_score: Optional[float], window: np.ndarray) -> str:
+        """MODEL, STATISTICAL (cleared without the model) or SKIP for a device's newest window"""
+        if device_id in self.busy:
+            windows_coalesced.inc()
+            return SKIP
+
+        level = self._update_level()
+        if level == NORMAL or last_score is None or last_score >= self.low_risk_score:
+            return MODEL
+
+        skipped = self.since_scored.get(device_id, 0) + 1
+        if skipped < self.low_risk_interval:
+            self.since_scored[device_id] = skipped
+            windows_throttled.inc()
+            return SKIP
+        self.since_scored[device_id] = 0
+
+        if level == DEGRADED and self.fallback.is_clearly_normal(window):
+            windows_statistical.inc()
+            return STATISTICAL
+        return MODEL
+
+    def started(self, device_id: str):
+        self.busy.add(device_id)
+        self.in_flight += 1
+        inference_in_flight.set(self.in_flight)
+
+    def finished(self, device_id: str):
+        self.busy.discard(device_id)
+        self.in_flight -= 1
+        inference_in_flight.set(self.in_flight)
+
+    def observe(self, latency: float):
+        """Receipt-to-score time of a handled window (model or statistical)"""
+        self.latency += self.smoothing * (latency - self.latency)
+
+    def forget(self, device_id: str):
+        self.since_scored.pop(device_id, None)
+
+    def describe(self) -> Dict:
+        return {
+            "level": self.level,
+            "in_flight": self.in_flight,
+            "latency_ms": self.latency * 1000,
+            "max_in_flight": self.max_in_flight,
+            "latency_budget_ms": self.latency_budget * 1000,
+            "coalesced": windows_coalesced.value,
+            "throttled": windows_throttled.value,
+            "statistical": windows_statistical.value,
+            "level_changes": level_changes.value
+        }
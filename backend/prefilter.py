@@ -0,0 +1,186 @@
+"""Cascade pre-filter that lets clearly normal windows skip the LSTM.
+
+Live use: SCOOTER_PREFILTER=1 (thresholds via SCOOTER_PREFILTER_*).
+
+Offline, compare the cascade against LSTM-only scoring on a recording
+(see replay.py for the format):
+    python prefilter.py recording.jsonl --z-limit 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Dict
+
+import numpy as np
+
+import metrics
+
+# Opt-in via environment, e.g. SCOOTER_PREFILTER=1
+PREFILTER_ENABLED = os.environ.get("SCOOTER_PREFILTER", "0") == "1"
+
+# Normal riding telemetry as the frontend generates it: speed (km/h),
+# longitudinal, lateral and vertical acceleration (m/s^2), GPS deltas (deg)
+NORMAL_MEAN = [33.5, 0.0, 0.0, 9.8, 0.0, 0.0]
+NORMAL_STD = [0.87, 0.58, 0.15, 0.058, 2.9e-5, 2.9e-5]
+
+GRAVITY = 9.8
+
+windows_skipped = metrics.registry.register(metrics.Counter(
+    "scooter_prefilter_skipped_total", "Windows cleared by the pre-filter without running the LSTM"))
+windows_escalated = metrics.registry.register(metrics.Counter(
+    "scooter_prefilter_escalated_total", "Windows the pre-filter passed on to the LSTM"))
+windows_audited = metrics.registry.register(metrics.Counter(
+    "scooter_prefilter_audited_total", "Skipped windows re-scored by the LSTM for auditing"))
+windows_missed = metrics.registry.register(metrics.Counter(
+    "scooter_prefilter_missed_total", "Audited skipped windows the LSTM alone would have flagged"))
+
+class CascadeFilter:
+    """First stage of a two-stage detector: cheap checks before the LSTM.
+
+    A window is cleared as normal only if every value is within `z_limit`
+    standard deviations of the normal baseline and the window is
+    physically plausible:
+      - speed within [0, max_speed]
+      - vertical acceleration within `gravity_tolerance` of gravity
+      - frame-to-frame speed change consistent with the reported
+        acceleration (1 s frames, km/h converted to m/s)
+      - GPS step between frames no larger than `max_gps_step` degrees
+    Anything else is uncertain and goes to the LSTM.
+
+    A fraction of cleared windows (`audit_fraction`) is re-scored by the
+    LSTM in a worker thread, with at most one audit in flight. Audits
+    count how often the cascade misses a window the LSTM alone would have
+    flagged.
+    """
+
+    def __init__(self, mean=NORMAL_MEAN, std=NORMAL_STD, z_limit: float = 4.0, max_speed: float = 60.0,
+                 gravity_tolerance: float = 2.0, accel_tolerance: float = 3.0, max_gps_step: float = 0.001,
+                 audit_fraction: float = 0.05):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.inv_std = 1.0 / np.asarray(std, dtype=np.float64)
+        self.z_limit = z_limit
+        self.max_speed = max_speed
+        self.gravity_tolerance = gravity_tolerance
+        self.accel_tolerance = accel_tolerance
+        self.max_gps_step = max_gps_step
+        self.audit_fraction = audit_fraction
+        self.auditing = False
+
+    @classmethod
+    def from_env(cls) -> "CascadeFilter":
+        """Thresholds from SCOOTER_PREFILTER_* variables; baseline from a JSON file if given"""
+        kwargs = {}
+        for name, key in (("z_limit", "Z"), ("audit_fraction", "AUDIT"), ("max_speed", "MAX_SPEED"),
+                          ("accel_tolerance", "ACCEL_TOLERANCE"), ("max_gps_step", "MAX_GPS_STEP")):
+            value = os.environ.get(f"SCOOTER_PREFILTER_{key}")
+            if value is not None:
+                kwargs[name] = float(value)
+        baseline_path = os.environ.get("SCOOTER_PREFILTER_BASELINE")
+        if baseline_path:
+            # {"mean": [6 floats], "std": [6 floats]}
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+            kwargs["mean"], kwargs["std"] = baseline["mean"], baseline["std"]
+        return cls(**kwargs)
+
+    def is_clearly_normal(self, window: np.ndarray) -> bool:
+        """True if the window can skip the LSTM"""
+        if np.abs((window - self.mean) * self.inv_std).max() > self.z_limit:
+            return False
+
+        speed = window[:, 0]
+        if speed.min() < 0.0 or speed.max() > self.max_speed:
+            return False
+        if np.abs(window[:, 3] - GRAVITY).max() > self.gravity_tolerance:
+            return False
+
+        # Speed change per 1 s frame against the mean reported acceleration
+        speed_change = np.diff(speed) / 3.6
+        reported = (window[1:, 1] + window[:-1, 1]) / 2
+        if np.abs(speed_change - reported).max() > self.accel_tolerance:
+            return False
+
+        gps_step = np.hypot(window[:, 4], window[:, 5])
+        return gps_step.max() <= self.max_gps_step
+
+    def check(self, window: np.ndarray) -> bool:
+        """is_clearly_normal, counted in the skip/escalate metrics"""
+        normal = self.is_clearly_normal(window)
+        (windows_skipped if normal else windows_escalated).inc()
+        return normal
+
+    def maybe_audit(self, window: np.ndarray, model, attack_threshold: float):
+        """Re-score a sample of skipped windows with the LSTM off the event loop"""
+        if self.auditing or random.random() >= self.audit_fraction:
+            return
+        self.auditing = True
+        asyncio.get_running_loop().create_task(self._audit(window, model, attack_threshold))
+
+    async def _audit(self, window, model, attack_threshold):
+        try:
+            score, _, _ = await asyncio.to_thread(model.predict_anomaly, window)
+            windows_audited.inc()
+            if score > attack_threshold:
+                windows_missed.inc()
+        except Exception as e:
+            print(f"Error in pre-filter audit: {e}")
+        finally:
+            self.auditing = False
+
+    def describe(self) -> Dict:
+        skipped, escalated = windows_skipped.value, windows_escalated.value
+        audited, missed = windows_audited.value, windows_missed.value
+        return {
+            "z_limit": self.z_limit,
+            "audit_fraction": self.audit_fraction,
+            "skipped": skipped,
+            "escalated": escalated,
+            "skip_fraction": skipped / (skipped + escalated) if skipped + escalated else None,
+            "audited": audited,
+            "missed": missed,
+            "estimated_miss_rate": missed / audited if audited else None
+        }
+
+def evaluate(cascade: CascadeFilter, windows: np.ndarray, lstm_scores: np.ndarray, attack_threshold: float) -> Dict:
+    """Skip rate, filter cost and detections lost against LSTM-only scoring"""
+    start = time.perf_counter()
+    skipped = np.fromiter((cascade.is_clearly_normal(window) for window in windows), dtype=bool, count=len(windows))
+    elapsed = time.perf_counter() - start
+
+    flagged = lstm_scores > attack_threshold
+    return {
+        "windows": len(windows),
+        "skip_fraction": float(skipped.mean()) if len(windows) else None,
+        "filter_us_per_window": elapsed / max(len(windows), 1) * 1e6,
+        "lstm_flagged": int(flagged.sum()),
+        "missed": int((skipped & flagged).sum()),
+        "miss_rate": float((skipped & flagged).sum() / flagged.sum()) if flagged.any() else None,
+    }
+
+def main():
+    from replay import load_recording, iter_window_batches, load_model
+    from state_machine import ATTACK_THRESHOLD
+
+    parser = argparse.ArgumentParser(description="Compare the cascade pre-filter with LSTM-only scoring")
+    parser.add_argument("recording", help="JSONL or CSV telemetry file")
+    parser.add_argument("--model", help="path to the .h5 model")
+    parser.add_argument("--z-limit", type=float, default=4.0)
+    parser.add_argument("--accel-tolerance", type=float, default=3.0)
+    parser.add_argument("--max-gps-step", type=float, default=0.001)
+    parser.add_argument("--attack-threshold", type=float, default=ATTACK_THRESHOLD)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    batches = list(iter_window_batches(load_recording(args.recording)))
+    windows = np.concatenate([w for _, w in batches])
+    lstm_scores = np.concatenate([model.predict_anomaly_batch(w)[0] for _, w in batches])
+
+    cascade = CascadeFilter(z_limit=args.z_limit, accel_tolerance=args.accel_tolerance,
+                            max_gps_step=args.max_gps_step)
+    print(json.dumps(evaluate(cascade, windows, lstm_scores, args.attack_threshold), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+# Opt-in via environment, e.g. SCOOTER_PROFILE=1 SCOOTER_SLOW_CALLBACK_MS=50
+PROFILE_ENABLED = os.environ.get("SCOOTER_PROFILE", "0") == "1"
+SLOW_CALLBACK_MS = float(os.environ.get("SCOOTER_SLOW_CALLBACK_MS", "100"))
+
+def _folded_stack(frame) -> str:
+    """Collapse a frame chain into 'outer;...;inner' (flamegraph folded format)"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+class LoopProfiler:
+    """Watchdog and sampling profiler for the event loop thread.
+
+    A heartbeat task on the loop records when it last ran. A watchdog
+    thread notices when the heartbeat is late by more than the threshold,
+    grabs the loop thread's stack at that moment (the code that is blocking
+    the loop) and logs it. CPU samples of the loop thread can be taken on
+    demand and are returned in folded-stack format.
+    """
+
+    def __init__(self, slow_callback_ms: float = SLOW_CALLBACK_MS, tick_interval: float = 0.01):
+        self.threshold = slow_callback_ms / 1000.0
+        self.tick_interval = tick_interval
+        self.slow_callbacks = deque(maxlen=200)
+        self.lag_samples = deque(maxlen=1000)
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.perf_counter()
+        self._running = False
+        self._sampling = False
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start heartbeat and watchdog for the running loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._running = True
+        loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True).start()
+        print(f"Loop profiler enabled (slow callback threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        self._running = False
+
+    async def _heartbeat(self):
+        while self._running:
+            now = time.perf_counter()
+            self.lag_samples.append(max(0.0, now - self._last_tick - self.tick_interval))
+            self._last_tick = now
+            await asyncio.sleep(self.tick_interval)
+
+    def _loop_frame(self):
+        return sys._current_frames().get(self._loop_thread_id)
+
+    def _watchdog(self):
+        reported_tick = None
+        while self._running:
+            time.sleep(self.threshold / 2)
+            blocked_for = time.perf_counter() - self._last_tick - self.tick_interval
+            if blocked_for < self.threshold or reported_tick == self._last_tick:
+                continue
+
+            # Report each stall once, with the stack that is holding the loop
+            reported_tick = self._last_tick
+            frame = self._loop_frame()
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self.slow_callbacks.append({
+                "timestamp": time.time(),
+                "blocked_ms": round(blocked_for * 1000, 2),
+                "stack": stack
+            })
+            print(f"Event loop blocked for {blocked_for * 1000:.0f}ms:\n{stack}")
+
+    def sample(self, seconds: float = 5.0, interval: float = 0.005) -> Dict[str, int]:
+        """Sample the loop thread's stack; blocking, run it off the loop"""
+        if self._sampling:
+            raise RuntimeError("A profile is already being collected")
+
+        self._sampling = True
+        stacks = Counter()
+        try:
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                frame = self._loop_frame()
+                if frame is not None:
+                    stacks[_folded_stack(frame)] += 1
+                time.sleep(interval)
+        finally:
+            self._sampling = False
+        return stacks
+
+    @staticmethod
+    def to_folded(stacks: Dict[str, int]) -> str:
+        """Render samples as folded stacks (flamegraph.pl / speedscope input)"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def lag_stats(self) -> Dict[str, float]:
+        """Scheduling delay percentiles over recent heartbeats (ms)"""
+        if not self.lag_samples:
+            return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        samples = sorted(self.lag_samples)
+        return {
+            "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3)
+        }
+
+    def recent_slow_callbacks(self, limit: int = 50) -> List[Dict]:
+        return list(self.slow_callbacks)[-limit:]
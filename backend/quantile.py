@@ -0,0 +1,83 @@
+import math
+
+class P2Quantile:
+    """Streaming quantile estimate with the P-square algorithm.
+
+    Jain & Chlamtac (1985): five markers track the minimum, the p/2, p and
+    (1+p)/2 quantiles and the maximum. Each update is O(1) and memory is
+    constant, so it can follow reconstruction errors indefinitely.
+    """
+
+    __slots__ = ("p", "count", "heights", "positions", "desired", "increments")
+
+    def __init__(self, p: float):
+        if not 0.0 < p < 1.0:
+            raise ValueError("Quantile must be between 0 and 1")
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1.0, 1.0 + 2 * p, 1.0 + 4 * p, 3.0 + 2 * p, 5.0]
+        self.increments = [0.0, p / 2, p, (1.0 + p) / 2, 1.0]
+
+    def update(self, value: float):
+        value = float(value)
+        self.count += 1
+
+        # Collect the first five observations as initial markers
+        if self.count <= 5:
+            self.heights.append(value)
+            if self.count == 5:
+                self.heights.sort()
+            return
+
+        heights = self.heights
+        positions = self.positions
+
+        # Find the cell containing the new value, extending the extremes
+        if value < heights[0]:
+            heights[0] = value
+            k = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= heights[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Adjust the three middle markers toward their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not heights[i - 1] < candidate < heights[i + 1]:
+                    candidate = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = candidate
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        heights, positions = self.heights, self.positions
+        return heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+            (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i])
+            + (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1])
+        )
+
+    def update_many(self, values):
+        for value in values:
+            self.update(value)
+
+    def value(self) -> float:
+        """Current quantile estimate (NaN before any observation)"""
+        if self.count == 0:
+            return math.nan
+        if self.count <= 5:
+            ordered = sorted(self.heights)
+            return ordered[min(len(ordered) - 1, int(round(self.p * (len(ordered) - 1))))]
+        return self.heights[2]
@@ -0,0 +1,326 @@
+"""Export the LSTM autoencoder to TFLite and compare reduced-precision variants.
+
+Variants:
+    float32  - plain TFLite conversion, no quantization
+    float16  - weights stored as float16
+    int8     - dynamic-range quantization (int8 weights, float activations)
+
+The Keras LSTM layers lower to a TensorList loop that the TFLite builtin
+ops cannot express, so the model is cloned with unrolled LSTMs first
+(10 timesteps, so unrolling is cheap) and the original weights copied over.
+
+The report scores the same held-out windows with the float Keras model and
+every variant: reconstruction MSE and score deltas, agreement on attack
+decisions and on the model's own MSE-threshold flag, single-window and
+batch latency, file size and resident memory.
+Held-out windows come from a replay recording (see replay.py); without one,
+normal and attack windows are synthesized with the load generator's
+templates.
+
+A .tflite file can be served directly: load_model_version() and the
+reload endpoint accept it, e.g. as a shadow candidate.
+
+Usage:
+    python quantize.py --recording held_out.jsonl --output-dir models \\
+        --report quantize_report.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import joblib
+import numpy as np
+
+from state_machine import ATTACK_THRESHOLD
+
+VARIANTS = ("float32", "float16", "int8")
+
+def unrolled_clone(keras_model):
+    """Copy of the model with unrolled LSTM layers and the same weights"""
+    from tensorflow import keras
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        if isinstance(layer, keras.layers.LSTM):
+            config["unroll"] = True
+        return layer.__class__.from_config(config)
+
+    clone = keras.models.clone_model(keras_model, clone_function=clone_layer)
+    clone.set_weights(keras_model.get_weights())
+    return clone
+
+def convert(keras_model, variant: str) -> bytes:
+    """TFLite flatbuffer for one precision variant"""
+    import tensorflow as tf
+
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown variant '{variant}', expected one of {', '.join(VARIANTS)}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(unrolled_clone(keras_model))
+    if variant != "float32":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+def export(keras_model, output_dir: str, variants=VARIANTS, threshold: Optional[float] = None) -> Dict[str, str]:
+    """Write lstm_autoencoder_<variant>.tflite files; returns variant -> path.
+
+    The threshold is stored next to each file so a served variant scores
+    on the same scale as the float model.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for variant in variants:
+        path = os.path.join(output_dir, f"lstm_autoencoder_{variant}.tflite")
+        with open(path, "wb") as f:
+            f.write(convert(keras_model, variant))
+        if threshold is not None:
+            with open(path + ".json", "w") as f:
+                json.dump({"threshold": float(threshold), "variant": variant}, f)
+        paths[variant] = path
+    return paths
+
+class TFLiteAutoencoder:
+    """TFLite interpreter with the LSTMAutoencoder scoring interface"""
+
+    runtime = "tflite"
+
+    def __init__(self, model_path: str, threshold: float = 0.8, timesteps: int = 10,
+                 n_features: int = 6, num_threads: Optional[int] = None):
+        import tensorflow as tf
+
+        self.timesteps = timesteps
+        self.n_features = n_features
+        self.threshold = threshold
+        self.scaler = None
+        self.model = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self._input = self.model.get_input_details()[0]["index"]
+        self._output = self.model.get_output_details()[0]["index"]
+        self._batch_size = None
+        # The interpreter is not thread-safe; shadow scoring runs in a worker thread
+        self._lock = threading.Lock()
+
+    def _run(self, data_batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if data_batch.shape[0] != self._batch_size:
+                self.model.resize_tensor_input(self._input, data_batch.shape)
+                self.model.allocate_tensors()
+                self._batch_size = data_batch.shape[0]
+            self.model.set_tensor(self._input, data_batch)
+            self.model.invoke()
+            return self.model.get_tensor(self._output).copy()
+
+    def predict_anomaly(self, data):
+        scores, mse, reconstructed = self.predict_anomaly_batch(data)
+        return float(scores[0]), float(mse[0]), reconstructed.flatten()
+
+    def predict_anomaly_batch(self, data):
+        """Score a batch of windows [batch_size, timesteps, features] in one interpreter call"""
+        data_batch = np.ascontiguousarray(data, dtype=np.float32).reshape(-1, self.timesteps, self.n_features)
+        reconstructed = self._run(data_batch)
+        mse = np.mean(np.power(data_batch - reconstructed, 2), axis=(1, 2))
+        return np.minimum(mse / self.threshold, 1.0), mse, reconstructed
+
+def load_tflite(model_path: str, scaler_path: Optional[str] = None,
+                threshold: Optional[float] = None) -> TFLiteAutoencoder:
+    """TFLite variant with the threshold written by export() unless overridden"""
+    sidecar = model_path + ".json"
+    if threshold is None and os.path.exists(sidecar):
+        with open(sidecar) as f:
+            threshold = json.load(f)["threshold"]
+
+    model = TFLiteAutoencoder(model_path, threshold if threshold is not None else 0.8)
+    scaler_path = scaler_path or os.path.join(os.path.dirname(model_path), "scaler.pkl")
+    if os.path.exists(scaler_path):
+        model.scaler = joblib.load(scaler_path)
+    return model
+
+def _peak_rss(model_path: Optional[str], windows: np.ndarray, queue):
+    """Child process: peak RSS after loading a model and scoring one batch"""
+    if model_path is None:
+        import tensorflow  # baseline: the runtime without any model
+    elif model_path.endswith(".tflite"):
+        TFLiteAutoencoder(model_path).predict_anomaly_batch(windows)
+    else:
+        from model_manager import load_model_version
+        load_model_version(model_path).predict_anomaly_batch(windows)
+    # VmHWM rather than ru_maxrss, which survives exec and would report the parent's peak
+    with open("/proc/self/status") as f:
+        peak = next(line for line in f if line.startswith("VmHWM:"))
+    queue.put(int(peak.split()[1]) * 1024)
+
+def peak_rss_bytes(model_path: Optional[str], windows: np.ndarray) -> Optional[int]:
+    """Peak resident memory of a fresh process serving model_path (None: runtime only)"""
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_peak_rss, args=(model_path, windows, queue))
+    process.start()
+    try:
+        return queue.get(timeout=300)
+    except Exception:
+        return None  # no /proc (not Linux) or the child failed
+    finally:
+        process.join()
+
+def held_out_windows(recording_path: Optional[str], max_windows: int, seed: int = 0) -> np.ndarray:
+    """Windows from a recording, or synthetic normal and attack windows.
+
+    Both are raw telemetry, exactly what detect_anomaly passes to the
+    served model, so the comparison covers the inputs serving sees.
+    """
+    rng = np.random.default_rng(seed)
+    if recording_path:
+        from replay import load_recording, iter_window_batches
+
+        windows = np.concatenate([w for _, w in iter_window_batches(load_recording(recording_path))])
+        if len(windows) > max_windows:
+            windows = windows[np.sort(rng.choice(len(windows), max_windows, replace=False))]
+        return windows.astype(np.float32)
+
+    import random
+    from attack_simulator import ATTACK_TEMPLATES, normal_frame, attack_frame
+
+    random.seed(seed)
+    attack_types = list(ATTACK_TEMPLATES)
+    windows = []
+    for i in range(max_windows):
+        # One window in five is an attack, so decision agreement covers both sides
+        if i % 5 == 4:
+            attack_type = attack_types[i // 5 % len(attack_types)]
+            windows.append([attack_frame(attack_type) for _ in range(10)])
+        else:
+            windows.append([normal_frame() for _ in range(10)])
+    return np.asarray(windows, dtype=np.float32)
+
+def _latency(model, windows: np.ndarray, batch_size: int, repeats: int) -> Dict:
+    """Median and p99 seconds per call, and windows per second at batch_size"""
+    single = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        model.predict_anomaly_batch(windows[i % len(windows)][np.newaxis])
+        single.append(time.perf_counter() - start)
+
+    batch = windows[:batch_size]
+    model.predict_anomaly_batch(batch)  # warm up at this batch size
+    start = time.perf_counter()
+    for _ in range(max(1, repeats // 10)):
+        model.predict_anomaly_batch(batch)
+    per_batch = (time.perf_counter() - start) / max(1, repeats // 10)
+
+    return {
+        "single_p50_ms": float(np.percentile(single, 50) * 1000),
+        "single_p99_ms": float(np.percentile(single, 99) * 1000),
+        "batch_size": len(batch),
+        "batch_windows_per_s": len(batch) / per_batch,
+    }
+
+def _accuracy(reference, candidate, threshold: float) -> Dict:
+    """Deltas against the reference; `threshold` is the model's MSE threshold, for its anomaly flag"""
+    ref_scores, ref_mse, _ = reference
+    scores, mse, _ = candidate
+    ref_attack = ref_scores > ATTACK_THRESHOLD
+    attack = scores > ATTACK_THRESHOLD
+    relative = np.abs(mse - ref_mse) / np.maximum(ref_mse, 1e-12)
+    return {
+        "mse_abs_delta_mean": float(np.mean(np.abs(mse - ref_mse))),
+        "mse_rel_delta_mean": float(np.mean(relative)),
+        "mse_rel_delta_max": float(np.max(relative)),
+        "score_abs_delta_mean": float(np.mean(np.abs(scores - ref_scores))),
+        "score_abs_delta_max": float(np.max(np.abs(scores - ref_scores))),
+        "decision_agreement": float(np.mean(attack == ref_attack)),
+        "flag_agreement": float(np.mean((mse > threshold) == (ref_mse > threshold))),
+        "missed_attacks": int(np.sum(ref_attack & ~attack)),
+        "extra_attacks": int(np.sum(attack & ~ref_attack)),
+    }
+
+def report(keras_path: str, paths: Dict[str, str], windows: np.ndarray,
+           batch_size: int = 256, repeats: int = 200) -> Dict:
+    """Accuracy deltas, latency and memory of each variant against the float model"""
+    from model_manager import load_model_version
+
+    # Memory is measured in fresh processes; in this one freed TF buffers blur the numbers
+    sample = windows[:batch_size]
+    baseline_rss = peak_rss_bytes(None, sample)
+
+    def memory(path):
+        peak = peak_rss_bytes(path, sample)
+        return {
+            "peak_rss_bytes": peak,
+            "model_rss_bytes": peak - baseline_rss if peak is not None and baseline_rss is not None else None,
+        }
+
+    reference_model = load_model_version(keras_path)
+    reference = reference_model.predict_anomaly_batch(windows)
+    threshold = float(reference_model.threshold)
+
+    results = {
+        "windows": len(windows),
+        "runtime_rss_bytes": baseline_rss,
+        "threshold": threshold,
+        "attack_threshold": ATTACK_THRESHOLD,
+        "reference_attack_windows": int(np.sum(reference[0] > ATTACK_THRESHOLD)),
+        "variants": {
+            "keras_float32": {
+                "file_bytes": os.path.getsize(keras_path),
+                **memory(keras_path),
+                **_latency(reference_model, windows, batch_size, repeats),
+            }
+        }
+    }
+
+    for variant, path in paths.items():
+        model = TFLiteAutoencoder(path, threshold)
+        results["variants"][variant] = {
+            "file_bytes": os.path.getsize(path),
+            **memory(path),
+            **_accuracy(reference, model.predict_anomaly_batch(windows), threshold),
+            **_latency(model, windows, batch_size, repeats),
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Export reduced-precision TFLite variants and compare them")
+    parser.add_argument("--model", default=os.path.join("models", "lstm_autoencoder.h5"))
+    parser.add_argument("--output-dir", default="models")
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--recording", help="held-out JSONL or CSV recording (synthetic windows if omitted)")
+    parser.add_argument("--max-windows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=200, help="single-window timing samples")
+    parser.add_argument("--report", help="write the full report as JSON")
+    args = parser.parse_args()
+
+    from model_manager import load_model_version
+
+    float_model = load_model_version(args.model)
+    paths = export(float_model.model, args.output_dir, args.variants.split(","), float_model.threshold)
+    for variant, path in paths.items():
+        print(f"Exported {variant}: {path} ({os.path.getsize(path) / 1024:.0f} KiB)")
+
+    windows = held_out_windows(args.recording, args.max_windows)
+    results = report(args.model, paths, windows, args.batch_size, args.repeats)
+
+    print(f"\n{results['windows']} held-out windows, {results['reference_attack_windows']} flagged by the float model")
+    print(f"{'variant':<14} {'KiB':>7} {'RSS MiB':>8} {'p50 ms':>8} {'p99 ms':>8} {'win/s':>9} {'score d':>9} {'agree':>7}")
+    for name, row in results["variants"].items():
+        score_delta = f"{row['score_abs_delta_max']:.4f}" if "score_abs_delta_max" in row else "-"
+        agreement = f"{row['decision_agreement']:.2%}" if "decision_agreement" in row else "-"
+        rss = f"{row['model_rss_bytes'] / 2**20:.1f}" if row["model_rss_bytes"] is not None else "-"
+        print(f"{name:<14} {row['file_bytes'] / 1024:>7.0f} {rss:>8} {row['single_p50_ms']:>8.3f} {row['single_p99_ms']:>8.3f} "
+              f"{row['batch_windows_per_s']:>9.0f} {score_delta:>9} {agreement:>7}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nReport written to {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Deterministic replay of recorded telemetry through the detection logic.
+
+Recorded telemetry is a JSONL or CSV file with one frame per row:
+    timestamp  - ISO-8601 string or epoch seconds
+    device_id  - optional, defaults to "default"
+    data       - list of 6 floats (JSONL), or columns f0..f5 (CSV)
+    anomaly_score - optional precomputed score; skips the model entirely
+    label      - optional ground truth (1 = under attack), used by sweep.py
+
+The backend's telemetry_history entries use this shape, so they can be
+dumped and replayed directly.
+
+Windows are built per device exactly like detect_anomaly (last 10 frames),
+scored in large model batches, then fed in time order through the same
+decide()/countdown_tick() rules as the live backend. The countdown runs on
+a virtual clock that ticks once per second of recorded time instead of
+asyncio.sleep(1), so hours of telemetry replay in seconds.
+
+Usage:
+    python replay.py recording.jsonl --output timeline.json
+    python replay.py recording.csv --attack-threshold 0.6 --countdown 4
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import numpy as np
+import pandas as pd
+
+from state_machine import (
+    ATTACK_THRESHOLD, CRITICAL_THRESHOLD, COUNTDOWN_SECONDS, decide, countdown_tick
+)
+
+TIMESTEPS = 10
+N_FEATURES = 6
+
+class Recording:
+    """Telemetry sorted by time, as flat NumPy arrays"""
+
+    def __init__(self, timestamps, device_ids, frames, scores=None, labels=None):
+        order = np.argsort(timestamps, kind="stable")
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)[order]
+        self.device_ids = np.asarray(device_ids, dtype=object)[order]
+        self.frames = np.asarray(frames, dtype=np.float32)[order]
+        self.scores = None if scores is None else np.asarray(scores, dtype=np.float64)[order]
+        self.labels = None if labels is None else np.asarray(labels, dtype=np.int8)[order]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+def _to_epoch(values) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64)
+    return pd.to_datetime(values, format="ISO8601").astype("int64").to_numpy() / 1e9
+
+def load_recording(path: str) -> Recording:
+    """Load a JSONL or CSV telemetry recording"""
+    if path.endswith(".csv"):
+        df = pd.read_csv(path)
+        frames = df[[f"f{i}" for i in range(N_FEATURES)]].to_numpy(dtype=np.float32)
+    else:
+        df = pd.read_json(path, lines=True, convert_dates=False, keep_default_dates=False)
+        frames = np.array(df["data"].tolist(), dtype=np.float32)
+
+    if frames.ndim != 2 or frames.shape[1] != N_FEATURES:
+        raise ValueError(f"Expected {N_FEATURES} features per frame, got shape {frames.shape}")
+
+    device_ids = df["device_id"].astype(str).to_numpy() if "device_id" in df else np.full(len(df), "default", dtype=object)
+    scores = df["anomaly_score"].to_numpy(dtype=np.float64) if "anomaly_score" in df else None
+    labels = df["label"].to_numpy(dtype=np.int8) if "label" in df else None
+    return Recording(_to_epoch(df["timestamp"]), device_ids, frames, scores, labels)
+
+def iter_window_batches(recording: Recording, batch_size: int = 4096):
+    """Sliding windows per device, as detect_anomaly would see them.
+
+    Yields (frame_indices, windows) batches where frame_indices[i] is the
+    frame that completed windows[i]. Frames before a device's 10th frame
+    have no window and are not scored.
+    """
+    codes, _ = pd.factorize(recording.device_ids)
+    order = np.argsort(codes, kind="stable")  # grouped by device, still time-ordered
+    groups = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1)
+
+    pending_indices, pending_windows, pending = [], [], 0
+    for device_rows in groups:
+        if len(device_rows) < TIMESTEPS:
+            continue
+        view = np.lib.stride_tricks.sliding_window_view(recording.frames[device_rows], TIMESTEPS, axis=0)
+        pending_windows.append(view.transpose(0, 2, 1))
+        pending_indices.append(device_rows[TIMESTEPS - 1:])
+        pending += len(view)
+
+        if pending >= batch_size:
+            indices, windows = np.concatenate(pending_indices), np.concatenate(pending_windows)
+            for start in range(0, len(windows) - batch_size + 1, batch_size):
+                yield indices[start:start + batch_size], windows[start:start + batch_size]
+            rest = len(windows) - len(windows) % batch_size
+            pending_indices, pending_windows = [indices[rest:]], [windows[rest:]]
+            pending = len(windows) - rest
+
+    if pending:
+        yield np.concatenate(pending_indices), np.concatenate(pending_windows)
+
+def score_recording(recording: Recording, model=None, batch_size: int = 4096) -> np.ndarray:
+    """Anomaly score per frame (NaN where no full window exists)"""
+    if recording.scores is not None:
+        return recording.scores
+
+    scores = np.full(len(recording), np.nan)
+    for frame_indices, windows in iter_window_batches(recording, batch_size):
+        batch_scores, _, _ = model.predict_anomaly_batch(windows)
+        scores[frame_indices] = batch_scores
+    return scores
+
+class VirtualClock:
+    """Replay clock: advances only with recorded timestamps"""
+
+    def __init__(self, start: float):
+        self.now = start
+        self.next_tick = start + 1.0
+
+    def advance(self, to: float) -> int:
+        """Move to `to`; returns how many one-second ticks elapsed"""
+        self.now = to
+        if to < self.next_tick:
+            return 0
+        ticks = int(to - self.next_tick) + 1
+        self.next_tick += ticks
+        return ticks
+
+class DeviceState:
+    __slots__ = ("state", "timer")
+
+    def __init__(self):
+        self.state = "NORMAL"
+        self.timer = None
+
+def replay(
+    recording: Recording,
+    scores: np.ndarray,
+    attack_threshold: float = ATTACK_THRESHOLD,
+    critical_threshold: float = CRITICAL_THRESHOLD,
+    countdown: int = COUNTDOWN_SECONDS,
+    per_device: bool = True
+) -> List[Dict]:
+    """Drive the state machine over scored frames; returns the attack timeline"""
+    timeline = []
+    if len(recording) == 0:
+        return timeline
+
+    states: Dict[str, DeviceState] = {}
+    clock = VirtualClock(recording.timestamps[0])
+    # Devices with a running countdown, so ticks never scan the whole fleet
+    counting: Dict[str, DeviceState] = {}
+
+    def tick(tick_time):
+        for key, device in list(counting.items()):
+            device.timer, finished = countdown_tick(device.state, device.timer)
+            if finished:
+                device.state = "SAFE_MODE"
+                counting.pop(key)
+                timeline.append({
+                    "event": "SAFE_MODE_ACTIVATED",
+                    "timestamp": tick_time,
+                    "device_id": key,
+                    "trigger": "COUNTDOWN"
+                })
+
+    timestamps = recording.timestamps
+    device_ids = recording.device_ids
+    for i in range(len(recording)):
+        now = timestamps[i]
+        ticks = clock.advance(now)
+        if ticks and counting:
+            first_tick = clock.next_tick - ticks
+            for k in range(ticks):
+                tick(first_tick + k)
+                if not counting:
+                    break
+
+        score = scores[i]
+        if score != score:  # NaN: no full window yet, or a window cleared without the model
+            continue
+
+        key = device_ids[i] if per_device else "fleet"
+        device = states.get(key)
+        if device is None:
+            device = states[key] = DeviceState()
+
+        transition = decide(device.state, score, attack_threshold, critical_threshold)
+        if transition == "ATTACK_DETECTED":
+            device.state = "ATTACK_DETECTED"
+            device.timer = countdown
+            counting[key] = device
+            timeline.append({
+                "event": "ATTACK_DETECTED",
+                "timestamp": now,
+                "device_id": device_ids[i],
+                "anomaly_score": float(score)
+            })
+        elif transition == "SAFE_MODE":
+            device.state = "SAFE_MODE"
+            counting.pop(key, None)
+            timeline.append({
+                "event": "SAFE_MODE_ACTIVATED",
+                "timestamp": now,
+                "device_id": device_ids[i],
+                "trigger": "ML_MODEL_DECISION",
+                "anomaly_score": float(score)
+            })
+
+    return timeline
+
+def load_model(path: Optional[str] = None):
+    """Load the autoencoder the same way the backend does"""
+    import joblib
+    from tensorflow.keras.models import load_model as keras_load_model
+    from model import LSTMAutoencoder, load_threshold
+
+    path = path or os.path.join("models", "lstm_autoencoder.h5")
+    model = LSTMAutoencoder()
+    model.model = keras_load_model(path, compile=False)
+    model.scaler = joblib.load(os.path.join(os.path.dirname(path), "scaler.pkl"))
+    threshold = load_threshold(path)
+    if threshold is not None:
+        model.threshold = threshold
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded telemetry through the detection logic")
+    parser.add_argument("recording", help="JSONL or CSV telemetry file")
+    parser.add_argument("--model", help="path to the .h5 model (default models/lstm_autoencoder.h5)")
+    parser.add_argument("--attack-threshold", type=float, default=ATTACK_THRESHOLD)
+    parser.add_argument("--critical-threshold", type=float, default=CRITICAL_THRESHOLD)
+    parser.add_argument("--countdown", type=int, default=COUNTDOWN_SECONDS)
+    parser.add_argument("--global-state", action="store_true",
+                        help="one state for all devices, like the live backend")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--output", help="write timeline and summary JSON to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    recording = load_recording(args.recording)
+    loaded = time.perf_counter()
+
+    model = None if recording.scores is not None else load_model(args.model)
+    scores = score_recording(recording, model, args.batch_size)
+    scored = time.perf_counter()
+
+    timeline = replay(
+        recording, scores,
+        attack_threshold=args.attack_threshold,
+        critical_threshold=args.critical_threshold,
+        countdown=args.countdown,
+        per_device=not args.global_state
+    )
+    finished = time.perf_counter()
+
+    summary = {
+        "frames": len(recording),
+        "devices": int(len(pd.unique(recording.device_ids))),
+        "recorded_seconds": float(recording.timestamps[-1] - recording.timestamps[0]) if len(recording) else 0.0,
+        "attacks_detected": sum(1 for e in timeline if e["event"] == "ATTACK_DETECTED"),
+        "safe_mode_activations": sum(1 for e in timeline if e["event"] == "SAFE_MODE_ACTIVATED"),
+        "load_seconds": round(loaded - start, 3),
+        "scoring_seconds": round(scored - loaded, 3),
+        "state_machine_seconds": round(finished - scored, 3),
+        "frames_per_minute": round(len(recording) / max(finished - start, 1e-9) * 60)
+    }
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"summary": summary, "timeline": timeline}, f, indent=2, default=str)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Attack scenarios that unfold over time, injectable into live device sessions.
+
+A scenario is a generator function registered with @scenario. It is called
+as gen(rng, n_devices, **params) and yields telemetry blocks shaped
+[steps, n_devices, 6], computed with NumPy for every target device at once.
+Frames use the frontend's layout: speed, acceleration, lateral and
+vertical acceleration, latitude and longitude deltas.
+
+An injection pulls one step per tick and feeds each device's frame through
+the same detection path as WebSocket telemetry. A tick lasts
+1 / (rate * scenario.rate_multiplier) seconds. It records when each device
+first scores above the attack cut-off.
+"""
+import asyncio
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+import metrics
+from attack_bank import ATTACK_PROFILES
+from state_machine import ATTACK_THRESHOLD
+
+N_FEATURES = 6
+CHUNK_STEPS = 64
+
+frames_injected = metrics.registry.register(metrics.Counter(
+    "scooter_scenario_frames_injected_total", "Telemetry frames injected by attack scenarios"))
+detection_latency_seconds = metrics.registry.register(metrics.Histogram(
+    "scooter_scenario_detection_seconds", "Time from scenario start to first detection per device",
+    (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)))
+
+class Scenario:
+    def __init__(self, name: str, generator: Callable, description: str, rate_multiplier: float, defaults: Dict):
+        self.name = name
+        self.generator = generator
+        self.description = description
+        self.rate_multiplier = rate_multiplier
+        self.defaults = defaults
+
+    def frames(self, n_devices: int, seed: Optional[int] = None, **params) -> Iterator[np.ndarray]:
+        """Endless [n_devices, 6] frames, one per tick"""
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: {', '.join(sorted(unknown))}")
+        blocks = self.generator(np.random.default_rng(seed), n_devices, **{**self.defaults, **params})
+        return (frame for block in blocks for frame in block)
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "rate_multiplier": self.rate_multiplier,
+            "params": self.defaults
+        }
+
+SCENARIOS: Dict[str, Scenario] = {}
+
+def scenario(name: str, description: str, rate_multiplier: float = 1.0, **defaults):
+    """Register a generator function as an attack scenario"""
+    def register(generator):
+        SCENARIOS[name] = Scenario(name, generator, description, rate_multiplier, defaults)
+        return generator
+    return register
+
+def normal_frames(rng, steps: int, n_devices: int) -> np.ndarray:
+    """Normal riding telemetry [steps, n_devices, 6], as generated by the frontend"""
+    u = rng.random((steps, n_devices, N_FEATURES)) - 0.5
+    return u * np.array([3.0, 2.0, 0.5, 0.2, 0.0001, 0.0001]) + np.array([33.5, 0.0, 0.0, 9.8, 0.0, 0.0])
+
+@scenario("gps_drift", "Spoofed position that walks away from the true track at a growing rate",
+          growth=0.005, max_offset=0.5)
+def gps_drift(rng, n_devices, growth, max_offset):
+    # Each device drifts in its own random direction
+    heading = rng.uniform(0, 2 * np.pi, n_devices)
+    direction = np.stack([np.cos(heading), np.sin(heading)], axis=-1)
+    for start in itertools.count(0, CHUNK_STEPS):
+        block = normal_frames(rng, CHUNK_STEPS, n_devices)
+        step = np.arange(start, start + CHUNK_STEPS)[:, None, None]
+        block[:, :, 4:6] += np.minimum(step * growth, max_offset) * direction
+        yield block
+
+@scenario("speed_injection", "Forged speed readings ramping to a target the accelerometer does not support",
+          target=200.0, ramp_steps=5)
+def speed_injection(rng, n_devices, target, ramp_steps):
+    for start in itertools.count(0, CHUNK_STEPS):
+        block = normal_frames(rng, CHUNK_STEPS, n_devices)
+        progress = np.minimum(np.arange(start, start + CHUNK_STEPS) / max(ramp_steps, 1), 1.0)[:, None]
+        block[:, :, 0] += progress * (target - block[:, :, 0])
+        yield block
+
+@scenario("replay", "A captured stretch of genuine telemetry looped back verbatim (stealthy)",
+          capture_steps=10)
+def replay(rng, n_devices, capture_steps):
+    captured = normal_frames(rng, max(int(capture_steps), 1), n_devices)
+    repeats = -(-CHUNK_STEPS // len(captured))
+    loop = np.concatenate([captured] * repeats)
+    for start in itertools.count(0, CHUNK_STEPS):
+        # Keep the loop phase continuous across blocks
+        yield np.roll(loop, -(start % len(captured)), axis=0)[:CHUNK_STEPS]
+
+@scenario("can_flooding", "Bus flooded with high-rate junk frames interleaved with stuck readings",
+          rate_multiplier=20.0, junk_fraction=0.8, scale=100.0)
+def can_flooding(rng, n_devices, junk_fraction, scale):
+    stuck = rng.uniform(-scale, scale, (n_devices, N_FEATURES))
+    for _ in itertools.count():
+        block = np.broadcast_to(stuck, (CHUNK_STEPS, n_devices, N_FEATURES)).copy()
+        junk = rng.random((CHUNK_STEPS, n_devices)) < junk_fraction
+        block[junk] = rng.uniform(-scale, scale, (int(junk.sum()), N_FEATURES))
+        yield block
+
+def _template(profile):
+    def generator(rng, n_devices):
+        template = np.asarray(profile, dtype=np.float64)
+        while True:
+            yield template + rng.uniform(-0.1, 0.1, (CHUNK_STEPS, n_devices, N_FEATURES)) * template
+    return generator
+
+# The fixed simulation profiles, as steady-state scenarios
+for _name, _profile in ATTACK_PROFILES.items():
+    scenario(_name, f"Steady {_name} attack template with 10% noise")(_template(_profile))
+
+class Injection:
+    """One scenario running against a set of devices"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, scenario: Scenario, device_ids: Optional[List[str]], devices: int, rate: float,
+                 duration: float, params: Dict, seed: Optional[int] = None):
+        self.id = next(self._ids)
+        self.scenario = scenario
+        # Without explicit targets, attack simulated devices of its own
+        self.device_ids = device_ids or [f"scenario-{self.id}-{i}" for i in range(devices)]
+        self.rate = rate
+        self.duration = duration
+        self.frames = scenario.frames(len(self.device_ids), seed, **params)
+        self.params = params
+        self.status = "pending"
+        self.started_at = None
+        self.frames_sent = 0
+        self.detections: Dict[str, float] = {}
+        self.task = None
+
+    async def run(self, send: Callable[[List[float], str, float], Awaitable], score_of: Callable[[str], float]):
+        """Feed frames at the scenario's rate until the duration elapses or the task is cancelled"""
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / (self.rate * self.scenario.rate_multiplier)
+        self.status = "running"
+        self.started_at = time.time()
+        start = loop.time()
+
+        try:
+            for tick, tick_frames in enumerate(self.frames):
+                # Absolute deadlines, so slow ticks do not stretch the schedule
+                deadline = start + tick * interval
+                if tick * interval >= self.duration or loop.time() - start >= self.duration:
+                    break
+                delay = deadline - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                for device_id, frame in zip(self.device_ids, tick_frames.tolist()):
+                    await send(frame, device_id, time.perf_counter())
+                    self.frames_sent += 1
+                    frames_injected.inc()
+                    if device_id not in self.detections and score_of(device_id) > ATTACK_THRESHOLD:
+                        latency = loop.time() - start
+                        self.detections[device_id] = latency
+                        detection_latency_seconds.observe(latency)
+            self.status = "finished"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            print(f"Error in scenario injection {self.id}: {e}")
+
+    def describe(self) -> Dict:
+        latencies = sorted(self.detections.values())
+        return {
+            "id": self.id,
+            "scenario": self.scenario.name,
+            "status": self.status,
+            "devices": len(self.device_ids),
+            "rate": self.rate * self.scenario.rate_multiplier,
+            "duration": self.duration,
+            "params": self.params,
+            "started_at": self.started_at,
+            "frames_sent": self.frames_sent,
+            "devices_detected": len(latencies),
+            "detection_latency_p50_s": latencies[len(latencies) // 2] if latencies else None,
+            "detection_latency_max_s": latencies[-1] if latencies else None,
+            "detections": self.detections
+        }
@@ -0,0 +1,108 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+import metrics
+
+# Opt-in via environment, e.g. SCOOTER_SCORE_CACHE=1
+SCORE_CACHE_ENABLED = os.environ.get("SCOOTER_SCORE_CACHE", "0") == "1"
+
+# Per-feature quantization step: speed (km/h), longitudinal, lateral and
+# vertical acceleration (m/s^2), GPS deltas (deg). Windows whose values all
+# agree within one step count as the same window.
+DEFAULT_QUANTUM = (0.1, 0.05, 0.02, 0.01, 1e-6, 1e-6)
+
+device_hits = metrics.registry.register(metrics.Counter(
+    "scooter_score_cache_device_hits_total", "Windows reused from the device's last scored window"))
+lru_hits = metrics.registry.register(metrics.Counter(
+    "scooter_score_cache_lru_hits_total", "Windows found in the global quantized-window LRU"))
+cache_misses = metrics.registry.register(metrics.Counter(
+    "scooter_score_cache_misses_total", "Windows that needed a model forward pass"))
+
+# (mse, attribution) of a scored window
+Entry = Tuple[float, Optional[Dict]]
+
+class ScoreCache:
+    """Memoized reconstruction errors for near-identical windows.
+
+    Two levels, checked in order:
+      - per device: the last scored window, reused while every value of
+        the new window is within one quantum of it (parked or idle
+        scooters resend the same readings every second)
+      - global: an LRU of `max_entries` windows keyed on a hash of the
+        window quantized to the same steps, shared across devices
+
+    Only the MSE and its error attribution are cached; scores are derived
+    from the MSE with the current threshold, so threshold changes and
+    adaptive thresholds stay correct.
+    Entries belong to one model and are cleared when it is replaced.
+    """
+
+    def __init__(self, quantum=DEFAULT_QUANTUM, max_entries: int = 10000):
+        self.quantum = np.asarray(quantum, dtype=np.float64)
+        self.inv_quantum = 1.0 / self.quantum
+        self.max_entries = max_entries
+        self.last: Dict[str, Tuple[np.ndarray, Entry]] = {}
+        self.lru: "OrderedDict[bytes, Entry]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "ScoreCache":
+        """SCOOTER_SCORE_CACHE_QUANTUM (6 comma-separated steps) and SCOOTER_SCORE_CACHE_SIZE"""
+        quantum = os.environ.get("SCOOTER_SCORE_CACHE_QUANTUM")
+        size = os.environ.get("SCOOTER_SCORE_CACHE_SIZE")
+        return cls(
+            [float(step) for step in quantum.split(",")] if quantum else DEFAULT_QUANTUM,
+            int(size) if size else 10000
+        )
+
+    def _key(self, window: np.ndarray) -> bytes:
+        quantized = np.rint(window * self.inv_quantum).astype(np.int64)
+        return hashlib.blake2b(quantized.tobytes(), digest_size=16).digest()
+
+    def lookup(self, device_id: str, window: np.ndarray) -> Optional[Entry]:
+        """Cached (mse, attribution) for the window, or None if the model has to run"""
+        last = self.last.get(device_id)
+        if last is not None and (np.abs(window - last[0]) <= self.quantum).all():
+            device_hits.inc()
+            return last[1]
+
+        key = self._key(window)
+        entry = self.lru.get(key)
+        if entry is not None:
+            self.lru.move_to_end(key)
+            self.last[device_id] = (window.copy(), entry)
+            lru_hits.inc()
+            return entry
+
+        cache_misses.inc()
+        return None
+
+    def store(self, device_id: str, window: np.ndarray, mse: float, attribution: Optional[Dict] = None):
+        entry = (float(mse), attribution)
+        self.last[device_id] = (window.copy(), entry)
+        self.lru[self._key(window)] = entry
+        if len(self.lru) > self.max_entries:
+            self.lru.popitem(last=False)
+
+    def forget(self, device_id: str):
+        self.last.pop(device_id, None)
+
+    def clear(self):
+        self.last.clear()
+        self.lru.clear()
+
+    def describe(self) -> Dict:
+        hits = device_hits.value + lru_hits.value
+        total = hits + cache_misses.value
+        return {
+            "device_hits": device_hits.value,
+            "lru_hits": lru_hits.value,
+            "misses": cache_misses.value,
+            "hit_rate": hits / total if total else None,
+            "lru_entries": len(self.lru),
+            "max_entries": self.max_entries,
+            "devices": len(self.last)
+        }
@@ -0,0 +1,87 @@
+"""JSON encoding for HTTP responses and WebSocket frames, and decoding of client frames.
+
+Payloads carry NumPy scalars and arrays straight from the model
+(anomaly_score, mse, reconstructions), so every serializer encodes them
+natively instead of requiring float() coercion at each call site.
+
+Serializers:
+    orjson  - native NumPy support, several times faster than stdlib json
+    json    - stdlib fallback with a NumPy-aware default hook
+
+SCOOTER_JSON=orjson|json picks one explicitly; the default uses orjson
+when it is installed.
+"""
+import json
+import os
+from datetime import date, datetime
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+def _default(obj):
+    """Types neither encoder handles natively"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class StdlibSerializer:
+    name = "json"
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+class OrjsonSerializer:
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._dumps = orjson.dumps
+        self.loads = orjson.loads
+        self._options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj) -> bytes:
+        return self._dumps(obj, default=_default, option=self._options)
+
+SERIALIZERS = {
+    "orjson": OrjsonSerializer,
+    "json": StdlibSerializer,
+}
+
+def get_serializer(name: str = None):
+    """Serializer by name; None picks the fastest one available"""
+    if name:
+        if name not in SERIALIZERS:
+            raise ValueError(f"Unknown serializer '{name}', expected one of {', '.join(SERIALIZERS)}")
+        return SERIALIZERS[name]()
+    try:
+        return OrjsonSerializer()
+    except ImportError:
+        return StdlibSerializer()
+
+serializer = get_serializer(os.environ.get("SCOOTER_JSON") or None)
+
+def dumps(obj) -> bytes:
+    return serializer.dumps(obj)
+
+def loads(data):
+    """Decode JSON from str or bytes; raises ValueError on malformed input"""
+    return serializer.loads(data)
+
+def dumps_text(obj) -> str:
+    """Encoded JSON as str, for text WebSocket frames"""
+    return serializer.dumps(obj).decode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the configured serializer"""
+
+    def render(self, content) -> bytes:
+        return serializer.dumps(content)
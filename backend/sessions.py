@@ -0,0 +1,251 @@
+"""Lifecycle of per-device state: idle eviction, spill to disk and connection heartbeats.
+
+Every frame touches its device's session. Sessions are kept in last-seen
+order, so both eviction policies cost O(1) per evicted device:
+  - TTL: a sweeper evicts devices idle for longer than `idle_ttl` seconds
+  - LRU: once `max_devices` are tracked, the least recently seen device
+    is evicted when a new one arrives
+
+Each kind of per-device state (window buffer, fleet entry, adaptive
+baseline, caches) registers a release hook, so per-device memory stays
+bounded by `max_devices` however many scooters come and go.
+
+With a spill path, the state that is slow to rebuild (state registered
+with a snapshot hook, such as the adaptive baseline) is pickled to
+SQLite on eviction. A returning device gets it back on its first frame
+instead of re-learning it. Window buffers are not spilled: frames from
+before the gap would not form a contiguous window. Spilled sessions older
+than `spill_ttl` are purged.
+
+Connections that send no frame (telemetry or PING) for
+`heartbeat_timeout` seconds are closed. This also catches clients that
+vanished without a close handshake.
+
+Environment: SCOOTER_SESSION_TTL, SCOOTER_MAX_DEVICES,
+SCOOTER_HEARTBEAT_TIMEOUT and SCOOTER_SESSION_SPILL (database path;
+unset disables spilling).
+"""
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+sessions_evicted = metrics.registry.register(metrics.Counter(
+    "scooter_sessions_evicted_total", "Device sessions evicted (idle or over the device limit)"))
+sessions_restored = metrics.registry.register(metrics.Counter(
+    "scooter_sessions_restored_total", "Evicted device sessions restored from spill"))
+connections_timed_out = metrics.registry.register(metrics.Counter(
+    "scooter_connections_timed_out_total", "WebSocket connections closed after a missed heartbeat"))
+active_sessions = metrics.registry.register(metrics.Gauge(
+    "scooter_active_sessions", "Devices with state held in memory"))
+
+class SessionSpill:
+    """SQLite table of pickled device state; blocking, call it off the event loop"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(
+            "CREATE TABLE IF NOT EXISTS sessions (device_id TEXT PRIMARY KEY, evicted_at REAL NOT NULL, state BLOB NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS sessions_evicted_at ON sessions (evicted_at);")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def write(self, rows: List[Tuple[str, float, bytes]]):
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO sessions (device_id, evicted_at, state) VALUES (?, ?, ?)", rows)
+
+    def take(self, device_id: str) -> Optional[bytes]:
+        """Remove and return a device's spilled state"""
+        conn = self._connection()
+        with conn:
+            row = conn.execute("SELECT state FROM sessions WHERE device_id = ?", (device_id,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM sessions WHERE device_id = ?", (device_id,))
+        return row[0] if row else None
+
+    def purge(self, before: float) -> int:
+        conn = self._connection()
+        with conn:
+            return conn.execute("DELETE FROM sessions WHERE evicted_at < ?", (before,)).rowcount
+
+class SessionManager:
+    def __init__(self, idle_ttl: float = 600.0, max_devices: int = 10000, heartbeat_timeout: float = 30.0,
+                 sweep_interval: float = 5.0, spill: Optional[SessionSpill] = None, spill_ttl: float = 7 * 86400):
+        self.idle_ttl = idle_ttl
+        self.max_devices = max_devices
+        self.heartbeat_timeout = heartbeat_timeout
+        self.sweep_interval = sweep_interval
+        self.spill = spill
+        self.spill_ttl = spill_ttl
+        self.last_seen: "OrderedDict[str, float]" = OrderedDict()
+        self.connections: Dict[Any, float] = {}
+        self.hooks: List[Tuple[str, Callable, Optional[Callable], Optional[Callable]]] = []
+        # Evicted state not yet written by the sweeper
+        self.pending: Dict[str, bytes] = {}
+        # Returning devices whose spilled state is being read back
+        self.restoring: Dict[str, asyncio.Event] = {}
+        self.on_timeout: Optional[Callable] = None
+        self.task = None
+
+    @classmethod
+    def from_env(cls) -> "SessionManager":
+        spill_path = os.environ.get("SCOOTER_SESSION_SPILL")
+        return cls(
+            idle_ttl=float(os.environ.get("SCOOTER_SESSION_TTL", 600)),
+            max_devices=int(os.environ.get("SCOOTER_MAX_DEVICES", 10000)),
+            heartbeat_timeout=float(os.environ.get("SCOOTER_HEARTBEAT_TIMEOUT", 30)),
+            spill=SessionSpill(spill_path) if spill_path else None
+        )
+
+    def register(self, name: str, release: Callable[[str], None],
+                 snapshot: Optional[Callable[[str], Any]] = None,
+                 restore: Optional[Callable[[str, Any], None]] = None):
+        """Per-device state to drop on eviction; with snapshot/restore it is also spilled"""
+        self.hooks.append((name, release, snapshot, restore))
+
+    async def touch(self, device_id: str):
+        """Mark a device active; a returning device gets its spilled state back"""
+        if device_id not in self.last_seen and self.spill is not None:
+            # Restore before the device is listed as active: its other frames
+            # wait here rather than building fresh state the snapshot would overwrite
+            restoring = self.restoring.get(device_id)
+            if restoring is None:
+                restoring = self.restoring[device_id] = asyncio.Event()
+                try:
+                    await self._restore(device_id)
+                finally:
+                    del self.restoring[device_id]
+                    restoring.set()
+            else:
+                await restoring.wait()
+
+        now = time.monotonic()
+        if device_id in self.last_seen:
+            self.last_seen.move_to_end(device_id)
+            self.last_seen[device_id] = now
+            return
+
+        self.last_seen[device_id] = now
+        if len(self.last_seen) > self.max_devices:
+            self.evict(next(iter(self.last_seen)))
+        active_sessions.set(len(self.last_seen))
+
+    def evict(self, device_id: str):
+        """Release a device's state, keeping a snapshot for spill if enabled"""
+        if self.last_seen.pop(device_id, None) is None:
+            return
+        if self.spill is not None:
+            snapshot = {}
+            for name, _, take_snapshot, _ in self.hooks:
+                value = take_snapshot(device_id) if take_snapshot is not None else None
+                if value is not None:
+                    snapshot[name] = value
+            if snapshot:
+                self.pending[device_id] = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        for _, release, _, _ in self.hooks:
+            release(device_id)
+        sessions_evicted.inc()
+        active_sessions.set(len(self.last_seen))
+
+    async def _restore(self, device_id: str):
+        blob = self.pending.pop(device_id, None)
+        try:
+            if blob is None:
+                blob = await asyncio.to_thread(self.spill.take, device_id)
+            if blob is None:
+                return
+            snapshot = pickle.loads(blob)
+        except Exception as e:
+            print(f"Error restoring session {device_id}: {e}")
+            return
+        for name, _, _, restore in self.hooks:
+            if restore is not None and name in snapshot:
+                restore(device_id, snapshot[name])
+        sessions_restored.inc()
+
+    def heartbeat(self, connection):
+        self.connections[connection] = time.monotonic()
+
+    def disconnect(self, connection):
+        self.connections.pop(connection, None)
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._sweeper())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self._flush()
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Error in session sweep: {e}")
+
+    async def sweep(self):
+        now = time.monotonic()
+
+        # Oldest first: stop at the first device seen recently enough
+        idle_before = now - self.idle_ttl
+        while self.last_seen:
+            device_id, last_seen = next(iter(self.last_seen.items()))
+            if last_seen >= idle_before:
+                break
+            self.evict(device_id)
+
+        silent_before = now - self.heartbeat_timeout
+        for connection in [c for c, last in self.connections.items() if last < silent_before]:
+            self.connections.pop(connection, None)
+            connections_timed_out.inc()
+            if self.on_timeout is not None:
+                await self.on_timeout(connection)
+
+        await self._flush()
+
+    async def _flush(self):
+        if self.spill is None:
+            return
+        if self.pending:
+            evicted_at = time.time()
+            rows = [(device_id, evicted_at, blob) for device_id, blob in self.pending.items()]
+            self.pending = {}
+            await asyncio.to_thread(self.spill.write, rows)
+        await asyncio.to_thread(self.spill.purge, time.time() - self.spill_ttl)
+
+    def describe(self) -> Dict:
+        return {
+            "devices": len(self.last_seen),
+            "max_devices": self.max_devices,
+            "idle_ttl": self.idle_ttl,
+            "connections": len(self.connections),
+            "heartbeat_timeout": self.heartbeat_timeout,
+            "evicted": sessions_evicted.value,
+            "restored": sessions_restored.value,
+            "timed_out": connections_timed_out.value,
+            "spill": self.spill.path if self.spill else None,
+            "pending_spill": len(self.pending)
+        }
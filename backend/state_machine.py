@@ -0,0 +1,39 @@
+"""ML decision and countdown logic shared by the live backend and replay.
+
+The functions are pure: they take the current state and return the
+transition, so the same rules can run on the event loop with wall-clock
+ticks or in replay against a virtual clock.
+"""
+
+# Decision thresholds
+ATTACK_THRESHOLD = 0.7
+CRITICAL_THRESHOLD = 0.9
+
+# Seconds between attack detection and safe mode
+COUNTDOWN_SECONDS = 6
+
+# States in which the countdown runs
+COUNTDOWN_STATES = ("ATTACK_DETECTED", "ATTACK_SIMULATION")
+
+def decide(state, score, attack_threshold=ATTACK_THRESHOLD, critical_threshold=CRITICAL_THRESHOLD):
+    """Apply the ML decision rule to a new anomaly score.
+
+    Returns "ATTACK_DETECTED" when a normal system crosses the attack
+    threshold, "SAFE_MODE" when an already detected attack crosses the
+    critical threshold, otherwise None.
+    """
+    if score > attack_threshold and state == "NORMAL":
+        return "ATTACK_DETECTED"
+    if score > critical_threshold and state == "ATTACK_DETECTED":
+        return "SAFE_MODE"
+    return None
+
+def countdown_tick(state, timer):
+    """Advance the safe mode countdown by one second.
+
+    Returns (new_timer, trigger_safe_mode).
+    """
+    if state not in COUNTDOWN_STATES or timer is None or timer <= 0:
+        return timer, False
+    timer -= 1
+    return timer, timer == 0
@@ -0,0 +1,235 @@
+"""Threshold / countdown / hysteresis sweep over cached reconstruction errors.
+
+The reconstruction MSE of a window does not depend on the threshold, so it
+is computed once with the model and cached. Every parameter combination is
+then evaluated with vectorized NumPy over the cached errors, spread across
+a process pool.
+
+Input is a replay recording (see replay.py) with an extra `label` column:
+1 while the device is under attack, 0 otherwise. Contiguous labelled runs
+per device are attack episodes.
+
+For each combination the sweep reports:
+    precision    - alarms that fall inside an attack episode / all alarms
+    recall       - episodes with at least one alarm / all episodes
+    detection latency      - first alarm in an episode minus episode start
+    safe mode latency      - safe mode (countdown expiry or a critical score
+                             after the alarm) minus episode start
+
+An alarm is raised when the score stays above the attack cut-off for
+`hysteresis` consecutive frames (1 = the live backend's behaviour).
+
+Usage:
+    python sweep.py labeled.jsonl --cache mse_cache.npz \\
+        --thresholds 0.4:1.6:0.05 --attack-cutoffs 0.6,0.7,0.8 \\
+        --countdowns 3,6,10 --hysteresis 1,2,3 --output sweep.csv
+"""
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import numpy as np
+import pandas as pd
+
+from replay import load_recording, iter_window_batches, load_model
+from state_machine import ATTACK_THRESHOLD, CRITICAL_THRESHOLD, COUNTDOWN_SECONDS
+
+def parse_grid(spec, cast=float):
+    """'a,b,c' or 'start:stop:step' (stop inclusive)"""
+    if ":" in spec:
+        start, stop, step = (float(x) for x in spec.split(":"))
+        return [cast(round(v, 6)) for v in np.arange(start, stop + step / 2, step)]
+    return [cast(v) for v in spec.split(",")]
+
+def build_cache(recording_path, model_path=None, batch_size=4096):
+    """Score every window once and keep per-frame MSE, grouped by device"""
+    recording = load_recording(recording_path)
+    if recording.labels is None:
+        raise ValueError("Recording has no 'label' column")
+
+    mse = np.full(len(recording), np.nan)
+    model = load_model(model_path)
+    for frame_indices, windows in iter_window_batches(recording, batch_size):
+        _, batch_mse, _ = model.predict_anomaly_batch(windows)
+        mse[frame_indices] = batch_mse
+
+    codes, _ = pd.factorize(recording.device_ids)
+    by_device = np.argsort(codes, kind="stable")
+    return {
+        "mse": mse[by_device],
+        "timestamps": recording.timestamps[by_device],
+        "device_codes": codes[by_device],
+        "labels": recording.labels[by_device],
+    }
+
+def load_cache(args):
+    if args.cache and os.path.exists(args.cache):
+        cached = np.load(args.cache)
+        print(f"Using cached reconstruction errors from {args.cache}")
+        return {key: cached[key] for key in cached.files}
+
+    start = time.perf_counter()
+    cache = build_cache(args.recording, args.model, args.batch_size)
+    print(f"Scored {np.isfinite(cache['mse']).sum()} windows in {time.perf_counter() - start:.1f}s")
+    if args.cache:
+        np.savez_compressed(args.cache, **cache)
+    return cache
+
+# Worker state, set once per process by the pool initializer
+_data = {}
+
+def _init_worker(cache):
+    _data.update(cache)
+    codes = cache["device_codes"]
+    labels = cache["labels"].astype(bool)
+    n = len(codes)
+    index = np.arange(n)
+
+    # Position of each device's first row, for resetting runs at boundaries
+    group_start = np.ones(n, dtype=bool)
+    group_start[1:] = codes[1:] != codes[:-1]
+    _data["index"] = index
+    _data["group_start"] = group_start
+
+    # Attack episodes: contiguous labelled runs within a device
+    prev_label = np.zeros(n, dtype=bool)
+    prev_label[1:] = labels[:-1]
+    episode_start = labels & (~prev_label | group_start)
+    episode_id = np.cumsum(episode_start) * labels
+    _data["labels"] = labels
+    _data["episode_id"] = episode_id
+    _data["n_episodes"] = int(episode_start.sum())
+    _data["episode_start_time"] = np.concatenate([[np.nan], cache["timestamps"][episode_start]])
+
+def _run_lengths(mask):
+    """Consecutive True count ending at each row, reset at device boundaries"""
+    index = _data["index"]
+    # Last row before the current run: a False row, or the row before a device's first row
+    breaks = np.where(~mask, index, np.where(_data["group_start"], index - 1, -1))
+    last_break = np.maximum.accumulate(breaks)
+    return np.where(mask, index - last_break, 0)
+
+def _next_true(mask):
+    """Index of the next True row at or after each row within the same device (-1 if none)"""
+    index = _data["index"]
+    codes = _data["device_codes"]
+    n = len(index)
+    positions = np.where(mask, index, n)
+    following = np.minimum.accumulate(positions[::-1])[::-1]
+    valid = following < n
+    same_device = np.zeros(n, dtype=bool)
+    same_device[valid] = codes[following[valid]] == codes[valid]
+    return np.where(valid & same_device, following, -1)
+
+def _latency_stats(values, prefix):
+    if len(values) == 0:
+        return {f"{prefix}_mean_s": None, f"{prefix}_p50_s": None, f"{prefix}_p95_s": None}
+    return {
+        f"{prefix}_mean_s": float(np.mean(values)),
+        f"{prefix}_p50_s": float(np.percentile(values, 50)),
+        f"{prefix}_p95_s": float(np.percentile(values, 95)),
+    }
+
+def evaluate(combos):
+    """Evaluate (threshold, attack_cutoff, critical_cutoff, countdown, hysteresis) combos"""
+    mse = _data["mse"]
+    timestamps = _data["timestamps"]
+    labels = _data["labels"]
+    episode_id = _data["episode_id"]
+    finite = np.isfinite(mse)
+    rows = []
+
+    for threshold, attack_cutoff, critical_cutoff, countdown, hysteresis in combos:
+        scores = np.where(finite, np.minimum(mse / threshold, 1.0), 0.0)
+        above = scores > attack_cutoff
+        alarms = _run_lengths(above) == hysteresis
+
+        alarm_idx = np.flatnonzero(alarms)
+        in_episode = labels[alarm_idx]
+        true_alarms = alarm_idx[in_episode]
+        false_alarms = int((~in_episode).sum())
+
+        # First alarm per episode (rows are time-ordered within a device)
+        episodes, first = np.unique(episode_id[true_alarms], return_index=True)
+        first_alarm = true_alarms[first]
+        detection_latency = timestamps[first_alarm] - _data["episode_start_time"][episodes]
+
+        # Safe mode: countdown expiry or the next critical score after the alarm
+        critical_next = _next_true(scores > critical_cutoff)
+        after = first_alarm + 1
+        # Only rows after the alarm on the same device count; none when the alarm is its device's last row
+        has_after = after < len(mse)
+        after = np.minimum(after, len(mse) - 1)
+        has_after &= _data["device_codes"][after] == _data["device_codes"][first_alarm]
+        crit_idx = np.where(has_after, critical_next[after], -1)
+        crit_time = np.where(crit_idx >= 0, timestamps[np.maximum(crit_idx, 0)], np.inf)
+        safe_mode_time = np.minimum(timestamps[first_alarm] + countdown, crit_time)
+        safe_mode_latency = safe_mode_time - _data["episode_start_time"][episodes]
+
+        precision = len(true_alarms) / len(alarm_idx) if len(alarm_idx) else 0.0
+        recall = len(episodes) / _data["n_episodes"] if _data["n_episodes"] else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+        rows.append({
+            "threshold": threshold,
+            "attack_cutoff": attack_cutoff,
+            "critical_cutoff": critical_cutoff,
+            "countdown": countdown,
+            "hysteresis": hysteresis,
+            "alarms": len(alarm_idx),
+            "false_alarms": false_alarms,
+            "episodes_detected": len(episodes),
+            "precision": precision,
+            "recall": recall,
+            "f1": f1,
+            **_latency_stats(detection_latency, "detection_latency"),
+            **_latency_stats(safe_mode_latency, "safe_mode_latency"),
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep detection parameters over cached reconstruction errors")
+    parser.add_argument("recording", help="labelled JSONL or CSV recording")
+    parser.add_argument("--model", help="path to the .h5 model")
+    parser.add_argument("--cache", help="npz file for cached per-window MSE (created if missing)")
+    parser.add_argument("--thresholds", default="0.4:1.6:0.05", help="model thresholds (MSE scale)")
+    parser.add_argument("--attack-cutoffs", default=str(ATTACK_THRESHOLD))
+    parser.add_argument("--critical-cutoffs", default=str(CRITICAL_THRESHOLD))
+    parser.add_argument("--countdowns", default=str(COUNTDOWN_SECONDS))
+    parser.add_argument("--hysteresis", default="1")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--output", default="sweep_results.csv", help="CSV of all combinations")
+    args = parser.parse_args()
+
+    cache = load_cache(args)
+
+    combos = list(itertools.product(
+        parse_grid(args.thresholds),
+        parse_grid(args.attack_cutoffs),
+        parse_grid(args.critical_cutoffs),
+        parse_grid(args.countdowns, int),
+        parse_grid(args.hysteresis, int),
+    ))
+    chunk = max(1, len(combos) // (args.workers * 4))
+    chunks = [combos[i:i + chunk] for i in range(0, len(combos), chunk)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(cache,)) as pool:
+        rows = [row for result in pool.map(evaluate, chunks) for row in result]
+    elapsed = time.perf_counter() - start
+
+    results = pd.DataFrame(rows).sort_values(["attack_cutoff", "hysteresis", "countdown", "threshold"])
+    results.to_csv(args.output, index=False)
+
+    print(f"Evaluated {len(combos)} combinations in {elapsed:.2f}s -> {args.output}")
+    columns = ["threshold", "attack_cutoff", "hysteresis", "countdown", "precision", "recall", "f1",
+               "detection_latency_p50_s", "safe_mode_latency_p50_s"]
+    print(results.sort_values(["f1", "detection_latency_p50_s"], ascending=[False, True])[columns].head(10).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Backend modules are flat and imported from the backend directory, as main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
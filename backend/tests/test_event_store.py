@@ -0,0 +1,106 @@
+import asyncio
+import random
+
+from event_store import ATTACK_EVENTS, MITIGATION_EVENT, RESET_EVENT, EventStore
+
+def make_store(tmp_path, **kwargs):
+    async def create():
+        return EventStore(str(tmp_path / "events.db"), **kwargs)
+    return asyncio.run(create())
+
+def event(name, device_id=None, ts=None):
+    return {"event": name, "device_id": device_id, "timestamp": ts}
+
+def expected_mitigated(events):
+    """Reference for the mitigated flag, computed over the whole timeline"""
+    boundaries = ATTACK_EVENTS + (RESET_EVENT,)
+    flags = []
+    for i, e in enumerate(events):
+        mitigated = False
+        for later in events[i:]:
+            if later is not e and later["event"] in boundaries:
+                break
+            if later["event"] == MITIGATION_EVENT and (
+                    later["device_id"] is None or e["device_id"] is None or later["device_id"] == e["device_id"]):
+                mitigated = True
+                break
+        flags.append(mitigated)
+    return flags
+
+def test_pages_are_newest_first_and_chain_on_before_id(tmp_path):
+    store = make_store(tmp_path)
+    store._write([event("ANOMALY", f"d{i % 3}", 1000 + i) for i in range(25)])
+
+    ids, before_id = [], None
+    while True:
+        page = store.query(before_id=before_id, limit=10)
+        if not page:
+            break
+        ids.extend(e["id"] for e in page)
+        before_id = page[-1]["id"]
+
+    assert ids == list(range(25, 0, -1))
+
+def test_filters(tmp_path):
+    store = make_store(tmp_path)
+    store._write([
+        event("ANOMALY", "a", 1000),
+        event("ATTACK_DETECTED", "a", 1001),
+        event("ANOMALY", "b", 1002),
+        event("ATTACK_DETECTED", "b", 1003),
+    ])
+
+    assert [e["id"] for e in store.query(event_types=["ATTACK_DETECTED"])] == [4, 2]
+    assert [e["id"] for e in store.query(device_id="b")] == [4, 3]
+    assert [e["id"] for e in store.query(since=1001, until=1003)] == [3, 2]
+    assert store.query(since=2000) == []
+
+def test_mitigated_stops_at_next_attack_or_reset(tmp_path):
+    store = make_store(tmp_path)
+    store._write([
+        event("ATTACK_DETECTED", "a"),   # 1: safe mode for a follows
+        event("ANOMALY", "b"),           # 2: safe mode for a only
+        event(MITIGATION_EVENT, "a"),    # 3
+        event("ATTACK_DETECTED", "a"),   # 4: reset comes first
+        event(RESET_EVENT),              # 5: fleet-wide safe mode follows
+        event(MITIGATION_EVENT),         # 6
+        event("ATTACK_DETECTED", "c"),   # 7: nothing after it
+    ])
+
+    flags = {e["id"]: e["mitigated"] for e in store.query()}
+    assert flags == {1: True, 2: False, 3: True, 4: False, 5: True, 6: True, 7: False}
+
+def test_mitigated_on_deep_pages(tmp_path):
+    rng = random.Random(7)
+    names = ["ANOMALY"] * 6 + ["ATTACK_DETECTED", MITIGATION_EVENT, RESET_EVENT]
+    events = [event(rng.choice(names), rng.choice(["a", "b", "c", None])) for _ in range(3000)]
+    store = make_store(tmp_path)
+    store._write(events)
+    expected = expected_mitigated(events)
+
+    for before_id in (None, 2000, 40, 2):
+        page = store.query(before_id=before_id, limit=100)
+        top = len(events) if before_id is None else before_id - 1
+        assert [e["id"] for e in page] == list(range(top, max(top - 100, 0), -1))
+        assert [e["mitigated"] for e in page] == [expected[e["id"] - 1] for e in page]
+
+def test_overflow_keeps_state_events_in_order(tmp_path):
+    async def scenario():
+        store = EventStore(str(tmp_path / "events.db"), max_queue=2, batch_size=2)
+        for i in range(6):
+            store.record(event("ANOMALY" if i % 2 else "ATTACK_DETECTED", "a", 1000 + i))
+        assert len(store.overflow) == 2
+        await store.stop()
+        return store
+
+    store = asyncio.run(scenario())
+    # Queue took events 0 and 1; of the rest only the state events 2 and 4 were kept
+    assert [e["timestamp"] for e in reversed(store.query())] == [1000, 1001, 1002, 1004]
+    assert store.overflow == []
+    assert store.queue.empty()
+
+def test_counts_survive_reopening(tmp_path):
+    store = make_store(tmp_path)
+    store._write([event("ATTACK_DETECTED", "a", 1000)])
+    reopened = make_store(tmp_path)
+    assert reopened.counts == {"ATTACK_DETECTED": 1}
@@ -0,0 +1,58 @@
+import pytest
+
+from fleet import FleetAggregator, classify_score
+
+def test_classify_score():
+    assert classify_score(0.1) == "NORMAL"
+    assert classify_score(0.8) == "ATTACK_DETECTED"
+    assert classify_score(0.95) == "SAFE_MODE"
+
+def test_counts_follow_latest_score():
+    fleet = FleetAggregator()
+    fleet.update("a", 0.1)
+    fleet.update("b", 0.8)
+    fleet.update("c", 0.95)
+    fleet.update("b", 0.2)
+
+    summary = fleet.summary()
+    assert summary["device_count"] == 3
+    assert summary["state_counts"] == {"NORMAL": 2, "SAFE_MODE": 1}
+    assert summary["score_histogram"]["counts"] == [0, 1, 1, 0, 0, 0, 0, 0, 0, 1]
+    assert summary["mean_anomaly_score"] == pytest.approx((0.1 + 0.2 + 0.95) / 3)
+    assert summary["total_updates"] == 4
+
+def test_remove_drops_contribution():
+    fleet = FleetAggregator()
+    fleet.update("a", 0.8)
+    fleet.update("b", 0.3)
+    fleet.remove("a")
+    fleet.remove("unknown")
+
+    summary = fleet.summary()
+    assert summary["device_count"] == 1
+    assert summary["state_counts"] == {"NORMAL": 1}
+    assert sum(summary["score_histogram"]["counts"]) == 1
+    assert [d["device_id"] for d in summary["top_devices"]] == ["b"]
+
+def test_top_devices_skips_stale_entries():
+    fleet = FleetAggregator()
+    for i in range(20):
+        fleet.update(f"d{i}", i / 20)
+    fleet.update("d19", 0.0)
+    fleet.remove("d18")
+
+    top = fleet.top_devices(3)
+    assert [d["device_id"] for d in top] == ["d17", "d16", "d15"]
+    assert top[0] == {"device_id": "d17", "anomaly_score": 0.85, "state": "ATTACK_DETECTED"}
+    # Reading the top devices leaves them in place
+    assert fleet.top_devices(3) == top
+
+def test_heap_stays_bounded_under_repeated_updates():
+    fleet = FleetAggregator()
+    for step in range(1000):
+        for device in range(5):
+            fleet.update(f"d{device}", (step + device) % 100 / 100)
+
+    assert len(fleet._heap) <= 4 * len(fleet.devices) + 64
+    expected = sorted(fleet.devices, key=lambda d: fleet.devices[d][0], reverse=True)
+    assert [d["device_id"] for d in fleet.top_devices(5)] == expected
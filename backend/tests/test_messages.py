@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import serialization
+from messages import MessageError, Ping, Subscribe, Telemetry, decode
+
+@pytest.fixture(params=["json", "orjson"])
+def parser(request, monkeypatch):
+    monkeypatch.setattr(serialization, "serializer", serialization.get_serializer(request.param))
+    return request.param
+
+def frame(**message):
+    return json.dumps(message)
+
+def test_decodes_telemetry(parser):
+    message = decode(frame(type="TELEMETRY", device_id="s1", data=[1, 2.5, 0, -1, 3, 4], timestamp="t"))
+    assert isinstance(message, Telemetry)
+    assert (message.device_id, message.data, message.timestamp) == ("s1", [1, 2.5, 0, -1, 3, 4], "t")
+    assert message.seq is None
+    assert decode(frame(type="TELEMETRY", data=[0] * 6, seq=7)).seq == 7
+
+def test_decodes_bytes_and_defaults(parser):
+    message = decode(frame(type="TELEMETRY", data=[0] * 6).encode())
+    assert message.device_id == "default"
+    assert message.timestamp is None
+    assert isinstance(decode(b'{"type": "PING"}'), Ping)
+    assert isinstance(decode(frame(type="SUBSCRIBE", topics=["device:s1"])), Subscribe)
+    assert decode(frame(type="SUBSCRIBE", topics=["fleet"], token="t")).token == "t"
+
+@pytest.mark.parametrize("raw", [
+    None,
+    "",
+    "{not json",
+    "[1, 2]",
+    "null",
+    frame(type="NOPE"),
+    frame(type=["TELEMETRY"]),
+    frame(type={"a": 1}),
+    frame(data=[0] * 6),
+    frame(type="TELEMETRY", data=[0] * 5),
+    frame(type="TELEMETRY", data="000000"),
+    frame(type="TELEMETRY", data=[0, 0, 0, 0, 0, True]),
+    frame(type="TELEMETRY", data=[0, 0, 0, 0, 0, "1"]),
+    frame(type="TELEMETRY", data=[0, 0, 0, 0, 0, None]),
+    '{"type": "TELEMETRY", "data": [0, 0, 0, 0, 0, NaN]}',
+    '{"type": "TELEMETRY", "data": [0, 0, 0, 0, 0, Infinity]}',
+    '{"type": "TELEMETRY", "data": [0, 0, 0, 0, 0, 1e999]}',
+    '{"type": "TELEMETRY", "data": [0, 0, 0, 0, 0, 1' + "0" * 400 + "]}",
+    frame(type="TELEMETRY", data=[0] * 6, timestamp=5),
+    frame(type="TELEMETRY", data=[0] * 6, seq="7"),
+    frame(type="TELEMETRY", data=[0] * 6, seq=True),
+    frame(type="TELEMETRY", data=[0] * 6, seq=-1),
+    '{"type": "TELEMETRY", "data": [0, 0, 0, 0, 0, 0], "seq": 1' + "0" * 30 + "}",
+    frame(type="TELEMETRY", data=[0] * 6, device_id=""),
+    frame(type="TELEMETRY", data=[0] * 6, device_id=7),
+    frame(type="TELEMETRY", data=[0] * 6, device_id="x" * 129),
+    frame(type="CONNECTION", group=3),
+    frame(type="SUBSCRIBE", topics=[]),
+    frame(type="SUBSCRIBE", topics=["everything"]),
+    frame(type="UNSUBSCRIBE", topics="fleet"),
+    frame(type="SUBSCRIBE", topics=["fleet"], token=5),
+])
+def test_rejects_malformed_frames(parser, raw):
+    with pytest.raises(MessageError):
+        decode(raw)
@@ -0,0 +1,42 @@
+import math
+
+import numpy as np
+import pytest
+
+from quantile import P2Quantile
+
+@pytest.mark.parametrize("p", [0.5, 0.95, 0.99])
+@pytest.mark.parametrize("distribution", ["lognormal", "uniform"])
+def test_tracks_the_exact_quantile(p, distribution):
+    rng = np.random.default_rng(3)
+    values = {
+        "lognormal": rng.lognormal(mean=-4.0, sigma=0.8, size=50000),
+        "uniform": rng.uniform(0.0, 1.0, size=50000),
+    }[distribution]
+
+    estimate = P2Quantile(p)
+    estimate.update_many(values)
+    assert estimate.count == len(values)
+    assert estimate.value() == pytest.approx(np.quantile(values, p), rel=0.03)
+
+def test_small_samples_use_the_order_statistic():
+    estimate = P2Quantile(0.5)
+    assert math.isnan(estimate.value())
+    estimate.update_many([5.0, 1.0, 3.0])
+    assert estimate.value() == 3.0
+    estimate.update_many([2.0, 4.0])
+    assert estimate.value() == 3.0
+
+    high = P2Quantile(0.99)
+    high.update_many([0.2, 0.1, 0.3])
+    assert high.value() == 0.3
+
+def test_constant_stream():
+    estimate = P2Quantile(0.95)
+    estimate.update_many([0.25] * 1000)
+    assert estimate.value() == 0.25
+
+@pytest.mark.parametrize("p", [0.0, 1.0, -0.5, 2.0])
+def test_rejects_quantiles_outside_zero_one(p):
+    with pytest.raises(ValueError):
+        P2Quantile(p)
@@ -0,0 +1,58 @@
+import numpy as np
+
+import score_cache
+from score_cache import ScoreCache
+
+def window(speed=33.5):
+    values = np.tile([speed, 0.1, 0.05, 9.8, 0.0, 0.0], (10, 1))
+    return values.astype(np.float64)
+
+def counts():
+    return score_cache.device_hits.value, score_cache.lru_hits.value, score_cache.cache_misses.value
+
+def test_miss_then_device_hit_within_one_quantum():
+    cache = ScoreCache()
+    before = counts()
+    assert cache.lookup("s1", window()) is None
+    cache.store("s1", window(), 0.02, {"top_feature": "speed"})
+
+    # 0.05 km/h of jitter is inside the 0.1 km/h speed step
+    assert cache.lookup("s1", window(33.55)) == (0.02, {"top_feature": "speed"})
+    assert np.subtract(counts(), before).tolist() == [1, 0, 1]
+
+def test_lru_hit_across_devices():
+    cache = ScoreCache()
+    cache.store("s1", window(), 0.02)
+    before = counts()
+
+    assert cache.lookup("s2", window()) == (0.02, None)
+    # The LRU hit becomes s2's last window
+    assert cache.lookup("s2", window()) == (0.02, None)
+    assert np.subtract(counts(), before).tolist() == [1, 1, 0]
+
+def test_different_window_misses():
+    cache = ScoreCache()
+    cache.store("s1", window(), 0.02)
+    assert cache.lookup("s1", window(40.0)) is None
+    assert cache.lookup("s2", window(40.0)) is None
+
+def test_lru_evicts_the_oldest_entry():
+    cache = ScoreCache(max_entries=2)
+    for i, speed in enumerate((10.0, 20.0, 30.0)):
+        cache.store(f"s{i}", window(speed), speed / 1000)
+
+    assert len(cache.lru) == 2
+    assert cache.lookup("other", window(10.0)) is None
+    assert cache.lookup("other", window(30.0)) == (0.03, None)
+
+def test_forget_and_clear():
+    cache = ScoreCache()
+    cache.store("s1", window(), 0.02)
+    cache.forget("s1")
+    assert "s1" not in cache.last
+    # Still in the global LRU
+    assert cache.lookup("s1", window()) == (0.02, None)
+
+    cache.clear()
+    assert cache.lookup("s1", window()) is None
+    assert cache.describe()["lru_entries"] == 0
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import sweep
+
+def evaluate(devices, hysteresis=1, countdown=6.0, attack_cutoff=0.7, critical_cutoff=0.95):
+    """Run one combination over devices given as (mse, labels, timestamps) lists; threshold 1 keeps score == mse"""
+    sweep._data.clear()
+    sweep._init_worker({
+        "mse": np.concatenate([np.asarray(mse, dtype=np.float64) for mse, _, _ in devices]),
+        "labels": np.concatenate([np.asarray(labels, dtype=np.int8) for _, labels, _ in devices]),
+        "timestamps": np.concatenate([np.asarray(ts, dtype=np.float64) for _, _, ts in devices]),
+        "device_codes": np.concatenate([np.full(len(mse), code) for code, (mse, _, _) in enumerate(devices)]),
+    })
+    [row] = sweep.evaluate([(1.0, attack_cutoff, critical_cutoff, countdown, hysteresis)])
+    return row
+
+FLEET = [
+    ([0.1, 0.9, 0.9, 0.1, 0.1, 0.9], [0, 1, 1, 0, 0, 0], [0, 1, 2, 3, 4, 5]),
+    ([0.9, 0.1, 0.1, 0.1], [0, 0, 0, 0], [0, 1, 2, 3]),
+]
+
+def test_every_run_above_the_cutoff_is_one_alarm():
+    row = evaluate(FLEET, hysteresis=1)
+    assert (row["alarms"], row["false_alarms"], row["episodes_detected"]) == (3, 2, 1)
+    assert row["precision"] == pytest.approx(1 / 3)
+    assert row["recall"] == 1.0
+    assert row["detection_latency_mean_s"] == 0.0
+    # No critical score: safe mode when the countdown runs out
+    assert row["safe_mode_latency_mean_s"] == 6.0
+
+def test_hysteresis_runs_reset_at_device_boundaries():
+    # Device 0's last row and device 1's first row are both above the cut-off,
+    # but they are different devices, so they do not form a run of two
+    row = evaluate(FLEET, hysteresis=2)
+    assert (row["alarms"], row["false_alarms"], row["episodes_detected"]) == (1, 0, 1)
+    assert row["precision"] == 1.0
+    assert row["detection_latency_mean_s"] == 1.0
+
+def test_no_alarms():
+    row = evaluate(FLEET, hysteresis=3)
+    assert (row["alarms"], row["episodes_detected"], row["precision"], row["recall"], row["f1"]) == (0, 0, 0.0, 0.0, 0.0)
+    assert row["detection_latency_mean_s"] is None
+
+def test_episodes_restart_per_device():
+    devices = [
+        ([0.8, 0.1], [1, 1], [0, 1]),
+        ([0.1, 0.8], [1, 1], [0, 5]),
+    ]
+    row = evaluate(devices)
+    assert row["episodes_detected"] == 2
+    assert row["recall"] == 1.0
+    # Device 1's episode starts at its own first labelled row
+    assert row["detection_latency_p95_s"] == pytest.approx(np.percentile([0.0, 5.0], 95))
+
+def test_critical_score_after_the_alarm_brings_safe_mode_forward():
+    row = evaluate([([0.8, 0.5, 1.0], [1, 1, 1], [0, 1, 2])], countdown=6.0)
+    assert row["safe_mode_latency_mean_s"] == 2.0
+
+def test_critical_score_on_the_next_device_is_ignored():
+    devices = [
+        ([0.1, 0.8], [0, 1], [0, 1]),
+        ([1.0, 0.1], [0, 0], [1.5, 2]),
+    ]
+    row = evaluate(devices, countdown=3.0)
+    assert row["safe_mode_latency_mean_s"] == 3.0
+
+def test_alarm_on_the_last_row_waits_for_the_countdown():
+    # The alarm row itself is critical, but only rows after it count
+    row = evaluate([([0.1, 1.0], [0, 1], [0, 1])], countdown=3.0)
+    assert row["detection_latency_mean_s"] == 0.0
+    assert row["safe_mode_latency_mean_s"] == 3.0
@@ -0,0 +1,54 @@
+import pytest
+
+from topics import FLEET, TopicIndex, device_topic, group_topic, valid_topic
+
+@pytest.mark.parametrize("topic, valid", [
+    ("fleet", True),
+    ("device:s1", True),
+    ("group:berlin", True),
+    ("device:", False),
+    ("group:", False),
+    ("everything", False),
+    ("device:" + "x" * 200, False),
+])
+def test_valid_topic(topic, valid):
+    assert valid_topic(topic) is valid
+
+def test_audience_covers_device_group_and_fleet():
+    index = TopicIndex()
+    index.subscribe("own", device_topic("s1"))
+    index.subscribe("other", device_topic("s2"))
+    index.subscribe("group", group_topic("berlin"))
+    index.subscribe("admin", FLEET)
+    index.assign_group("s1", "berlin")
+
+    assert index.audience("s1") == {"own", "group", "admin"}
+    assert index.audience("s2") == {"other", "admin"}
+    assert index.audience("unknown") == {"admin"}
+
+def test_first_group_sticks():
+    index = TopicIndex()
+    assert index.assign_group("s1", "berlin")
+    assert not index.assign_group("s1", "paris")
+    index.subscribe("paris", group_topic("paris"))
+    assert index.audience("s1") == set()
+
+    index.set_group("s1", "paris")
+    assert index.audience("s1") == {"paris"}
+    index.set_group("s1", None)
+    assert index.audience("s1") == set()
+
+def test_unsubscribe_and_remove_clean_up():
+    index = TopicIndex()
+    index.subscribe("a", FLEET)
+    index.subscribe("a", device_topic("s1"))
+    index.subscribe("b", device_topic("s1"))
+
+    index.unsubscribe("a", FLEET)
+    assert index.audience("s2") == set()
+    index.remove("a")
+    assert index.audience("s1") == {"b"}
+    index.remove("b")
+    assert index.subscribers == {}
+    assert index.topics == {}
+    assert index.describe()["topics"] == 0
@@ -0,0 +1,98 @@
+"""Topic subscriptions for WebSocket fan-out.
+
+    device:<id>    events about one scooter; a connection joins it when it
+                   identifies as that device or sends telemetry for it
+    group:<name>   events about every device in a group (a device names its
+                   group in its CONNECTION message)
+    fleet          every device event, for admin dashboards
+
+The index maps each topic to its connections, so delivering a device
+event costs O(subscribers) instead of O(connections). Events that are not
+about one device (resets, admin-triggered simulations) and changes of the
+global system state still go to every connection.
+
+A connection joins its own device topic implicitly. Explicit SUBSCRIBE
+messages, the only way into fleet, group or other devices' topics, must
+carry the admin token (SCOOTER_ADMIN_TOKEN) and are refused when none is
+configured. A device's group is set by the first CONNECTION that names it
+and kept until its session is evicted, so another client cannot move it
+to a different group.
+"""
+from typing import Dict, Hashable, Optional, Set
+
+import metrics
+
+FLEET = "fleet"
+TOPIC_PREFIXES = ("device:", "group:")
+MAX_TOPIC_LENGTH = 160
+
+events_delivered = metrics.registry.register(metrics.Counter(
+    "scooter_topic_deliveries_total", "Device events queued to subscribed connections"))
+
+def device_topic(device_id: str) -> str:
+    return f"device:{device_id}"
+
+def group_topic(group: str) -> str:
+    return f"group:{group}"
+
+def valid_topic(topic: str) -> bool:
+    if topic == FLEET:
+        return True
+    return (len(topic) <= MAX_TOPIC_LENGTH
+            and any(topic.startswith(prefix) and len(topic) > len(prefix) for prefix in TOPIC_PREFIXES))
+
+class TopicIndex:
+    def __init__(self):
+        self.subscribers: Dict[str, Set[Hashable]] = {}
+        self.topics: Dict[Hashable, Set[str]] = {}
+        self.device_groups: Dict[str, str] = {}
+
+    def subscribe(self, connection: Hashable, topic: str):
+        self.subscribers.setdefault(topic, set()).add(connection)
+        self.topics.setdefault(connection, set()).add(topic)
+
+    def unsubscribe(self, connection: Hashable, topic: str):
+        subscribers = self.subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.subscribers[topic]
+        self.topics.get(connection, set()).discard(topic)
+
+    def remove(self, connection: Hashable):
+        """Drop every subscription of a closed connection"""
+        for topic in self.topics.pop(connection, ()):
+            subscribers = self.subscribers[topic]
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.subscribers[topic]
+
+    def assign_group(self, device_id: str, group: str) -> bool:
+        """Set a device's group unless it already has one"""
+        if device_id in self.device_groups:
+            return False
+        self.device_groups[device_id] = group
+        return True
+
+    def set_group(self, device_id: str, group: Optional[str]):
+        if group is None:
+            self.device_groups.pop(device_id, None)
+        else:
+            self.device_groups[device_id] = group
+
+    def audience(self, device_id: str) -> Set[Hashable]:
+        """Connections subscribed to the device, its group or the whole fleet"""
+        audience = set(self.subscribers.get(device_topic(device_id), ()))
+        group = self.device_groups.get(device_id)
+        if group is not None:
+            audience.update(self.subscribers.get(group_topic(group), ()))
+        audience.update(self.subscribers.get(FLEET, ()))
+        return audience
+
+    def describe(self) -> Dict:
+        return {
+            "topics": len(self.subscribers),
+            "device_topics": sum(topic.startswith("device:") for topic in self.subscribers),
+            "fleet_subscribers": len(self.subscribers.get(FLEET, ())),
+            "groups": len(set(self.device_groups.values()))
+        }
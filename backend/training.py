@@ -0,0 +1,110 @@
+"""Streaming training pipeline for the LSTM autoencoder.
+
+Reads on-disk telemetry recordings (the JSONL/CSV format used by replay.py)
+in chunks, builds per-device sliding windows on the fly and feeds them to
+Keras through a prefetching tf.data pipeline, so memory stays bounded by
+the chunk size and shuffle buffer rather than the size of the data.
+
+Files are expected in time order per device, as the backend records them.
+Every `--val-every`-th window is held out for validation.
+
+Usage:
+    python training.py data/day1.jsonl data/day2.jsonl --epochs 20 \\
+        --output models/lstm_autoencoder.h5
+"""
+import argparse
+import os
+from collections import deque
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+import joblib
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from model import LSTMAutoencoder
+
+TIMESTEPS = 10
+N_FEATURES = 6
+
+def read_chunks(path, chunksize):
+    """Yield (device_ids, frames) chunks from a recording without loading it whole"""
+    if path.endswith(".csv"):
+        reader = pd.read_csv(path, chunksize=chunksize)
+    else:
+        reader = pd.read_json(path, lines=True, chunksize=chunksize,
+                              convert_dates=False, keep_default_dates=False)
+
+    for df in reader:
+        if path.endswith(".csv"):
+            frames = df[[f"f{i}" for i in range(N_FEATURES)]].to_numpy(dtype=np.float32)
+        else:
+            frames = np.array(df["data"].tolist(), dtype=np.float32)
+        device_ids = df["device_id"].astype(str).to_numpy() if "device_id" in df else np.full(len(df), "default")
+        yield device_ids, frames
+
+def stream_windows(paths, chunksize=50000, split=None, val_every=5):
+    """Yield float32 windows [timesteps, features] as detect_anomaly builds them.
+
+    split="train" / "val" keeps a deterministic subset of windows.
+    """
+    index = 0
+    for path in paths:
+        tails = {}
+        for device_ids, frames in read_chunks(path, chunksize):
+            for device_id, frame in zip(device_ids, frames):
+                tail = tails.get(device_id)
+                if tail is None:
+                    tail = tails[device_id] = deque(maxlen=TIMESTEPS)
+                tail.append(frame)
+                if len(tail) < TIMESTEPS:
+                    continue
+
+                is_val = index % val_every == 0
+                index += 1
+                if split == "train" and is_val or split == "val" and not is_val:
+                    continue
+                yield np.stack(tail)
+
+def make_dataset(paths, batch_size=256, split=None, shuffle_buffer=10000, chunksize=50000, val_every=5):
+    """tf.data pipeline of window batches with shuffling and prefetching"""
+    dataset = tf.data.Dataset.from_generator(
+        lambda: stream_windows(paths, chunksize, split, val_every),
+        output_signature=tf.TensorSpec(shape=(TIMESTEPS, N_FEATURES), dtype=tf.float32)
+    )
+    if shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the LSTM autoencoder from on-disk telemetry")
+    parser.add_argument("recordings", nargs="+", help="JSONL or CSV telemetry files")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--shuffle-buffer", type=int, default=10000, help="windows held for shuffling")
+    parser.add_argument("--chunksize", type=int, default=50000, help="rows read from disk at a time")
+    parser.add_argument("--val-every", type=int, default=5, help="hold out every n-th window")
+    parser.add_argument("--output", default=os.path.join("models", "lstm_autoencoder.h5"))
+    args = parser.parse_args()
+
+    train = make_dataset(args.recordings, args.batch_size, "train", args.shuffle_buffer, args.chunksize, args.val_every)
+    val = make_dataset(args.recordings, args.batch_size, "val", 0, args.chunksize, args.val_every)
+    threshold_data = make_dataset(args.recordings, args.batch_size, "train", 0, args.chunksize, args.val_every)
+
+    model = LSTMAutoencoder()
+    # Keep the existing scaler (from the output directory, else the default one);
+    # save_model writes it next to the new model
+    for scaler_path in (os.path.join(os.path.dirname(args.output) or ".", "scaler.pkl"),
+                        os.path.join("models", "scaler.pkl")):
+        if os.path.exists(scaler_path):
+            model.scaler = joblib.load(scaler_path)
+            break
+    model.fit_stream(train, val, epochs=args.epochs, threshold_dataset=threshold_data)
+    print(f"Training finished. Threshold (95th percentile MSE): {model.threshold:.6f}")
+
+    model.save_model(args.output)
+    print(f"Model saved to {args.output} (threshold in {args.output}.json)")
+
+if __name__ == "__main__":
+    main()
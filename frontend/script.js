@@ -19,6 +19,13 @@ class SmartScooterDashboard {
         // Check backend health periodically
         setInterval(() => this.checkBackendHealth(), 5000);
         
+        // Heartbeat: the backend closes connections that stay silent (e.g. while in safe mode)
+        setInterval(() => {
+            if (this.wsConnected && this.ws.readyState === WebSocket.OPEN) {
+                this.ws.send(JSON.stringify({ type: 'PING' }));
+            }
+        }, 10000);
+        
         // Initial health check
         setTimeout(() => this.checkBackendHealth(), 1000);
     }